@@ -1,32 +1,49 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, g, has_request_context, stream_with_context
 import os
 from dotenv import load_dotenv
 from datetime import datetime
 import logging
 import pandas as pd
 import json
-from data_sources import DataConnector
+import hmac
+import threading
+import time
+from functools import wraps
+from data_sources import DataConnector, UnitOfWork, SheetConflictError, TableContext, RowNotFoundError, ROW_ID_COLUMN
+from components.product_index import ProductNameIndex, names_signature
+from components.customer_aggregates import CustomerAggregates, recompute_customers
+from components.snapshot_store import SnapshotStore
+from components.shared_sqlite import SharedDatabase, default_cache_path
+from components.snapshot_refresher import SnapshotRefresher
+from components.sheets_metrics import SHEETS_METRICS
+from components.request_profiler import RequestProfiler
+from components.log_pipeline import configure_logging, audit, dropped_records
+from components.stock_movements import StockMovementLog, StockMovementIndex, movement, inventory_lot_key, lot_key
+from components.payment_ledger import PaymentLedger, PaymentIndex, payment, invoice_key
+from components.cost_index import CostIndex
+from components.cost_lots import CostLotEngine
+from components.sheet_export import filter_rows, csv_chunks, xlsx_chunks
+from components.inventory_import import release_claims, stage_import
+from components.invoice_import import invoices_from_csv, invoices_from_json, normalize_invoices
+from components.recent_submissions import RecentSubmissions, purchase_fingerprint
+from components.idempotency import IdempotencyStore, request_fingerprint, MAX_KEY_LENGTH
+import io
 
 # Load environment variables
 load_dotenv()
 
-# Create necessary directories before setting up logging
-os.makedirs('logs', exist_ok=True)
-
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)s | %(message)s',
-    handlers=[
-        logging.FileHandler('logs/audit_log.txt', mode='a'),
-        logging.StreamHandler()
-    ]
-)
+# Setup logging: records are queued and written (with rotation) by a background thread;
+# business mutations also go to logs/audit_events.jsonl through audit()
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Opt-in profiling (PROFILE_ENDPOINTS / PROFILER_ADMIN_TOKEN); registers no hooks when neither is set
+request_profiler = RequestProfiler.from_env()
+request_profiler.init_app(app)
+
 INVOICE_REQUIRED_COLUMNS = [
     'invoice_number', 'customer_name', 'products_summary', 'product_name', 'price_sold',
     'quantity', 'line_total', 'shipment_fee', 'total_amount', 'invoice_date', 'created_at',
@@ -70,11 +87,42 @@ def format_date_custom(date_str):
         logger.warning(f"Error formatting date '{date_str}': {str(e)}")
         return str(date_str)
 
-# Initialize DataConnector
+# Initialize DataConnector (authenticates with Google lazily, on first use or during warm-up)
 connector = DataConnector({})
 
+# Shared snapshot cache so page reads are downloaded once per TTL for all workers on the host
+SNAPSHOT_TTL_SECONDS = float(os.getenv('SNAPSHOT_TTL_SECONDS', '30'))
+SNAPSHOT_CACHE_PATH = os.getenv('SNAPSHOT_CACHE_PATH') or default_cache_path()
+snapshot_store = None
+shared_db = None  # The same file, for the duplicate-submission and Idempotency-Key tables
+if SNAPSHOT_TTL_SECONDS > 0:
+    try:
+        snapshot_store = SnapshotStore(SNAPSHOT_CACHE_PATH, ttl_seconds=SNAPSHOT_TTL_SECONDS)
+        shared_db = snapshot_store.db
+    except Exception as e:
+        logger.warning(f"Snapshot cache disabled, could not open {SNAPSHOT_CACHE_PATH}: {str(e)}")
+
+
+def _load_sheet(url):
+    return connector.read_versioned_from_sheets(url)
+
+
+def _read_snapshot(url):
+    """Read a sheet for display, through the shared snapshot cache when it is enabled."""
+    if snapshot_store is None or not url:
+        return connector.read_from_sheets(url)
+    if snapshot_refresher is not None:
+        snapshot_refresher.ensure_started()
+        return snapshot_refresher.read(url)
+    return snapshot_store.get(url, lambda: _load_sheet(url))
+
 def _generate_invoice_number(existing_df):
     """Generate unique invoice number in INV-YYYYMMDD-XXX format."""
+    return _generate_invoice_numbers(existing_df, 1)[0]
+
+
+def _generate_invoice_numbers(existing_df, count):
+    """Allocate count consecutive invoice numbers after today's highest INV-YYYYMMDD-XXX."""
     date_prefix = datetime.now().strftime('%Y%m%d')
     base_prefix = f"INV-{date_prefix}-"
     next_seq = 1
@@ -90,7 +138,7 @@ def _generate_invoice_number(existing_df):
     except Exception as e:
         logger.warning(f"Could not inspect existing invoice numbers: {str(e)}")
 
-    return f"{base_prefix}{next_seq:03d}"
+    return [f"{base_prefix}{seq:03d}" for seq in range(next_seq, next_seq + count)]
 
 def _build_invoice_mask(df, invoice_number=None, created_at=None):
     """Build a safe mask for targeting a single logical invoice instance."""
@@ -223,8 +271,8 @@ def _ensure_sold_columns(df):
     return df
 
 
-def _rollback_invoice_stock_sync(inventory_df, sold_df, invoice_number, created_at):
-    """Restore inventory and remove sold rows linked to a specific invoice."""
+def _rollback_invoice_stock_sync(inventory_df, sold_df, invoice_number, created_at, movements=None, lots=None):
+    """Restore inventory and remove sold rows linked to a specific invoice (restores go to movements)."""
     marker = _invoice_sync_marker(invoice_number, created_at)
     if sold_df.empty:
         return inventory_df, sold_df
@@ -233,27 +281,43 @@ def _rollback_invoice_stock_sync(inventory_df, sold_df, invoice_number, created_
     if restore_rows.empty:
         return inventory_df, sold_df
 
+    if lots is None:
+        lots = CostLotEngine.from_inventory(inventory_df, COST_FLOW_POLICY)
     for _, sold_row in restore_rows.iterrows():
         product_name = str(sold_row.get('product_name', '')).strip()
         qty = _safe_int(sold_row.get('quantity', 0), 0)
         if qty <= 0 or not product_name:
             continue
-        candidate_idx = inventory_df[inventory_df['product_name'].astype(str).str.strip() == product_name].index
-        if len(candidate_idx) == 0:
-            continue
-        # Restore to first matching row to keep stock totals accurate.
-        idx = candidate_idx[0]
-        current_remaining = _safe_int(inventory_df.at[idx, 'remaining_qty'], 0)
-        inventory_df.at[idx, 'remaining_qty'] = current_remaining + qty
-        inventory_df.at[idx, 'quantity'] = inventory_df.at[idx, 'remaining_qty']
-        inventory_df.at[idx, 'status'] = 'in_stock' if _safe_float(inventory_df.at[idx, 'remaining_qty'], 0) > 0 else 'out_of_stock'
+        # Put the units back on the lots the cost policy took them from
+        for idx, remaining_before, remaining_after in lots.restore(product_name, qty):
+            inventory_df.at[idx, 'remaining_qty'] = remaining_after
+            inventory_df.at[idx, 'quantity'] = remaining_after
+            inventory_df.at[idx, 'status'] = 'in_stock' if remaining_after > 0 else 'out_of_stock'
+            if movements is not None:
+                movements.append(movement(inventory_lot_key(inventory_df, idx), product_name, 'restore',
+                                          remaining_after - remaining_before, remaining_after, reference=invoice_number))
 
     sold_df = sold_df[~sold_df['remarks'].astype(str).str.startswith(marker, na=False)].reset_index(drop=True)
     return inventory_df, sold_df
 
 
-def _apply_invoice_stock_sync(inventory_df, sold_df, invoice_number, created_at, items, invoice_date):
-    """Consume inventory for invoice items and append corresponding sold rows."""
+def _apply_invoice_stock_sync(inventory_df, sold_df, invoice_number, created_at, items, invoice_date, movements=None, lots=None):
+    """Consume inventory for invoice items and append corresponding sold rows (consumption goes to movements)."""
+    sold_rows = _consume_invoice_items(inventory_df, invoice_number, created_at, items, invoice_date, movements, lots)
+    if sold_rows:
+        sold_df = pd.concat([sold_df, pd.DataFrame(sold_rows)], ignore_index=True)
+    if 'tithe_kept' in sold_df.columns:
+        sold_df['tithe_kept'] = sold_df['tithe_kept'].astype(str)
+    return inventory_df, sold_df
+
+
+def _consume_invoice_items(inventory_df, invoice_number, created_at, items, invoice_date, movements=None, lots=None):
+    """Take invoice items out of inventory_df (in place) and return the matching sold rows.
+
+    Lots are taken and priced by the cost-lot engine (COST_FLOW_POLICY) in one pass, so each sold
+    row's cost is the cost of the stock it removed. lots must describe inventory_df; callers
+    replaying many invoices pass one in so it is not rebuilt per invoice.
+    """
     now_ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     sold_rows = []
 
@@ -265,56 +329,38 @@ def _apply_invoice_stock_sync(inventory_df, sold_df, invoice_number, created_at,
         if name and qty > 0:
             required_by_product[name] = required_by_product.get(name, 0) + qty
 
-    normalized_cost_by_product = {}
+    if lots is None:
+        lots = CostLotEngine.from_inventory(inventory_df, COST_FLOW_POLICY)
     for product_name, needed_qty in required_by_product.items():
-        product_rows = inventory_df[inventory_df['product_name'].astype(str).str.strip() == product_name]
-        available = product_rows['remaining_qty'].apply(lambda v: _safe_int(v, 0)).sum() if not product_rows.empty else 0
+        available = lots.remaining(product_name)
         if available < needed_qty:
             raise ValueError(f"Insufficient stock for '{product_name}'. Needed {needed_qty}, available {available}.")
-        weighted_cost_sum = 0.0
-        weighted_qty = 0
-        for _, inv_row in product_rows.iterrows():
-            row_qty = _safe_int(inv_row.get('remaining_qty', 0), 0)
-            if row_qty <= 0:
-                continue
-            row_cost = _safe_float(inv_row.get('total_cost_per_unit', 0), 0.0)
-            weighted_cost_sum += (row_cost * row_qty)
-            weighted_qty += row_qty
-        normalized_cost_by_product[product_name] = (weighted_cost_sum / weighted_qty) if weighted_qty > 0 else 0.0
 
     marker = _invoice_sync_marker(invoice_number, created_at)
     for item in items:
         product_name = str(item.get('name', '')).strip()
         requested_qty = _safe_int(item.get('quantity', 0), 0)
-        qty_to_consume = requested_qty
         unit_price = _safe_float(item.get('price', 0), 0.0)
-        if not product_name or qty_to_consume <= 0:
+        if not product_name or requested_qty <= 0:
             continue
 
-        candidate_idx = inventory_df[inventory_df['product_name'].astype(str).str.strip() == product_name].index.tolist()
-        for idx in candidate_idx:
-            if qty_to_consume <= 0:
-                break
-            available = _safe_int(inventory_df.at[idx, 'remaining_qty'], 0)
-            if available <= 0:
-                continue
-            consume = min(available, qty_to_consume)
-            inventory_df.at[idx, 'remaining_qty'] = available - consume
-            inventory_df.at[idx, 'quantity'] = inventory_df.at[idx, 'remaining_qty']
-            inventory_df.at[idx, 'status'] = 'in_stock' if _safe_float(inventory_df.at[idx, 'remaining_qty'], 0) > 0 else 'out_of_stock'
+        takes, total_cost = lots.consume(product_name, requested_qty)
+        for idx, consume, remaining_after in takes:
+            inventory_df.at[idx, 'remaining_qty'] = remaining_after
+            inventory_df.at[idx, 'quantity'] = remaining_after
+            inventory_df.at[idx, 'status'] = 'in_stock' if remaining_after > 0 else 'out_of_stock'
             inventory_df.at[idx, 'date_sold'] = invoice_date or now_ts
+            if movements is not None:
+                movements.append(movement(inventory_lot_key(inventory_df, idx), product_name, 'invoice', consume,
+                                          remaining_after, reference=invoice_number, timestamp=now_ts))
 
-            qty_to_consume -= consume
-
-        normalized_cost_per_unit = _safe_float(normalized_cost_by_product.get(product_name, 0), 0.0)
         line_revenue = unit_price * requested_qty
-        total_cost = normalized_cost_per_unit * requested_qty
         profit = line_revenue - total_cost
         tithe = profit * 0.10
         sold_rows.append({
             'product_name': product_name,
             'quantity': requested_qty,
-            'total_cost_per_unit': normalized_cost_per_unit,
+            'total_cost_per_unit': total_cost / requested_qty,
             'selling_price': line_revenue,
             'total_cost': total_cost,
             'profit': profit,
@@ -324,28 +370,27 @@ def _apply_invoice_stock_sync(inventory_df, sold_df, invoice_number, created_at,
             'remarks': f"{marker}line:{product_name}",
             'date_sold': invoice_date or now_ts
         })
+    return sold_rows
 
-    if sold_rows:
-        sold_df = pd.concat([sold_df, pd.DataFrame(sold_rows)], ignore_index=True)
-    if 'tithe_kept' in sold_df.columns:
-        sold_df['tithe_kept'] = sold_df['tithe_kept'].astype(str)
-    return inventory_df, sold_df
 
-
-def _sync_invoice_with_inventory_and_sold(invoice_number, created_at, items, invoice_date, replace_existing=False, delete_only=False):
-    """Synchronize invoice quantities to inventory and sold sheets."""
+def _sync_invoice_with_inventory_and_sold(uow, invoice_number, created_at, items, invoice_date, replace_existing=False, delete_only=False):
+    """Synchronize invoice quantities to inventory and sold sheets (staged on the unit of work)."""
     if not INVENTORY_SHEET_URL or not SOLD_ITEMS_SHEET_URL:
         return
 
-    inventory_df = _ensure_inventory_columns(connector.read_from_sheets(INVENTORY_SHEET_URL))
-    sold_df = _ensure_sold_columns(connector.read_from_sheets(SOLD_ITEMS_SHEET_URL))
+    inventory_df = _ensure_inventory_columns(uow.read_from_sheets(INVENTORY_SHEET_URL))
+    sold_df = _ensure_sold_columns(uow.read_from_sheets(SOLD_ITEMS_SHEET_URL))
+    movements = []
+    lots = CostLotEngine.from_inventory(inventory_df, COST_FLOW_POLICY)
 
     if replace_existing or delete_only:
         inventory_df, sold_df = _rollback_invoice_stock_sync(
             inventory_df=inventory_df,
             sold_df=sold_df,
             invoice_number=invoice_number,
-            created_at=created_at
+            created_at=created_at,
+            movements=movements,
+            lots=lots
         )
 
     if not delete_only:
@@ -355,11 +400,161 @@ def _sync_invoice_with_inventory_and_sold(invoice_number, created_at, items, inv
             invoice_number=invoice_number,
             created_at=created_at,
             items=items,
-            invoice_date=invoice_date
+            invoice_date=invoice_date,
+            movements=movements,
+            lots=lots
         )
 
-    connector.write_to_sheets(inventory_df, INVENTORY_SHEET_URL)
-    connector.write_to_sheets(sold_df, SOLD_ITEMS_SHEET_URL)
+    uow.write_to_sheets(inventory_df, INVENTORY_SHEET_URL)
+    uow.write_to_sheets(sold_df, SOLD_ITEMS_SHEET_URL)
+    stock_movement_log.stage(uow, movements)
+
+
+def _invoice_rows_to_items(rows_df):
+    """Convert invoice line rows back into invoice item dicts."""
+    items = []
+    if rows_df is None or rows_df.empty:
+        return items
+    for _, row in rows_df.iterrows():
+        name = str(row.get('product_name', '') or '').strip()
+        quantity = _safe_int(row.get('quantity', 0), 0)
+        if name and quantity > 0:
+            items.append({'name': name, 'quantity': quantity, 'price': _safe_float(row.get('price_sold', 0), 0.0)})
+    return items
+
+
+def _invoice_rows(invoice_number, created_at, customer_name, items, shipment_fee, total_amount, invoice_date,
+                  amount_paid, payment_reference):
+    """Invoice sheet rows for a new invoice: one per item (or a single 'No items' row)."""
+    is_paid = amount_paid >= total_amount and total_amount > 0
+    initial_payment_history = []
+    if amount_paid > 0 and not PAYMENTS_SHEET_URL:
+        initial_payment_history.append({
+            'amount': amount_paid,
+            'reference': payment_reference,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+    # With a payments ledger the initial payment is a ledger row, not part of the invoice rows
+    row_amount_paid = 0.0 if PAYMENTS_SHEET_URL else amount_paid
+
+    # Generate products summary string
+    products_summary_parts = []
+    for item in items:
+        product_name = item.get('name', 'N/A')
+        quantity = item.get('quantity', 0)
+        price = item.get('price', 0)
+        subtotal = item.get('subtotal', 0)
+        products_summary_parts.append(f"{product_name} ({quantity} pcs × ₱{price:.2f}) = ₱{subtotal:.2f}")
+    products_summary = "; ".join(products_summary_parts) if products_summary_parts else "No items"
+
+    # Create one row per product
+    invoice_rows = []
+    for item in items or [{}]:
+        invoice_rows.append({
+            'invoice_number': invoice_number,
+            'customer_name': customer_name,
+            'products_summary': products_summary,
+            'product_name': item.get('name', 'N/A') if items else '',
+            'price_sold': item.get('price', 0),
+            'quantity': item.get('quantity', 0),
+            'line_total': item.get('subtotal', 0),
+            'shipment_fee': shipment_fee,
+            'total_amount': total_amount,
+            'invoice_date': invoice_date,
+            'created_at': created_at,
+            'paid': is_paid,
+            'fulfilled': False,
+            'amount_paid': row_amount_paid,
+            'payment_reference': payment_reference,
+            'payment_history': json.dumps(initial_payment_history)
+        })
+    return invoice_rows
+
+
+def _update_customer_aggregates(uow, changes, remaining_invoices=None):
+    """Apply per-invoice deltas to the Customers sheet, staging only the affected rows.
+
+    Removals (sign=-1) pass remaining_invoices, the invoice rows left without the removed invoice,
+    so a customer's first/last order date can be recomputed when it belonged to that invoice.
+    """
+    if not CUSTOMERS_SHEET_URL or not changes:
+        return
+    aggregates = CustomerAggregates(uow.read_from_sheets(CUSTOMERS_SHEET_URL), invoice_df=remaining_invoices)
+    for change in changes:
+        aggregates.apply_invoice(**change)
+    aggregates.persist(uow, CUSTOMERS_SHEET_URL)
+
+
+def _request_tables():
+    """The current request's table identity map, so each sheet is downloaded at most once per request."""
+    if not has_request_context():
+        return TableContext(connector)
+    tables = g.get('tables')
+    if tables is None or tables.connector is not connector:
+        tables = g.tables = TableContext(connector)
+    return tables
+
+
+def _new_unit_of_work():
+    return UnitOfWork(connector, tables=_request_tables(), row_id_urls=ROW_ID_TABS.values())
+
+
+def _commit_unit_of_work(uow):
+    """Commit staged sheet changes, raising so the route reports a failed save."""
+    written_urls = uow.pending_urls
+    try:
+        committed = uow.commit()
+    except SheetConflictError:
+        # Picked up by retry_on_sheet_conflict, which re-runs the whole route.
+        g.sheet_conflict = True
+        raise
+    if not committed:
+        raise ValueError("Could not save changes to Google Sheets. Nothing was updated, please try again.")
+    _snapshots_written(written_urls)
+
+
+def _snapshots_written(urls):
+    """Drop shared snapshots of sheets that were just written so the next read sees the change."""
+    if snapshot_store is not None:
+        snapshot_store.invalidate(urls)
+    if snapshot_refresher is not None:
+        snapshot_refresher.revalidate(urls)
+
+
+# Optimistic concurrency: routes re-read and re-apply their change when a sheet moved under them
+SHEET_CONFLICT_MAX_ATTEMPTS = max(1, int(os.getenv('SHEET_CONFLICT_MAX_ATTEMPTS', '3')))
+CONCURRENCY_STATS = {'conflicts': 0, 'retries': 0, 'gave_up': 0}
+_concurrency_stats_lock = threading.Lock()
+
+
+def _count_concurrency_event(name):
+    with _concurrency_stats_lock:
+        CONCURRENCY_STATS[name] += 1
+
+
+def retry_on_sheet_conflict(view):
+    """Re-run a mutating route from scratch when its commit hit a sheet version conflict."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        for attempt in range(1, SHEET_CONFLICT_MAX_ATTEMPTS + 1):
+            g.sheet_conflict = False
+            g.pop('tables', None)  # A retry must see the other writer's data, not this request's copies
+            response = view(*args, **kwargs)
+            if not g.sheet_conflict:
+                return response
+            _count_concurrency_event('conflicts')
+            if attempt < SHEET_CONFLICT_MAX_ATTEMPTS:
+                _count_concurrency_event('retries')
+                SHEETS_METRICS.count_retry('conflict')
+                logger.warning(f"Sheet conflict in {request.endpoint}; retrying (attempt {attempt + 1} of {SHEET_CONFLICT_MAX_ATTEMPTS})")
+                time.sleep(0.05 * attempt)
+        _count_concurrency_event('gave_up')
+        logger.error(f"Sheet conflict in {request.endpoint} persisted after {SHEET_CONFLICT_MAX_ATTEMPTS} attempts")
+        return jsonify({
+            'success': False,
+            'message': 'Someone else updated this data at the same time. Please refresh and try again.'
+        }), 409
+    return wrapper
 
 
 def _reset_inventory_from_totals(inventory_df):
@@ -385,15 +580,17 @@ def _rebuild_invoice_inventory_sold_sync():
     if not INVENTORY_SHEET_URL or not SOLD_ITEMS_SHEET_URL or not INVOICES_SHEET_URL:
         raise ValueError("Inventory, Sold Items, and Invoices sheet URLs must be configured.")
 
-    inventory_df = _reset_inventory_from_totals(connector.read_from_sheets(INVENTORY_SHEET_URL))
-    sold_df = _ensure_sold_columns(connector.read_from_sheets(SOLD_ITEMS_SHEET_URL))
-    invoice_df = connector.read_from_sheets(INVOICES_SHEET_URL)
+    uow = _new_unit_of_work()
+    inventory_df = _reset_inventory_from_totals(uow.read_from_sheets(INVENTORY_SHEET_URL))
+    sold_df = _ensure_sold_columns(uow.read_from_sheets(SOLD_ITEMS_SHEET_URL))
+    invoice_df = uow.read_from_sheets(INVOICES_SHEET_URL)
 
     # Keep non-invoice-linked sold rows; rebuild invoice-linked rows from scratch.
     sold_df = sold_df[~sold_df['remarks'].astype(str).str.startswith('INV_SYNC:', na=False)].reset_index(drop=True)
 
     replayed_rows = 0
     skipped_rows = []
+    lots = CostLotEngine.from_inventory(inventory_df, COST_FLOW_POLICY)
     if invoice_df is not None and not invoice_df.empty:
         replay_df = invoice_df.copy()
         replay_df['_sort_dt'] = pd.to_datetime(
@@ -424,7 +621,8 @@ def _rebuild_invoice_inventory_sold_sync():
                         'quantity': quantity,
                         'price': price_sold
                     }],
-                    invoice_date=invoice_date
+                    invoice_date=invoice_date,
+                    lots=lots
                 )
                 replayed_rows += 1
             except Exception as e:
@@ -432,8 +630,9 @@ def _rebuild_invoice_inventory_sold_sync():
                     f"{invoice_number} / {product_name} / qty {quantity}: {str(e)}"
                 )
 
-    connector.write_to_sheets(inventory_df, INVENTORY_SHEET_URL)
-    connector.write_to_sheets(sold_df, SOLD_ITEMS_SHEET_URL)
+    uow.write_to_sheets(inventory_df, INVENTORY_SHEET_URL)
+    uow.write_to_sheets(sold_df, SOLD_ITEMS_SHEET_URL)
+    _commit_unit_of_work(uow)
     return {
         'replayed_rows': replayed_rows,
         'skipped_rows': skipped_rows,
@@ -441,6 +640,290 @@ def _rebuild_invoice_inventory_sold_sync():
         'inventory_rows_total': len(inventory_df)
     }
 
+def _stage_append(uow, url, rows_df):
+    """Stage rows below a sheet's data: one append when the header already has every column, else one rewrite.
+
+    The append path reads only the header row (unless the table was already read) and does not
+    version-check the sheet: appended rows cannot overwrite anyone's data. The version stamp is still
+    bumped, so a concurrent rewrite of the same sheet conflicts instead of dropping the new rows.
+    """
+    if rows_df is None or rows_df.empty:
+        return
+    header = uow.read_header(url)
+    if header and all(str(col) in header for col in rows_df.columns):
+        uow.append_to_sheets(rows_df.reindex(columns=header), url)
+        return
+    existing = uow.read_from_sheets(url)
+    if existing is None or len(existing.columns) == 0:
+        uow.write_to_sheets(rows_df, url)
+        return
+    header = [str(col) for col in existing.columns]
+    missing = [str(col) for col in rows_df.columns if str(col) not in header]
+    if missing:
+        uow.write_to_sheets(pd.concat([existing, rows_df], ignore_index=True).reindex(columns=header + missing), url)
+    else:
+        uow.append_to_sheets(rows_df.reindex(columns=header), url)
+
+
+def _read_addressed_row(uow, url, data, position_field):
+    """One-row DataFrame of the row a request addresses (empty when there is no such row).
+
+    Pages send the row's row_id, and only that row is fetched. Rows without an id yet (sheets not
+    backfilled through /api/assign_row_ids) are addressed the old way, by their position in the sheet
+    as sent in data[position_field]; that reads the whole sheet, so the positional write is version-checked.
+    """
+    row_id = str(data.get('row_id') or '').strip()
+    if row_id:
+        return uow.read_rows(url, [row_id])
+    df = uow.read_from_sheets(url)
+    position = _safe_int(data.get(position_field), -1)
+    if position < 0 or position >= len(df):
+        return df.iloc[0:0].copy()
+    return df.iloc[[position]].reset_index(drop=True)
+
+
+def _stage_addressed_row_update(uow, url, data, position_field, values):
+    """Stage {column: value} on the row a request addresses; returns its row_id or '#<position>'.
+
+    Addressing is the same as _read_addressed_row: by row_id through a keyed cell update, else by
+    position, writing back that one row (or the whole sheet when a column has to be added).
+    Raises RowNotFoundError when neither names a row.
+    """
+    row_id = str(data.get('row_id') or '').strip()
+    if row_id:
+        uow.update_rows(url, {row_id: values})
+        return row_id
+    df = uow.read_from_sheets(url)
+    position = _safe_int(data.get(position_field), -1)
+    if position < 0 or position >= len(df):
+        raise RowNotFoundError(url, [str(data.get(position_field))])
+    added = [column for column in values if column not in df.columns]
+    for column, value in values.items():
+        if column not in df.columns:
+            df[column] = None
+        elif df[column].dtype != object:
+            df[column] = df[column].astype(object)
+        df.iat[position, df.columns.get_loc(column)] = value
+    if added:
+        uow.write_to_sheets(df, url)
+    else:
+        uow.write_rows_to_sheets(df, url, [position])
+    return f"#{position}"
+
+
+def _stage_invoice_batch(uow, invoices):
+    """Stage many normalized invoices at once; returns their (invoice_number, created_at) pairs.
+
+    Stock for the whole batch is checked up front (nothing is staged if any product is short),
+    lots are consumed by one cost-lot engine, and Invoices, Sold Items, Inventory, Customers (and
+    the movement/payment logs) each get a single staged write.
+    """
+    created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    numbers = _generate_invoice_numbers(uow.read_from_sheets(INVOICES_SHEET_URL), len(invoices))
+
+    if INVENTORY_SHEET_URL and SOLD_ITEMS_SHEET_URL:
+        inventory_raw = uow.read_from_sheets(INVENTORY_SHEET_URL)
+        inventory_df = _ensure_inventory_columns(inventory_raw.copy())
+        lots = CostLotEngine.from_inventory(inventory_df, COST_FLOW_POLICY)
+        lines = pd.DataFrame(
+            [(item['name'], item['quantity']) for invoice in invoices for item in invoice['items']],
+            columns=['product_name', 'quantity']
+        )
+        needed = lines.groupby('product_name', sort=False)['quantity'].sum()
+        available = pd.Series([lots.remaining(name) for name in needed.index], index=needed.index)
+        short = needed[needed > available]
+        if not short.empty:
+            raise ValueError('Insufficient stock for this batch: ' + '; '.join(
+                f"'{name}' needs {qty}, available {available[name]}" for name, qty in short.items()))
+
+        tracked = ['remaining_qty', 'quantity', 'status', 'date_sold']
+        before = inventory_df[tracked].astype(str)
+        sold_rows, movements = [], []
+        for invoice, invoice_number in zip(invoices, numbers):
+            sold_rows.extend(_consume_invoice_items(
+                inventory_df, invoice_number, created_at,
+                [{'name': item['name'], 'price': item['price'], 'quantity': item['quantity']} for item in invoice['items']],
+                invoice['invoice_date'], movements, lots
+            ))
+        if list(inventory_df.columns) == list(inventory_raw.columns):
+            changed = (inventory_df[tracked].astype(str) != before).any(axis=1)
+            uow.write_rows_to_sheets(inventory_df, INVENTORY_SHEET_URL, [int(pos) for pos in changed[changed].index])
+        else:
+            uow.write_to_sheets(inventory_df, INVENTORY_SHEET_URL)
+        _stage_append(uow, SOLD_ITEMS_SHEET_URL, _ensure_sold_columns(pd.DataFrame(sold_rows)))
+        stock_movement_log.stage(uow, movements)
+
+    invoice_rows, payments = [], []
+    for invoice, invoice_number in zip(invoices, numbers):
+        invoice_rows.extend(_invoice_rows(
+            invoice_number, created_at, invoice['customer_name'], invoice['items'], invoice['shipment_fee'],
+            invoice['total_amount'], invoice['invoice_date'], invoice['amount_paid'], invoice['payment_reference']
+        ))
+        if invoice['amount_paid'] > 0:
+            payments.append(payment(invoice_number, created_at, invoice['amount_paid'], invoice['payment_reference']))
+    invoice_rows_df = _normalize_invoice_boolean_columns(pd.DataFrame(invoice_rows, columns=INVOICE_REQUIRED_COLUMNS))
+    _stage_append(uow, INVOICES_SHEET_URL, invoice_rows_df)
+    payment_ledger.stage(uow, payments)
+
+    _update_customer_aggregates(uow, [{
+        'customer_name': invoice['customer_name'],
+        'items': invoice['items'],
+        'total_amount': invoice['total_amount'],
+        'invoice_date': invoice['invoice_date'],
+        'sign': 1
+    } for invoice in invoices])
+    return [(invoice_number, created_at) for invoice_number in numbers]
+
+
+def import_invoice_batch(invoices, dry_run=False):
+    """Create a batch of raw invoice dicts (see components/invoice_import.py) in one commit.
+
+    Invalid invoices are skipped and reported; the valid ones are created together or not at all.
+    With dry_run everything is validated and stock-checked but nothing is written.
+    """
+    if not INVOICES_SHEET_URL:
+        raise ValueError('Invoices sheet is not configured')
+    valid, errors = normalize_invoices(invoices)
+    created = []
+    if valid:
+        uow = _new_unit_of_work()
+        numbers = _stage_invoice_batch(uow, valid)
+        created = [
+            {'ref': invoice['ref'], 'invoice_number': invoice_number, 'created_at': created_at,
+             'customer_name': invoice['customer_name'], 'total_amount': invoice['total_amount']}
+            for invoice, (invoice_number, created_at) in zip(valid, numbers)
+        ]
+        if dry_run:
+            uow.discard()
+        else:
+            # All invoices, stock, sold rows and customers land together or not at all.
+            _commit_unit_of_work(uow)
+            logger.info(f"Imported {len(created)} invoices ({len(errors)} rejected)")
+            audit('invoices_imported', invoices=len(created), rejected=len(errors),
+                  invoice_numbers=[entry['invoice_number'] for entry in created])
+    return {'created': created, 'errors': errors, 'dry_run': bool(dry_run)}
+
+STOCK_ACTIONS = ['sold', 'used', 'freebie', 'raffled']
+
+
+def _resolve_status_actions(inventory_df, actions):
+    """Match bulk status actions to inventory rows and validate them against running stock.
+
+    Each action names a lot by 'row_id' (as used by /api/update_status), 'lot'
+    (<product_name>|<date_added>) or 'product_id' (row position). Returns (resolved actions, errors);
+    nothing is changed.
+    """
+    positions_by_lot = {}
+    for pos, (name, added) in enumerate(zip(inventory_df['product_name'], inventory_df.get('date_added', pd.Series('', index=inventory_df.index)))):
+        positions_by_lot.setdefault(lot_key(name, added), pos)
+    positions_by_id = {}
+    if ROW_ID_COLUMN in inventory_df.columns:
+        for pos, row_id in enumerate(inventory_df[ROW_ID_COLUMN].astype(str).str.strip()):
+            positions_by_id.setdefault(row_id, pos)
+    remaining = {}
+    resolved, errors = [], []
+    for number, action in enumerate(actions, start=1):
+        action = action if isinstance(action, dict) else {}
+        if action.get('row_id'):
+            pos = positions_by_id.get(str(action['row_id']).strip())
+        elif action.get('lot'):
+            pos = positions_by_lot.get(str(action['lot']).strip())
+        else:
+            pos = _safe_int(action.get('product_id'), -1)
+            pos = pos if 0 <= pos < len(inventory_df) else None
+        status = str(action.get('status') or '').strip().lower()
+        quantity = _safe_int(action.get('quantity_used', 1), 0)
+        if pos is None:
+            errors.append({'action': number, 'message': 'Lot not found. Please refresh the page and try again.'})
+            continue
+        if status not in STOCK_ACTIONS:
+            errors.append({'action': number, 'message': f"Status must be one of: {', '.join(STOCK_ACTIONS)}"})
+            continue
+        if quantity <= 0:
+            errors.append({'action': number, 'message': 'quantity_used must be at least 1'})
+            continue
+        available = remaining.get(pos, _safe_int(inventory_df.iloc[pos]['remaining_qty'], 0))
+        if quantity > available:
+            product_name = inventory_df.iloc[pos]['product_name']
+            errors.append({'action': number, 'message': f"Only {available} of '{product_name}' left in this lot"})
+            continue
+        remaining[pos] = available - quantity
+        resolved.append({
+            'position': pos,
+            'status': status,
+            'quantity': quantity,
+            'selling_price': _safe_float(action.get('selling_price'), 0.0) if action.get('selling_price') else None,
+            'remarks': str(action.get('remarks', '') or ''),
+        })
+    return resolved, errors
+
+
+def _stage_status_actions(uow, inventory_raw, actions):
+    """Apply resolved status actions in one pass and stage one write per sheet; returns per-action results."""
+    inventory_df = _ensure_inventory_columns(inventory_raw.copy())
+    now_ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    sold_rows, used_rows, movements, results = [], [], [], []
+    touched = set()
+    for action in actions:
+        pos, status, quantity = action['position'], action['status'], action['quantity']
+        idx = inventory_df.index[pos]
+        product_name = inventory_df.at[idx, 'product_name']
+        cost_per_unit = _safe_float(inventory_df.at[idx, 'total_cost_per_unit'], 0.0)
+        new_remaining = _safe_int(inventory_df.at[idx, 'remaining_qty'], 0) - quantity
+        inventory_df.at[idx, 'remaining_qty'] = new_remaining
+        inventory_df.at[idx, 'quantity'] = new_remaining
+        inventory_df.at[idx, 'status'] = 'in_stock' if new_remaining > 0 else 'out_of_stock'
+        if 'remarks' in inventory_df.columns:
+            inventory_df.at[idx, 'remarks'] = action['remarks']
+        touched.add(pos)
+        movements.append(movement(inventory_lot_key(inventory_df, idx), product_name, status, quantity, new_remaining,
+                                  remarks=action['remarks'], timestamp=now_ts))
+
+        if status == 'sold' and action['selling_price']:
+            selling_price = action['selling_price']
+            total_cost = cost_per_unit * quantity
+            profit = selling_price - total_cost
+            tithe = profit * 0.10
+            for col, value in [('selling_price', selling_price), ('profit', profit), ('tithe', tithe),
+                               ('profit_after_tithe', profit - tithe), ('date_sold', now_ts)]:
+                if col in inventory_df.columns:
+                    inventory_df.at[idx, col] = value
+            sold_rows.append({
+                'product_name': product_name,
+                'quantity': quantity,
+                'total_cost_per_unit': cost_per_unit,
+                'selling_price': selling_price,
+                'total_cost': total_cost,
+                'profit': profit,
+                'tithe': tithe,
+                'profit_after_tithe': profit - tithe,
+                'tithe_kept': 'False',
+                'remarks': action['remarks'],
+                'date_sold': now_ts
+            })
+        elif status in ['used', 'freebie']:
+            used_rows.append({
+                'product_name': product_name,
+                'quantity': quantity,
+                'total_cost_per_unit': cost_per_unit,
+                'status': status,
+                'remarks': action['remarks'],
+                'date_used': now_ts
+            })
+        results.append({'lot': inventory_lot_key(inventory_df, idx), 'product_name': product_name,
+                        'status': status, 'quantity': quantity, 'remaining_qty': new_remaining})
+
+    if list(inventory_df.columns) == list(inventory_raw.columns):
+        uow.write_rows_to_sheets(inventory_df, INVENTORY_SHEET_URL, sorted(touched))
+    else:
+        uow.write_to_sheets(inventory_df, INVENTORY_SHEET_URL)
+    if SOLD_ITEMS_SHEET_URL:
+        _stage_append(uow, SOLD_ITEMS_SHEET_URL, pd.DataFrame(sold_rows))
+    if USED_FREEBIE_SHEET_URL:
+        _stage_append(uow, USED_FREEBIE_SHEET_URL, pd.DataFrame(used_rows))
+    stock_movement_log.stage(uow, movements)
+    return results
+
 # Google Sheets URLs from environment
 INVENTORY_SHEET_URL = os.getenv('INVENTORY_SHEET_URL')
 SOLD_ITEMS_SHEET_URL = os.getenv('SOLD_ITEMS_SHEET_URL')
@@ -448,6 +931,300 @@ INVOICES_SHEET_URL = os.getenv('INVOICES_SHEET_URL')
 CUSTOMERS_SHEET_URL = os.getenv('CUSTOMERS_SHEET_URL')
 USED_FREEBIE_SHEET_URL = os.getenv('USED_FREEBIE_SHEET_URL')  # Used/Freebie items
 INDEX_SHEET_URL = os.getenv('INDEX_SHEET_URL')  # Product names index
+STOCK_MOVEMENTS_SHEET_URL = os.getenv('STOCK_MOVEMENTS_SHEET_URL')  # Append-only stock movement log
+PAYMENTS_SHEET_URL = os.getenv('PAYMENTS_SHEET_URL')  # Append-only invoice payment ledger
+
+# How invoice sales take and price inventory lots: fifo, lifo or average (weighted average, oldest lots first)
+COST_FLOW_POLICY = CostLotEngine(os.getenv('COST_FLOW_POLICY', 'average')).policy
+
+# Background refresh: pages are served from the latest snapshot while each sheet is re-read on its
+# own interval (SNAPSHOT_REFRESH_<SHEET>_SECONDS, 0 turns it off for that sheet)
+SNAPSHOT_REFRESH_DEFAULTS = {
+    'INVENTORY': (INVENTORY_SHEET_URL, 30),
+    'SOLD_ITEMS': (SOLD_ITEMS_SHEET_URL, 60),
+    'INVOICES': (INVOICES_SHEET_URL, 30),
+    'CUSTOMERS': (CUSTOMERS_SHEET_URL, 120),
+    'USED_FREEBIE': (USED_FREEBIE_SHEET_URL, 120),
+    'INDEX': (INDEX_SHEET_URL, 300),
+    'STOCK_MOVEMENTS': (STOCK_MOVEMENTS_SHEET_URL, 60),
+    'PAYMENTS': (PAYMENTS_SHEET_URL, 30),
+}
+# Tabs whose rows pages edit by row_id; ids for rows typed straight into the sheet come from /api/assign_row_ids
+ROW_ID_TABS = {
+    'INVENTORY': INVENTORY_SHEET_URL,
+    'SOLD_ITEMS': SOLD_ITEMS_SHEET_URL,
+    'USED_FREEBIE': USED_FREEBIE_SHEET_URL,
+}
+# Tabs that /export/<tab>.csv|.xlsx can download: (sheet URL, date column for ?start=&end=, tab title)
+EXPORT_TABS = {
+    'inventory': (INVENTORY_SHEET_URL, 'date_added', 'Inventory'),
+    'sold_items': (SOLD_ITEMS_SHEET_URL, 'date_sold', 'Sold Items'),
+    'invoices': (INVOICES_SHEET_URL, 'invoice_date', 'Invoices'),
+    'customers': (CUSTOMERS_SHEET_URL, 'last_order_date', 'Customers'),
+    'used_freebie': (USED_FREEBIE_SHEET_URL, 'date_used', 'Used Freebie'),
+    'index': (INDEX_SHEET_URL, None, 'INDEX'),
+    'stock_movements': (STOCK_MOVEMENTS_SHEET_URL, 'timestamp', 'Stock Movements'),
+    'payments': (PAYMENTS_SHEET_URL, 'timestamp', 'Payments'),
+}
+SNAPSHOT_BACKGROUND_REFRESH = os.getenv('SNAPSHOT_BACKGROUND_REFRESH', 'true').strip().lower() in ['true', '1', 'yes']
+for _sheet_name, (_sheet_url, _) in SNAPSHOT_REFRESH_DEFAULTS.items():
+    SHEETS_METRICS.register_sheet(_sheet_url, _sheet_name)
+snapshot_refresher = None
+if snapshot_store is not None and SNAPSHOT_BACKGROUND_REFRESH:
+    snapshot_refresher = SnapshotRefresher(snapshot_store, _load_sheet, {
+        url: float(os.getenv(f'SNAPSHOT_REFRESH_{name}_SECONDS', default))
+        for name, (url, default) in SNAPSHOT_REFRESH_DEFAULTS.items()
+    })
+
+# Duplicate add_product submissions: fingerprints of recent purchases, shared by workers via the cache file
+DUPLICATE_WINDOW_MINUTES = float(os.getenv('DUPLICATE_WINDOW_MINUTES', '2'))
+recent_submissions = RecentSubmissions(DUPLICATE_WINDOW_MINUTES * 60, store=shared_db)
+
+# Idempotency-Key: a retried POST gets the stored response of the first attempt instead of running again
+IDEMPOTENCY_TTL_HOURS = float(os.getenv('IDEMPOTENCY_TTL_HOURS', '24'))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv('IDEMPOTENCY_MAX_KEYS', '10000'))
+idempotency_keys = IdempotencyStore(IDEMPOTENCY_TTL_HOURS * 3600, IDEMPOTENCY_MAX_KEYS, store=shared_db)
+
+# Stock movements: written as appends, queried by lot/product through an index extended as rows arrive
+stock_movement_log = StockMovementLog(STOCK_MOVEMENTS_SHEET_URL)
+_stock_movement_index = StockMovementIndex()
+_stock_movement_index_lock = threading.Lock()
+
+
+def _get_stock_movement_index():
+    with _stock_movement_index_lock:
+        if STOCK_MOVEMENTS_SHEET_URL:
+            _stock_movement_index.update(_read_snapshot(STOCK_MOVEMENTS_SHEET_URL))
+        return _stock_movement_index
+
+
+# Payment ledger: one appended row per payment; paid totals come from a per-invoice running sum
+payment_ledger = PaymentLedger(PAYMENTS_SHEET_URL)
+_payment_index = PaymentIndex()
+_payment_index_lock = threading.Lock()
+
+
+def _get_payment_index():
+    """The payment index, or None while no ledger is configured (payments then live on the invoice rows)."""
+    if not PAYMENTS_SHEET_URL:
+        return None
+    with _payment_index_lock:
+        return _payment_index.update(_read_snapshot(PAYMENTS_SHEET_URL))
+
+
+def _invoice_payment_state(row, payment_index):
+    """(amount paid, payment history, latest reference) of an invoice, not capped at its total.
+
+    The amount_paid/payment_history columns hold payments recorded before the ledger existed;
+    ledger entries for the invoice are added on top.
+    """
+    amount_paid = _to_float(row.get('amount_paid', 0))
+    history = _parse_payment_history(row.get('payment_history', '[]'))
+    reference = str(row.get('payment_reference', '') or '').strip()
+    if payment_index is not None:
+        key = invoice_key(row.get('invoice_number', ''), row.get('created_at', ''))
+        amount_paid += payment_index.paid(key)
+        history += [entry for entry in payment_index.history(key) if entry['amount'] > 0]
+        reference = payment_index.last_reference.get(key, reference)
+    return amount_paid, history, reference
+
+
+# Product autocomplete index, rebuilt only when the INDEX/Inventory names change
+PRODUCT_INDEX_TTL_SECONDS = float(os.getenv('PRODUCT_INDEX_TTL_SECONDS', '60'))
+_product_index = ProductNameIndex()
+_product_index_checked_at = 0.0
+_product_index_lock = threading.Lock()
+
+
+def _sheet_product_names(df):
+    """Extract product names from a sheet (product_name column, else first column)."""
+    if df is None or df.empty or len(df.columns) == 0:
+        return []
+    column = df['product_name'] if 'product_name' in df.columns else df.iloc[:, 0]
+    return [str(p).strip() for p in column.dropna().unique().tolist() if str(p).strip()]
+
+
+def _get_product_index(force=False):
+    """Return the product name index, re-checking the sheets at most once per TTL."""
+    global _product_index, _product_index_checked_at
+    with _product_index_lock:
+        if not force and (time.monotonic() - _product_index_checked_at) < PRODUCT_INDEX_TTL_SECONDS:
+            return _product_index
+        names = []
+        try:
+            if INDEX_SHEET_URL:
+                names.extend(_sheet_product_names(_read_snapshot(INDEX_SHEET_URL)))
+            if INVENTORY_SHEET_URL:
+                inventory_df = _read_snapshot(INVENTORY_SHEET_URL)
+                if 'product_name' in inventory_df.columns:
+                    names.extend(_sheet_product_names(inventory_df[['product_name']]))
+        except Exception as e:
+            logger.warning(f"Could not refresh product index: {str(e)}", exc_info=True)
+            return _product_index
+        _product_index_checked_at = time.monotonic()
+        if names_signature(names) != _product_index.signature:
+            _product_index = ProductNameIndex(names)
+            logger.info(f"Rebuilt product index with {len(_product_index)} names")
+        return _product_index
+
+
+# Optional warm-up: authenticate and prefetch the autocomplete sheets once the server is listening
+WARM_UP_ON_START = os.getenv('WARM_UP_ON_START', 'true').strip().lower() in ['true', '1', 'yes']
+
+
+def warm_up():
+    """Authenticate with Google and prime the caches so the first user request is not the slow one."""
+    started = time.perf_counter()
+    try:
+        if not connector.warm_up():
+            logger.info("Warm-up skipped: Google Sheets client not configured")
+            return False
+        _get_product_index(force=True)
+        logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+        return True
+    except Exception as e:
+        logger.warning(f"Warm-up failed, first requests will initialize lazily: {str(e)}")
+        return False
+
+
+def start_warm_up():
+    """Run warm_up() in a background thread so it never delays binding the port."""
+    if not WARM_UP_ON_START:
+        return None
+    thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+@app.before_request
+def _start_request_metrics():
+    SHEETS_METRICS.start_request(request.endpoint)
+
+
+def _idempotency_body():
+    """Request body for the key fingerprint; multipart uploads by field and file content (boundaries vary per send)."""
+    if request.mimetype != 'multipart/form-data':
+        return request.get_data(cache=True)
+    parts = [f"{name}={value}".encode('utf-8') for name, value in sorted(request.form.items(multi=True))]
+    for name, upload in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+        parts.append(f"{name}:{upload.filename}:".encode('utf-8') + upload.stream.read())
+        upload.stream.seek(0)
+    return b'\x00'.join(parts)
+
+
+@app.before_request
+def _check_idempotency_key():
+    """Replay the response of a POST already completed under the same Idempotency-Key."""
+    key = request.headers.get('Idempotency-Key', '').strip()
+    if request.method != 'POST' or not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        return jsonify({'success': False, 'message': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), 400
+    fingerprint = request_fingerprint(request.method, request.full_path, _idempotency_body())
+    try:
+        state, token, stored = idempotency_keys.begin(key, fingerprint)
+    except Exception as e:
+        logger.warning(f"Idempotency store unavailable, handling {request.endpoint} without it: {str(e)}")
+        return None
+    if state == 'replay':
+        status, mimetype, body = stored
+        response = app.response_class(body, status=status, mimetype=mimetype)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    if state == 'in_progress':
+        return jsonify({'success': False, 'message': 'This request is still being processed. Please wait a moment and refresh.'}), 409
+    if state == 'mismatch':
+        return jsonify({'success': False, 'message': 'This Idempotency-Key was already used for a different request'}), 422
+    g.idempotency_claim = (key, token)
+    return None
+
+
+def _settle_idempotency_key(response=None):
+    """Store a successful response under its key; release the key of anything else (nothing was saved)."""
+    claim = g.pop('idempotency_claim', None)
+    if claim is None:
+        return
+    key, token = claim
+    try:
+        if response is not None and 200 <= response.status_code < 300 and not response.is_streamed:
+            idempotency_keys.finish(key, token, response.status_code, response.mimetype, response.get_data())
+        else:
+            idempotency_keys.abandon(key, token)
+    except Exception as e:
+        logger.warning(f"Could not record Idempotency-Key for {request.endpoint}: {str(e)}")
+
+
+@app.after_request
+def _store_idempotent_response(response):
+    _settle_idempotency_key(response)
+    return response
+
+
+@app.teardown_request
+def _release_idempotency_key(exc=None):
+    _settle_idempotency_key()
+
+
+@app.after_request
+def _add_timing_headers(response):
+    """Report how much of the request was spent talking to Google Sheets."""
+    totals = SHEETS_METRICS.finish_request()
+    if totals is not None:
+        total_ms = (time.perf_counter() - totals.started) * 1000
+        response.headers['Server-Timing'] = (
+            f'sheets;dur={totals.seconds * 1000:.1f};desc="{totals.calls} calls", total;dur={total_ms:.1f}'
+        )
+        response.headers['X-Sheets-Calls'] = str(totals.calls)
+        response.headers['X-Sheets-Bytes'] = str(totals.bytes)
+    return response
+
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN') or None
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+
+def _metrics_allowed():
+    """With METRICS_TOKEN set, scrapers send it as a Bearer token; without it only loopback clients are served."""
+    if METRICS_TOKEN:
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode())
+    return request.remote_addr in LOOPBACK_ADDRESSES
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics for this worker: Sheets API calls, snapshot ages and write conflicts"""
+    if not _metrics_allowed():
+        return app.response_class('Forbidden\n', status=403, mimetype='text/plain')
+    lines = [SHEETS_METRICS.render().rstrip('\n')]
+    lines += [
+        '# HELP sheet_snapshot_age_seconds Seconds since each sheet snapshot was downloaded.',
+        '# TYPE sheet_snapshot_age_seconds gauge',
+    ]
+    if snapshot_store is not None:
+        for name, (url, _) in SNAPSHOT_REFRESH_DEFAULTS.items():
+            age = snapshot_store.age(url) if url else None
+            if age is not None:
+                lines.append(f'sheet_snapshot_age_seconds{{sheet="{name}"}} {age:.3f}')
+        lines += [
+            '# HELP sheet_snapshot_cache_events_total Snapshot cache hits, misses and refreshes in this worker.',
+            '# TYPE sheet_snapshot_cache_events_total counter',
+        ]
+        for event, count in sorted(snapshot_store.stats.items()):
+            lines.append(f'sheet_snapshot_cache_events_total{{event="{event}"}} {count}')
+    lines += [
+        '# HELP sheet_write_conflicts_total Optimistic concurrency conflicts, retries and give-ups.',
+        '# TYPE sheet_write_conflicts_total counter',
+    ]
+    for event, count in sorted(CONCURRENCY_STATS.items()):
+        lines.append(f'sheet_write_conflicts_total{{event="{event}"}} {count}')
+    lines += [
+        '# HELP log_records_dropped_total Log records discarded because the log queue was full.',
+        '# TYPE log_records_dropped_total counter',
+        f'log_records_dropped_total {dropped_records()}',
+    ]
+    return app.response_class('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
 
 @app.route('/')
 def index():
@@ -458,7 +1235,7 @@ def inventory():
     """Main inventory management page"""
     try:
         if INVENTORY_SHEET_URL:
-            df = connector.read_from_sheets(INVENTORY_SHEET_URL)
+            df = _read_snapshot(INVENTORY_SHEET_URL)
             
             # Handle empty DataFrame
             if df.empty:
@@ -482,7 +1259,7 @@ def inventory():
                     else:
                         df['total_bought_quantity'] = 0
                 
-                # Store original index before sorting
+                # Sheet positions, for rows the status form cannot address by row_id yet
                 df['original_index'] = df.index
                 
                 # Sort by product_name alphabetically, then by date_added (newest first for same product)
@@ -523,45 +1300,8 @@ def inventory():
                 
                 inventory_items = df.to_dict('records')
                 
-                # Calculate product summary (grouped by product_name) - optimized
-                product_summary = {}
-                for item in inventory_items:
-                    product_name = str(item.get('product_name', 'Unknown')).strip()
-                    if not product_name or product_name == 'Unknown':
-                        continue
-                    
-                    if product_name not in product_summary:
-                        product_summary[product_name] = {
-                            'product_name': product_name,
-                            'total_bought': 0,
-                            'total_remaining': 0,
-                            'entry_count': 0,
-                            'weighted_cost_sum': 0.0,
-                            'weighted_cost_qty': 0
-                        }
-                    # Safely convert quantities - use total_bought_quantity instead of quantity
-                    try:
-                        total_bought_val = item.get('total_bought_quantity', item.get('quantity', 0))
-                        remaining_val = item.get('remaining_qty', total_bought_val)
-                        total_bought = int(float(str(total_bought_val))) if total_bought_val else 0
-                        remaining = int(float(str(remaining_val))) if remaining_val else 0
-                    except (ValueError, TypeError):
-                        total_bought = 0
-                        remaining = 0
-                    cost_per_unit = _safe_float(item.get('total_cost_per_unit', 0), 0.0)
-                    product_summary[product_name]['total_bought'] += total_bought
-                    product_summary[product_name]['total_remaining'] += remaining
-                    product_summary[product_name]['entry_count'] += 1
-                    if remaining > 0:
-                        product_summary[product_name]['weighted_cost_sum'] += (cost_per_unit * remaining)
-                        product_summary[product_name]['weighted_cost_qty'] += remaining
-                for pname in product_summary:
-                    w_qty = product_summary[pname].get('weighted_cost_qty', 0)
-                    w_sum = product_summary[pname].get('weighted_cost_sum', 0.0)
-                    product_summary[pname]['normalized_cost_per_unit'] = (w_sum / w_qty) if w_qty > 0 else 0.0
-                
-                # Convert summary dict to list sorted by product name
-                product_summary_list = sorted(product_summary.values(), key=lambda x: x['product_name'].lower())
+                # Per-product summary (bought, remaining, weighted cost of remaining stock)
+                product_summary_list = CostIndex.from_inventory(df).summary()
         else:
             inventory_items = []
             product_summary_list = []
@@ -587,72 +1327,114 @@ def inventory():
         product_summary_list = []
         flash(user_msg, "error")
     
-    # Load product names from INDEX sheet product_name column for dropdown (cached per request)
-    product_names = []
-    try:
-        if INDEX_SHEET_URL:
-            index_df = connector.read_from_sheets(INDEX_SHEET_URL)
-            # Get product names from product_name column (or first column if column doesn't exist)
-            if not index_df.empty and len(index_df.columns) > 0:
-                if 'product_name' in index_df.columns:
-                    product_names = index_df['product_name'].dropna().unique().tolist()
-                else:
-                    # Fallback to first column if product_name column doesn't exist
-                    product_names = index_df.iloc[:, 0].dropna().unique().tolist()
-                # Filter out empty strings
-                product_names = [p for p in product_names if str(p).strip()]
-                logger.info(f"Loaded {len(product_names)} product names from INDEX sheet")
-            else:
-                logger.warning("INDEX sheet is empty or has no columns")
-    except Exception as e:
-        logger.warning(f"Could not load INDEX sheet: {str(e)}", exc_info=True)
-        product_names = []
-    
     # Ensure product_summary_list is always defined (in case of errors above)
     if 'product_summary_list' not in locals():
-        # Calculate product summary (grouped by product_name) if not already calculated
-        product_summary = {}
-        for item in inventory_items:
-            product_name = str(item.get('product_name', 'Unknown')).strip()
-            if not product_name or product_name == 'Unknown':
-                continue
-                
-            if product_name not in product_summary:
-                product_summary[product_name] = {
-                    'product_name': product_name,
-                    'total_bought': 0,
-                    'total_remaining': 0,
-                    'entry_count': 0,
-                    'weighted_cost_sum': 0.0,
-                    'weighted_cost_qty': 0
-                }
-            # Safely convert quantities - use total_bought_quantity instead of quantity
-            try:
-                total_bought_val = item.get('total_bought_quantity', item.get('quantity', 0))
-                remaining_val = item.get('remaining_qty', total_bought_val)
-                total_bought = int(float(str(total_bought_val))) if total_bought_val else 0
-                remaining = int(float(str(remaining_val))) if remaining_val else 0
-            except (ValueError, TypeError):
-                total_bought = 0
-                remaining = 0
-            cost_per_unit = _safe_float(item.get('total_cost_per_unit', 0), 0.0)
-            product_summary[product_name]['total_bought'] += total_bought
-            product_summary[product_name]['total_remaining'] += remaining
-            product_summary[product_name]['entry_count'] += 1
-            if remaining > 0:
-                product_summary[product_name]['weighted_cost_sum'] += (cost_per_unit * remaining)
-                product_summary[product_name]['weighted_cost_qty'] += remaining
-        for pname in product_summary:
-            w_qty = product_summary[pname].get('weighted_cost_qty', 0)
-            w_sum = product_summary[pname].get('weighted_cost_sum', 0.0)
-            product_summary[pname]['normalized_cost_per_unit'] = (w_sum / w_qty) if w_qty > 0 else 0.0
-        
-        # Convert summary dict to list sorted by product name
-        product_summary_list = sorted(product_summary.values(), key=lambda x: x['product_name'].lower())
+        product_summary_list = CostIndex.from_inventory(pd.DataFrame(inventory_items)).summary()
     
-    return render_template('inventory.html', items=inventory_items, product_names=product_names, product_summary=product_summary_list)
+    return render_template('inventory.html', items=inventory_items, product_summary=product_summary_list)
+
+@app.route('/api/products/suggest')
+def suggest_products():
+    """Ranked product name suggestions for autocomplete inputs"""
+    try:
+        query = request.args.get('q', '')
+        limit = min(max(_safe_int(request.args.get('limit', 7), 7), 1), 50)
+        suggestions = _get_product_index().suggest(query, limit=limit)
+        return jsonify({'success': True, 'suggestions': suggestions})
+    except Exception as e:
+        logger.error(f"Error suggesting products: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': str(e), 'suggestions': []}), 400
+
+@app.route('/api/product_costs')
+def product_costs():
+    """Per-product stock totals and weighted-average cost of remaining stock, for reporting"""
+    try:
+        if not INVENTORY_SHEET_URL:
+            return jsonify({'success': False, 'message': 'Inventory sheet is not configured'}), 400
+        return jsonify({
+            'success': True,
+            'cost_policy': COST_FLOW_POLICY,
+            'products': CostIndex.from_inventory(_read_snapshot(INVENTORY_SHEET_URL)).summary()
+        })
+    except Exception as e:
+        logger.error(f"Error computing product costs: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+@app.route('/api/stock_movements')
+def stock_movements():
+    """Movement history of one lot (?lot=<product>|<date_added>) or product (?product=<name>), newest first"""
+    try:
+        if not STOCK_MOVEMENTS_SHEET_URL:
+            return jsonify({'success': False, 'message': 'Stock movements sheet is not configured'}), 400
+        lot = request.args.get('lot', '')
+        product = request.args.get('product', '')
+        if not lot and not product:
+            return jsonify({'success': False, 'message': 'Pass a lot or product to look up'}), 400
+        limit = min(max(_safe_int(request.args.get('limit', 200), 200), 1), 5000)
+        index = _get_stock_movement_index()
+        rows = index.for_lot(lot) if lot else index.for_product(product)
+        rows = rows.iloc[::-1].head(limit)
+        return jsonify({'success': True, 'movements': rows.fillna('').to_dict(orient='records')})
+    except Exception as e:
+        logger.error(f"Error loading stock movements: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+@app.route('/api/snapshots')
+def snapshot_status():
+    """Age of each sheet snapshot (seconds) plus cache/refresher counters, for monitoring"""
+    sheets = {}
+    for name, (url, _) in SNAPSHOT_REFRESH_DEFAULTS.items():
+        if not url:
+            continue
+        age = snapshot_store.age(url) if snapshot_store is not None else None
+        interval = snapshot_refresher.intervals.get(url) if snapshot_refresher is not None else None
+        sheets[name] = {
+            'age_seconds': None if age is None else round(age, 3),
+            'refresh_interval_seconds': interval
+        }
+    return jsonify({
+        'success': True,
+        'enabled': snapshot_store is not None,
+        'background_refresh': snapshot_refresher is not None,
+        'sheets': sheets,
+        'cache_stats': dict(snapshot_store.stats) if snapshot_store is not None else {},
+        'refresher_stats': dict(snapshot_refresher.stats) if snapshot_refresher is not None else {}
+    })
+
+@app.route('/export/<tab>.<any(csv, xlsx):fmt>')
+def export_tab(tab, fmt):
+    """Download a tab from the latest snapshot as CSV or XLSX, streamed in chunks.
+
+    Optional filters: ?start=YYYY-MM-DD&end=YYYY-MM-DD on the tab's date column, and
+    ?columns=a,b,c to choose (and order) the columns.
+    """
+    try:
+        if tab not in EXPORT_TABS:
+            return jsonify({'success': False, 'message': f"Unknown tab '{tab}'. Use one of: {', '.join(EXPORT_TABS)}"}), 404
+        url, date_column, title = EXPORT_TABS[tab]
+        if not url:
+            return jsonify({'success': False, 'message': f'{title} sheet is not configured'}), 400
+        columns = [col.strip() for col in request.args.get('columns', '').split(',') if col.strip()]
+        df = filter_rows(_read_snapshot(url), date_column, request.args.get('start'), request.args.get('end'), columns)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error exporting {tab}: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': f'Unable to export {tab}. Please try again.'}), 400
+
+    filename = f"{tab}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    if fmt == 'csv':
+        body, mimetype = csv_chunks(df), 'text/csv'
+    else:
+        body, mimetype = xlsx_chunks(df, title), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    logger.info(f"Exporting {len(df)} {tab} rows as {fmt}")
+    return app.response_class(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Export-Rows': str(len(df))
+    })
 
 @app.route('/api/add_product', methods=['POST'])
+@retry_on_sheet_conflict
 def add_product():
     """Add a new product to inventory"""
     try:
@@ -688,59 +1470,22 @@ def add_product():
         }
         
         if INVENTORY_SHEET_URL:
-            # Read existing data
-            df = connector.read_from_sheets(INVENTORY_SHEET_URL)
-            # Handle empty DataFrame - ensure all columns exist (matching your spreadsheet structure)
-            if df.empty:
-                df = pd.DataFrame(columns=['product_name', 'total_price', 'shipping_admin_fee', 'total_cost_per_unit', 'quantity', 'total_bought_quantity', 'remaining_qty', 'supplier', 'date_added', 'remarks', 'status', 'selling_price', 'profit', 'tithe', 'profit_after_tithe', 'date_sold'])
-            else:
-                # Ensure all required columns exist in existing DataFrame
-                required_columns = ['product_name', 'total_price', 'shipping_admin_fee', 'total_cost_per_unit', 'quantity', 'total_bought_quantity', 'remaining_qty', 'supplier', 'date_added', 'remarks', 'status', 'selling_price', 'profit', 'tithe', 'profit_after_tithe', 'date_sold']
-                for col in required_columns:
-                    if col not in df.columns:
-                        df[col] = None
-                
-                # Ensure proper data types
-                numeric_cols = ['total_price', 'shipping_admin_fee', 'total_cost_per_unit', 'quantity', 'total_bought_quantity', 'remaining_qty', 'selling_price', 'profit', 'tithe', 'profit_after_tithe']
-                for col in numeric_cols:
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                
-                # Check for duplicate entry (same product_name, total_price, shipping_admin_fee, quantity, supplier within last 2 minutes)
-                # This helps prevent accidental double entries - reduced time window for faster response
-                recent_time = (datetime.now() - pd.Timedelta(minutes=2)).strftime('%Y-%m-%d %H:%M:%S')
-                if 'date_added' in df.columns and len(df) > 0:
-                    df['date_added_parsed'] = pd.to_datetime(df['date_added'], errors='coerce')
-                    recent_mask = df['date_added_parsed'] >= pd.to_datetime(recent_time)
-                    recent_df = df[recent_mask]
-                    
-                    # Check for exact duplicates
-                    if len(recent_df) > 0:
-                        # Handle supplier comparison (can be None/NaN/empty string)
-                        supplier_col = recent_df['supplier'].fillna('') if 'supplier' in recent_df.columns else pd.Series([''] * len(recent_df))
-                        supplier_to_check = supplier if supplier else ''
-                        
-                        # Normalize numeric values for comparison (handle float precision issues)
-                        duplicate_mask = (
-                            (recent_df['product_name'].astype(str).str.strip() == str(product_name).strip()) &
-                            (abs(recent_df['total_price'].astype(float) - float(total_price)) < 0.01) &
-                            (abs(recent_df['shipping_admin_fee'].astype(float) - float(shipping_admin_fee)) < 0.01) &
-                            (recent_df['quantity'].astype(int) == int(quantity)) &
-                            (supplier_col.astype(str).str.strip() == str(supplier_to_check).strip())
-                        )
-                        
-                        if duplicate_mask.any():
-                            logger.warning(f"Potential duplicate entry detected for {product_name} (supplier: {supplier})")
-                            return jsonify({'success': False, 'message': 'A similar entry was added recently (within last 2 minutes). Please check if this is a duplicate.'}), 400
-                    
-                    df = df.drop('date_added_parsed', axis=1)
-            
-            # Add new row using pd.concat (append is deprecated)
-            new_df = pd.DataFrame([new_product])
-            df = pd.concat([df, new_df], ignore_index=True)
-            # Write back
-            connector.write_to_sheets(df, INVENTORY_SHEET_URL)
+            # Double submissions: the same purchase within the window is refused (checked without reading the sheet)
+            fingerprint = purchase_fingerprint(product_name, total_price, shipping_admin_fee, quantity, supplier)
+            claim = recent_submissions.claim(fingerprint)
+            if claim is None:
+                logger.warning(f"Potential duplicate entry detected for {product_name} (supplier: {supplier})")
+                return jsonify({'success': False, 'message': f'A similar entry was added recently (within last {DUPLICATE_WINDOW_MINUTES:g} minutes). Please check if this is a duplicate.'}), 400
+            try:
+                uow = _new_unit_of_work()
+                _stage_append(uow, INVENTORY_SHEET_URL, pd.DataFrame([new_product]))
+                _commit_unit_of_work(uow)
+            except Exception:
+                recent_submissions.release(fingerprint, claim)
+                raise
             logger.info(f"Added product: {product_name} (supplier: {supplier})")
+            audit('product_added', product_name=product_name, supplier=supplier,
+                  quantity=new_product.get('quantity'), total_price=new_product.get('total_price'))
         
         return jsonify({'success': True, 'message': 'Product added successfully'})
     except KeyError as e:
@@ -758,48 +1503,70 @@ def add_product():
         logger.error(f"Error adding product: {error_msg}", exc_info=True)
         return jsonify({'success': False, 'message': user_msg}), 400
 
+@app.route('/api/import_inventory', methods=['POST'])
+@retry_on_sheet_conflict
+def import_inventory():
+    """Add many purchases from a CSV (multipart 'file' field or a text/csv body) with one append.
+
+    Valid rows are imported and invalid or duplicate ones (repeated in the file, or added within the
+    Add Product duplicate window) are reported per CSV line.
+    ?dry_run=1 only validates; ?allow_duplicates=1 skips the duplicate check.
+    """
+    try:
+        if not INVENTORY_SHEET_URL:
+            return jsonify({'success': False, 'message': 'Inventory sheet is not configured'}), 400
+        upload = request.files.get('file')
+        stream = upload.stream if upload is not None else io.BytesIO(request.get_data(cache=True))
+        stream.seek(0)  # a conflict retry reads the upload again
+        dry_run = request.args.get('dry_run', '').lower() in ['1', 'true', 'yes']
+        allow_duplicates = request.args.get('allow_duplicates', '').lower() in ['1', 'true', 'yes']
+
+        uow = _new_unit_of_work()
+        result, claims = stage_import(uow, INVENTORY_SHEET_URL, stream, recent=recent_submissions,
+                                      allow_duplicates=allow_duplicates, dry_run=dry_run)
+        if uow.pending:
+            try:
+                _commit_unit_of_work(uow)
+            except Exception:
+                release_claims(recent_submissions, claims)
+                raise
+            logger.info(f"Imported {result['accepted']} inventory rows ({result['rejected']} rejected)")
+            audit('inventory_imported', source=upload.filename if upload is not None else 'request body',
+                  accepted=result['accepted'], rejected=result['rejected'])
+        verb = 'valid' if dry_run else 'imported'
+        return jsonify({
+            'success': True,
+            'message': f"{result['accepted']} rows {verb}, {result['rejected']} rejected",
+            **result
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error importing inventory: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': f"Unable to import inventory. Please try again. ({str(e)[:80]})"}), 400
+
 @app.route('/api/update_status', methods=['POST'])
+@retry_on_sheet_conflict
 def update_status():
     """Update product status (used, freebie, raffled, sold)"""
     try:
         data = request.json
-        # Convert product_id to int (might come as string from form)
-        try:
-            product_id = int(data.get('product_id'))
-        except (ValueError, TypeError):
-            return jsonify({'success': False, 'message': 'Invalid product ID. Please refresh the page and try again.'}), 400
-        
         new_status = data.get('status')
         selling_price = data.get('selling_price')
         quantity_used = int(data.get('quantity_used', 1))  # How many items were sold/used/given
         remarks = data.get('remarks', '')
         
         if INVENTORY_SHEET_URL:
-            df = connector.read_from_sheets(INVENTORY_SHEET_URL)
-            
-            # Validate product_id is within bounds (product_id is the original DataFrame index)
+            uow = _new_unit_of_work()
+            # Only the addressed row is fetched, located by its stable row_id (positions move when rows are added or sorted);
+            # rows without an id yet come by product_id, their original_index on the inventory page
+            df = _read_addressed_row(uow, INVENTORY_SHEET_URL, data, 'product_id')
             if df.empty:
-                return jsonify({'success': False, 'message': 'Inventory is empty. Please refresh the page and try again.'}), 400
-            
-            # Find the row by original_index column (stored before sorting)
-            if 'original_index' in df.columns:
-                # Convert product_id to same type as original_index for comparison
-                matching_rows = df[df['original_index'].astype(int) == int(product_id)]
-                if matching_rows.empty:
-                    logger.error(f"Product with original_index {product_id} not found. Available indices: {df['original_index'].tolist()}")
-                    return jsonify({'success': False, 'message': 'Product not found. Please refresh the page and try again.'}), 400
-                # Get the actual DataFrame index of the matching row
-                actual_index = matching_rows.index[0]
-                logger.info(f"Found product: original_index={product_id}, actual_index={actual_index}, product_name={df.at[actual_index, 'product_name']}")
-            else:
-                # Fallback: use product_id as direct index (for backward compatibility)
-                if product_id < 0 or product_id >= len(df):
-                    return jsonify({'success': False, 'message': 'Product not found. Please refresh the page and try again.'}), 400
-                actual_index = product_id
-                logger.info(f"Using fallback: product_id={product_id}, product_name={df.at[actual_index, 'product_name']}")
-            
-            # Use actual_index for all DataFrame operations
-            product_id = actual_index
+                logger.error(f"Product {data.get('row_id') or data.get('product_id')} not found")
+                return jsonify({'success': False, 'message': 'Product not found. Please refresh the page and try again.'}), 400
+            product_id = df.index[0]
+            # Inventory columns this update changes; only those cells of the row are written
+            changed_columns = ['remaining_qty', 'remarks', 'status']
             
             # Helper functions to safely convert values from Google Sheets
             def safe_int(value, default=0):
@@ -838,43 +1605,18 @@ def update_status():
                 # Update quantity to reflect remaining (if column exists)
                 if 'quantity' in df.columns:
                     df.at[product_id, 'quantity'] = new_remaining
+                    changed_columns.append('quantity')
             
-            # Track status history
-            import json
-            current_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            status_history_entry = {
-                'status': new_status,
-                'timestamp': current_timestamp,
-                'remarks': remarks,
-                'quantity_used': quantity_used
-            }
-            
-            # Get existing status history or initialize empty list
-            if 'status_history' not in df.columns:
-                df['status_history'] = ''
-            
-            existing_history = df.at[product_id, 'status_history']
-            if pd.isna(existing_history) or existing_history == '' or existing_history == 'nan':
-                history_list = []
-            else:
-                try:
-                    # Try to parse as JSON string
-                    if isinstance(existing_history, str):
-                        history_list = json.loads(existing_history)
-                    else:
-                        history_list = existing_history if isinstance(existing_history, list) else []
-                except (json.JSONDecodeError, ValueError, TypeError):
-                    history_list = []
-            
-            # Add new entry to history
-            history_list.append(status_history_entry)
-            
-            # Store history as JSON string
-            df.at[product_id, 'status_history'] = json.dumps(history_list)
+            # Record the action as one appended row in the stock movements log
+            lot_movement = movement(
+                inventory_lot_key(df, product_id), df.at[product_id, 'product_name'], new_status, quantity_used,
+                safe_int(df.at[product_id, 'remaining_qty'], 0) if 'remaining_qty' in df.columns else current_remaining,
+                remarks=remarks
+            )
             
             # Update current status - don't store action status, calculate from remaining_qty
             # Status will be calculated as "in_stock" or "out_of_stock" based on remaining_qty
-            # We still track the action (sold/used/freebie/raffled) in status_history
+            # We still track the action (sold/used/freebie/raffled) in the stock movements log
             # But the status column should reflect stock availability
             # Don't update status column here - it will be calculated based on remaining_qty
             df.at[product_id, 'remarks'] = remarks
@@ -899,13 +1641,10 @@ def update_status():
                     df.at[product_id, 'tithe'] = tithe
                     df.at[product_id, 'profit_after_tithe'] = profit_after_tithe
                     df.at[product_id, 'date_sold'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    changed_columns += ['selling_price', 'profit', 'tithe', 'profit_after_tithe', 'date_sold']
                     
-                    # Also add to sold items sheet
+                    # Also add to sold items sheet (appended, matching your spreadsheet structure)
                     if SOLD_ITEMS_SHEET_URL:
-                        sold_df = connector.read_from_sheets(SOLD_ITEMS_SHEET_URL)
-                        # Handle empty DataFrame - match your spreadsheet structure
-                        if sold_df.empty:
-                            sold_df = pd.DataFrame(columns=['product_name', 'quantity', 'total_cost_per_unit', 'selling_price', 'total_cost', 'profit', 'tithe', 'profit_after_tithe', 'tithe_kept', 'remarks', 'date_sold'])
                         sold_item = {
                             'product_name': df.at[product_id, 'product_name'],
                             'quantity': quantity_used,
@@ -919,22 +1658,11 @@ def update_status():
                             'remarks': remarks,
                             'date_sold': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                         }
-                        new_sold_df = pd.DataFrame([sold_item])
-                        # Ensure tithe_kept column is string type in existing DataFrame
-                        if 'tithe_kept' in sold_df.columns:
-                            sold_df['tithe_kept'] = sold_df['tithe_kept'].astype(str)
-                        sold_df = pd.concat([sold_df, new_sold_df], ignore_index=True)
-                        # Ensure tithe_kept column remains string type after concat
-                        sold_df['tithe_kept'] = sold_df['tithe_kept'].astype(str)
-                        connector.write_to_sheets(sold_df, SOLD_ITEMS_SHEET_URL)
+                        _stage_append(uow, SOLD_ITEMS_SHEET_URL, pd.DataFrame([sold_item]))
                 
             # Track used/freebie items
             if new_status in ['used', 'freebie']:
                 if USED_FREEBIE_SHEET_URL:
-                    used_df = connector.read_from_sheets(USED_FREEBIE_SHEET_URL)
-                    if used_df.empty:
-                        used_df = pd.DataFrame(columns=['product_name', 'quantity', 'total_cost_per_unit', 'status', 'remarks', 'date_used'])
-                    
                     used_item = {
                         'product_name': df.at[product_id, 'product_name'],
                         'quantity': quantity_used,
@@ -943,12 +1671,15 @@ def update_status():
                         'remarks': remarks,
                         'date_used': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     }
-                    new_used_df = pd.DataFrame([used_item])
-                    used_df = pd.concat([used_df, new_used_df], ignore_index=True)
-                    connector.write_to_sheets(used_df, USED_FREEBIE_SHEET_URL)
+                    _stage_append(uow, USED_FREEBIE_SHEET_URL, pd.DataFrame([used_item]))
             
-            connector.write_to_sheets(df, INVENTORY_SHEET_URL)
-            logger.info(f"Updated product {product_id} status to {new_status}, remaining_qty: {df.at[product_id, 'remaining_qty']}")
+            row_id = _stage_addressed_row_update(uow, INVENTORY_SHEET_URL, data, 'product_id',
+                                                 {col: df.at[product_id, col] for col in changed_columns})
+            stock_movement_log.stage(uow, [lot_movement])
+            _commit_unit_of_work(uow)
+            logger.info(f"Updated product {row_id} status to {new_status}, remaining_qty: {df.at[product_id, 'remaining_qty']}")
+            audit('product_status_updated', row_id=row_id, status=new_status,
+                  remaining_qty=df.at[product_id, 'remaining_qty'])
             
         return jsonify({'success': True, 'message': 'Status updated successfully'})
     except KeyError as e:
@@ -966,12 +1697,47 @@ def update_status():
         logger.error(f"Error updating status: {error_msg}", exc_info=True)
         return jsonify({'success': False, 'message': user_msg}), 400
 
+@app.route('/api/update_status_bulk', methods=['POST'])
+@retry_on_sheet_conflict
+def update_status_bulk():
+    """Apply many status changes (sold, used, freebie, raffled) at once: all of them or none.
+
+    Body: {"actions": [{"row_id", "lot" or "product_id", "status", "quantity_used", "selling_price", "remarks"}, ...]}
+    """
+    try:
+        if not INVENTORY_SHEET_URL:
+            return jsonify({'success': False, 'message': 'Inventory sheet is not configured'}), 400
+        actions = (request.json or {}).get('actions')
+        if not isinstance(actions, list) or not actions:
+            return jsonify({'success': False, 'message': 'Pass a non-empty list of actions'}), 400
+
+        uow = _new_unit_of_work()
+        inventory_raw = uow.read_from_sheets(INVENTORY_SHEET_URL)
+        if inventory_raw.empty:
+            return jsonify({'success': False, 'message': 'Inventory is empty. Please refresh the page and try again.'}), 400
+        resolved, errors = _resolve_status_actions(_ensure_inventory_columns(inventory_raw.copy()), actions)
+        if errors:
+            return jsonify({
+                'success': False,
+                'message': f"{len(errors)} of {len(actions)} actions are invalid; nothing was updated",
+                'errors': errors
+            }), 400
+        results = _stage_status_actions(uow, inventory_raw, resolved)
+        _commit_unit_of_work(uow)
+        logger.info(f"Applied {len(results)} bulk status updates")
+        audit('product_status_bulk_updated', actions=len(results),
+              lots=sorted({result['lot'] for result in results}))
+        return jsonify({'success': True, 'message': f'{len(results)} status updates saved', 'results': results})
+    except Exception as e:
+        logger.error(f"Error applying bulk status updates: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': f"Unable to update statuses. Please try again. ({str(e)[:80]})"}), 400
+
 @app.route('/sold')
 def sold():
     """Sold items page with tithe tracking"""
     try:
         if SOLD_ITEMS_SHEET_URL:
-            df = connector.read_from_sheets(SOLD_ITEMS_SHEET_URL)
+            df = _read_snapshot(SOLD_ITEMS_SHEET_URL)
             sold_items = df.to_dict('records')
         else:
             sold_items = []
@@ -1002,27 +1768,25 @@ def sold():
                          tithe_unkept_total=tithe_unkept_total)
 
 @app.route('/api/update_tithe_status', methods=['POST'])
+@retry_on_sheet_conflict
 def update_tithe_status():
     """Update whether tithe has been kept"""
     try:
-        data = request.json
-        item_id = data.get('item_id')
-        tithe_kept = data.get('tithe_kept', False)
+        data = request.json or {}
+        # Convert boolean to string for Google Sheets compatibility
+        tithe_kept = 'True' if data.get('tithe_kept', False) else 'False'
         
         if SOLD_ITEMS_SHEET_URL:
-            df = connector.read_from_sheets(SOLD_ITEMS_SHEET_URL)
-            if item_id < len(df):
-                # Ensure tithe_kept column exists and is string type
-                if 'tithe_kept' not in df.columns:
-                    df['tithe_kept'] = 'False'
-                # Convert column to string type to avoid dtype issues
-                df['tithe_kept'] = df['tithe_kept'].astype(str)
-                # Convert boolean to string for Google Sheets compatibility
-                df.at[item_id, 'tithe_kept'] = 'True' if tithe_kept else 'False'
-                connector.write_to_sheets(df, SOLD_ITEMS_SHEET_URL)
-                logger.info(f"Updated tithe status for item {item_id} to {df.at[item_id, 'tithe_kept']}")
+            # Only the one cell is written; the sheet is neither downloaded nor rewritten (rows without an id go by item_id)
+            uow = _new_unit_of_work()
+            row_id = _stage_addressed_row_update(uow, SOLD_ITEMS_SHEET_URL, data, 'item_id', {'tithe_kept': tithe_kept})
+            _commit_unit_of_work(uow)
+            logger.info(f"Updated tithe status for sold row {row_id} to {tithe_kept}")
+            audit('tithe_status_updated', row_id=row_id, tithe_kept=tithe_kept)
         
         return jsonify({'success': True, 'message': 'Tithe status updated'})
+    except RowNotFoundError:
+        return jsonify({'success': False, 'message': 'Sold item not found. Please refresh the page and try again.'}), 404
     except Exception as e:
         logger.error(f"Error updating tithe status: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 400
@@ -1032,9 +1796,9 @@ def used_freebie():
     """Used and Freebie items page"""
     try:
         if USED_FREEBIE_SHEET_URL:
-            df = connector.read_from_sheets(USED_FREEBIE_SHEET_URL)
+            df = _read_snapshot(USED_FREEBIE_SHEET_URL)
             if not df.empty:
-                # Keep original row index so edit actions update correct sheet row.
+                # Keep the sheet position for rows without a row_id yet
                 df = df.reset_index(drop=False).rename(columns={'index': 'row_index'})
                 used_items = df.to_dict('records')
             else:
@@ -1058,11 +1822,11 @@ def used_freebie():
     return render_template('used_freebie.html', used_items=used, freebie_items=freebie)
 
 @app.route('/api/update_used_freebie_item', methods=['POST'])
+@retry_on_sheet_conflict
 def update_used_freebie_item():
     """Update used/freebie item details."""
     try:
         data = request.json or {}
-        row_index = int(data.get('row_index'))
         status = str(data.get('status', '')).strip().lower()
         quantity = int(float(data.get('quantity', 0) or 0))
         total_cost_per_unit = float(data.get('total_cost_per_unit', 0) or 0)
@@ -1077,21 +1841,20 @@ def update_used_freebie_item():
         if not USED_FREEBIE_SHEET_URL:
             return jsonify({'success': False, 'message': 'Used/Freebie sheet is not configured'}), 400
 
-        df = connector.read_from_sheets(USED_FREEBIE_SHEET_URL)
-        if df.empty or row_index < 0 or row_index >= len(df):
-            return jsonify({'success': False, 'message': 'Item not found'}), 404
-
-        df.at[row_index, 'status'] = status
-        df.at[row_index, 'quantity'] = quantity
-        df.at[row_index, 'total_cost_per_unit'] = total_cost_per_unit
-        df.at[row_index, 'remarks'] = remarks
-
-        if 'date_used' in df.columns:
-            df.at[row_index, 'date_used'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        connector.write_to_sheets(df, USED_FREEBIE_SHEET_URL)
-        logger.info(f"Updated used/freebie row {row_index} -> {status}")
+        uow = _new_unit_of_work()
+        row_id = _stage_addressed_row_update(uow, USED_FREEBIE_SHEET_URL, data, 'row_index', {
+            'status': status,
+            'quantity': quantity,
+            'total_cost_per_unit': total_cost_per_unit,
+            'remarks': remarks,
+            'date_used': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        _commit_unit_of_work(uow)
+        logger.info(f"Updated used/freebie row {row_id} -> {status}")
+        audit('used_freebie_updated', row_id=row_id, status=status)
         return jsonify({'success': True, 'message': 'Item updated successfully'})
+    except RowNotFoundError:
+        return jsonify({'success': False, 'message': 'Item not found'}), 404
     except Exception as e:
         logger.error(f"Error updating used/freebie item: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'message': str(e)}), 400
@@ -1102,7 +1865,8 @@ def invoices():
     import json
     try:
         if INVOICES_SHEET_URL:
-            df = connector.read_from_sheets(INVOICES_SHEET_URL)
+            df = _read_snapshot(INVOICES_SHEET_URL)
+            payment_index = _get_payment_index()
             if df.empty:
                 invoices = []
             else:
@@ -1121,6 +1885,10 @@ def invoices():
                         fulfilled_val = row.get('fulfilled', False)
                         if isinstance(fulfilled_val, str):
                             fulfilled_val = fulfilled_val.lower() in ['true', '1', 'yes']
+                        total_val = _to_float(row.get('total_amount', 0))
+                        amount_paid, payment_history, payment_reference = _invoice_payment_state(row, payment_index)
+                        amount_paid = max(0.0, min(amount_paid, total_val))
+                        paid_val = bool(paid_val) or (amount_paid >= total_val and total_val > 0)
                         
                         invoices_dict[group_key] = {
                             'invoice_number': invoice_num,
@@ -1132,9 +1900,9 @@ def invoices():
                             'created_at': row.get('created_at', ''),
                             'paid': bool(paid_val),
                             'fulfilled': bool(fulfilled_val),
-                            'amount_paid': _to_float(row.get('amount_paid', 0)),
-                            'payment_reference': str(row.get('payment_reference', '') or '').strip(),
-                            'payment_history': _parse_payment_history(row.get('payment_history', '[]')),
+                            'amount_paid': amount_paid,
+                            'payment_reference': payment_reference,
+                            'payment_history': payment_history,
                             'items_parsed': []
                         }
                     # Collect items for modal view
@@ -1184,7 +1952,7 @@ def invoices():
             invoices = []
         
         if CUSTOMERS_SHEET_URL:
-            customers_df = connector.read_from_sheets(CUSTOMERS_SHEET_URL)
+            customers_df = _read_snapshot(CUSTOMERS_SHEET_URL)
             customers = customers_df.to_dict('records')
             # Parse products_purchased JSON for each customer
             for customer in customers:
@@ -1196,26 +1964,14 @@ def invoices():
         else:
             customers = []
         
-        # Load product names from INDEX sheet for dropdown
-        product_names = []
-        try:
-            if INDEX_SHEET_URL:
-                index_df = connector.read_from_sheets(INDEX_SHEET_URL)
-                if not index_df.empty:
-                    product_names = index_df.iloc[:, 0].dropna().unique().tolist()
-                    product_names = [p for p in product_names if str(p).strip()]
-        except Exception as e:
-            logger.warning(f"Could not load INDEX sheet: {str(e)}")
-            product_names = []
     except Exception as e:
         logger.error(f"Error loading invoices: {str(e)}")
         invoices = []
         customers = []
-        product_names = []
         flash(f"Error loading invoices: {str(e)}", "error")
     
     today = datetime.now().strftime('%Y-%m-%d')
-    return render_template('invoices.html', invoices=invoices, customers=customers, product_names=product_names, today=today)
+    return render_template('invoices.html', invoices=invoices, customers=customers, today=today)
 
 @app.errorhandler(500)
 def internal_error(error):
@@ -1238,6 +1994,7 @@ def not_found(error):
         return "<h1>404 - Page Not Found</h1>", 404
 
 @app.route('/api/create_invoice', methods=['POST'])
+@retry_on_sheet_conflict
 def create_invoice():
     """Create a new invoice"""
     try:
@@ -1251,75 +2008,15 @@ def create_invoice():
         payment_reference = str(data.get('payment_reference', '') or '').strip()
         invoice_date = data.get('invoice_date', datetime.now().strftime('%Y-%m-%d'))
         amount_paid = max(0.0, min(amount_paid, total_amount))
-        is_paid = amount_paid >= total_amount and total_amount > 0
-        initial_payment_history = []
-        if amount_paid > 0:
-            initial_payment_history.append({
-                'amount': amount_paid,
-                'reference': payment_reference,
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
         
         invoice_number = f"INV-{datetime.now().strftime('%Y%m%d')}-{datetime.now().strftime('%H%M%S')}"
         created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        invoice_rows = _invoice_rows(invoice_number, created_at, customer_name, items, shipment_fee, total_amount,
+                                     invoice_date, amount_paid, payment_reference)
         
-        # Generate products summary string
-        products_summary_parts = []
-        for item in items:
-            product_name = item.get('name', 'N/A')
-            quantity = item.get('quantity', 0)
-            price = item.get('price', 0)
-            subtotal = item.get('subtotal', 0)
-            products_summary_parts.append(f"{product_name} ({quantity} pcs × ₱{price:.2f}) = ₱{subtotal:.2f}")
-        products_summary = "; ".join(products_summary_parts) if products_summary_parts else "No items"
-        
-        # Create one row per product
-        invoice_rows = []
-        for item in items:
-            invoice_row = {
-                'invoice_number': invoice_number,
-                'customer_name': customer_name,
-                'products_summary': products_summary,
-                'product_name': item.get('name', 'N/A'),
-                'price_sold': item.get('price', 0),
-                'quantity': item.get('quantity', 0),
-                'line_total': item.get('subtotal', 0),
-                'shipment_fee': shipment_fee,
-                'total_amount': total_amount,
-                'invoice_date': invoice_date,
-                'created_at': created_at,
-                'paid': is_paid,
-                'fulfilled': False,
-                'amount_paid': amount_paid,
-                'payment_reference': payment_reference,
-                'payment_history': json.dumps(initial_payment_history)
-            }
-            invoice_rows.append(invoice_row)
-        
-        # If no items, create one row with empty product
-        if not invoice_rows:
-            invoice_row = {
-                'invoice_number': invoice_number,
-                'customer_name': customer_name,
-                'products_summary': 'No items',
-                'product_name': '',
-                'price_sold': 0,
-                'quantity': 0,
-                'line_total': 0,
-                'shipment_fee': shipment_fee,
-                'total_amount': total_amount,
-                'invoice_date': invoice_date,
-                'created_at': created_at,
-                'paid': is_paid,
-                'fulfilled': False,
-                'amount_paid': amount_paid,
-                'payment_reference': payment_reference,
-                'payment_history': json.dumps(initial_payment_history)
-            }
-            invoice_rows.append(invoice_row)
-        
+        uow = _new_unit_of_work()
         if INVOICES_SHEET_URL:
-            df = connector.read_from_sheets(INVOICES_SHEET_URL)
+            df = uow.read_from_sheets(INVOICES_SHEET_URL)
             invoice_number = _generate_invoice_number(df)
             # Reflect generated invoice number into rows before concat.
             for row in invoice_rows:
@@ -1334,6 +2031,7 @@ def create_invoice():
                 if name and quantity > 0:
                     sync_items.append({'name': name, 'price': price, 'quantity': quantity})
             _sync_invoice_with_inventory_and_sold(
+                uow,
                 invoice_number=invoice_number,
                 created_at=created_at,
                 items=sync_items,
@@ -1361,72 +2059,56 @@ def create_invoice():
             new_invoice_df = pd.DataFrame(invoice_rows)
             df = pd.concat([df, new_invoice_df], ignore_index=True)
             df = _normalize_invoice_boolean_columns(df)
-            connector.write_to_sheets(df, INVOICES_SHEET_URL)
+            uow.write_to_sheets(df, INVOICES_SHEET_URL)
+            if amount_paid > 0:
+                payment_ledger.stage(uow, [payment(invoice_number, created_at, amount_paid, payment_reference)])
         
         # Update customer records with product-level details
-        if CUSTOMERS_SHEET_URL:
-            import json
-            customers_df = connector.read_from_sheets(CUSTOMERS_SHEET_URL)
-            # Handle empty DataFrame - include product details columns
-            if customers_df.empty:
-                customers_df = pd.DataFrame(columns=['customer_name', 'total_orders', 'total_spent', 'first_order_date', 'last_order_date', 'products_purchased'])
-            
-            # Parse items to get product details
-            products_summary = {}
-            for item in items:
-                product_name = item.get('name', '')
-                qty = item.get('quantity', 0)
-                price = item.get('price', 0)
-                if product_name:
-                    if product_name not in products_summary:
-                        products_summary[product_name] = {'qty': 0, 'total_amount': 0}
-                    products_summary[product_name]['qty'] += qty
-                    products_summary[product_name]['total_amount'] += price * qty
-            
-            if customer_name not in customers_df['customer_name'].values:
-                new_customer = {
-                    'customer_name': customer_name,
-                    'total_orders': 1,
-                    'total_spent': total_amount,
-                    'first_order_date': invoice_date,
-                    'last_order_date': invoice_date,
-                    'products_purchased': json.dumps(products_summary)
-                }
-                new_customer_df = pd.DataFrame([new_customer])
-                customers_df = pd.concat([customers_df, new_customer_df], ignore_index=True)
-            else:
-                # Update existing customer
-                idx = customers_df[customers_df['customer_name'] == customer_name].index[0]
-                customers_df.at[idx, 'total_orders'] = int(customers_df.at[idx, 'total_orders']) + 1
-                customers_df.at[idx, 'total_spent'] = float(customers_df.at[idx, 'total_spent']) + total_amount
-                customers_df.at[idx, 'last_order_date'] = invoice_date
-                
-                # Merge product purchases
-                existing_products = {}
-                if 'products_purchased' in customers_df.columns and pd.notna(customers_df.at[idx, 'products_purchased']):
-                    try:
-                        existing_products = json.loads(str(customers_df.at[idx, 'products_purchased']))
-                    except:
-                        existing_products = {}
-                
-                # Merge new products with existing
-                for product_name, details in products_summary.items():
-                    if product_name in existing_products:
-                        existing_products[product_name]['qty'] += details['qty']
-                        existing_products[product_name]['total_amount'] += details['total_amount']
-                    else:
-                        existing_products[product_name] = details
-                
-                customers_df.at[idx, 'products_purchased'] = json.dumps(existing_products)
-            connector.write_to_sheets(customers_df, CUSTOMERS_SHEET_URL)
+        _update_customer_aggregates(uow, [{
+            'customer_name': customer_name,
+            'items': items,
+            'total_amount': total_amount,
+            'invoice_date': invoice_date,
+            'sign': 1
+        }])
+        # Inventory, Sold Items, Invoices and Customers land together or not at all.
+        _commit_unit_of_work(uow)
         
         logger.info(f"Created invoice {invoice_number} for {customer_name}")
+        audit('invoice_created', invoice_number=invoice_number, customer_name=customer_name,
+              items=len(items), total_amount=total_amount)
         return jsonify({'success': True, 'message': 'Invoice created successfully', 'invoice_number': invoice_number})
     except Exception as e:
         logger.error(f"Error creating invoice: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 400
 
+@app.route('/api/import_invoices', methods=['POST'])
+@retry_on_sheet_conflict
+def import_invoices():
+    """Create many invoices at once from JSON ({"invoices": [...]}) or a CSV of invoice lines (?dry_run=1 validates only)"""
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            upload.stream.seek(0)  # a conflict retry reads the upload again
+            invoices = invoices_from_csv(upload.stream)
+        elif request.is_json:
+            invoices = invoices_from_json(request.get_json())
+        else:
+            invoices = invoices_from_csv(io.BytesIO(request.get_data(cache=True)))
+        dry_run = request.args.get('dry_run', '').lower() in ['1', 'true', 'yes']
+        result = import_invoice_batch(invoices, dry_run=dry_run)
+        verb = 'valid' if dry_run else 'created'
+        return jsonify({
+            'success': True,
+            'message': f"{len(result['created'])} invoices {verb}, {len(result['errors'])} rejected",
+            **result
+        })
+    except Exception as e:
+        logger.error(f"Error importing invoices: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 400
+
 @app.route('/api/update_invoice_status', methods=['POST'])
+@retry_on_sheet_conflict
 def update_invoice_status():
     """Update invoice paid/fulfilled status"""
     try:
@@ -1443,7 +2125,8 @@ def update_invoice_status():
             return jsonify({'success': False, 'message': 'Status type must be "paid" or "fulfilled"'}), 400
         
         if INVOICES_SHEET_URL:
-            df = connector.read_from_sheets(INVOICES_SHEET_URL)
+            uow = _new_unit_of_work()
+            df = uow.read_from_sheets(INVOICES_SHEET_URL)
             if df.empty:
                 return jsonify({'success': False, 'message': 'Invoice not found'}), 404
             
@@ -1471,8 +2154,10 @@ def update_invoice_status():
             
             df.loc[mask, status_type] = 'True' if bool(status_value) else 'False'
             df = _normalize_invoice_boolean_columns(df)
-            connector.write_to_sheets(df, INVOICES_SHEET_URL)
+            uow.write_to_sheets(df, INVOICES_SHEET_URL)
+            _commit_unit_of_work(uow)
             logger.info(f"Updated invoice {invoice_number} {status_type} status to {status_value}")
+            audit('invoice_status_updated', invoice_number=invoice_number, field=status_type, value=bool(status_value))
         
         return jsonify({'success': True, 'message': f'Invoice {status_type} status updated successfully'})
     except Exception as e:
@@ -1480,6 +2165,7 @@ def update_invoice_status():
         return jsonify({'success': False, 'message': str(e)}), 400
 
 @app.route('/api/update_invoice', methods=['POST'])
+@retry_on_sheet_conflict
 def update_invoice():
     """Update an existing invoice and its line items."""
     try:
@@ -1526,7 +2212,8 @@ def update_invoice():
         if not INVOICES_SHEET_URL:
             return jsonify({'success': False, 'message': 'Invoice sheet is not configured'}), 400
 
-        df = connector.read_from_sheets(INVOICES_SHEET_URL)
+        uow = _new_unit_of_work()
+        df = uow.read_from_sheets(INVOICES_SHEET_URL)
         if df.empty:
             return jsonify({'success': False, 'message': 'Invoice not found'}), 404
 
@@ -1548,9 +2235,8 @@ def update_invoice():
         created_at = first_row.get('created_at', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         paid = first_row.get('paid', False)
         fulfilled = first_row.get('fulfilled', False)
-        existing_amount_paid = _to_float(first_row.get('amount_paid', 0))
-        existing_payment_reference = str(first_row.get('payment_reference', '') or '').strip()
-        existing_payment_history = _parse_payment_history(first_row.get('payment_history', '[]'))
+        payment_index = _get_payment_index()
+        existing_amount_paid, existing_payment_history, existing_payment_reference = _invoice_payment_state(first_row, payment_index)
 
         if isinstance(paid, str):
             paid = paid.lower() in ['true', '1', 'yes']
@@ -1558,19 +2244,34 @@ def update_invoice():
             fulfilled = fulfilled.lower() in ['true', '1', 'yes']
 
         total_amount = subtotal + shipment_fee
-        if payload_amount_paid is None:
-            amount_paid = existing_amount_paid
-        else:
-            amount_paid = _to_float(payload_amount_paid, existing_amount_paid)
-        amount_paid = max(0.0, min(amount_paid, total_amount))
+        # Only an amount the request supplies changes what was paid; editing items or lowering the
+        # total never books a payment, the amount is just capped at the total for display and status
+        requested_paid = None if payload_amount_paid is None else max(0.0, _to_float(payload_amount_paid, existing_amount_paid))
+        # Pages show what was paid capped at the invoice total: that amount sent back is not an edit, so
+        # saving other fields of an overpaid invoice keeps the overpayment instead of booking it away
+        shown_paid = min(existing_amount_paid, _to_float(first_row.get('total_amount', 0)))
+        if requested_paid is not None and round(requested_paid, 2) == round(shown_paid, 2):
+            requested_paid = None
+        total_paid = existing_amount_paid if requested_paid is None else requested_paid
+        amount_paid = max(0.0, min(total_paid, total_amount))
         payment_reference = existing_payment_reference if payload_payment_reference is None else str(payload_payment_reference or '').strip()
         paid = bool(paid) or (amount_paid >= total_amount and total_amount > 0)
-        if not existing_payment_history and amount_paid > 0:
-            existing_payment_history.append({
-                'amount': amount_paid,
-                'reference': payment_reference,
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
+        if payment_index is not None:
+            # The invoice rows keep their pre-ledger payment columns; an edited amount becomes a correction row
+            row_amount_paid = _to_float(first_row.get('amount_paid', 0))
+            row_payment_history = first_row.get('payment_history', '[]')
+            correction = 0.0 if requested_paid is None else round(requested_paid - existing_amount_paid, 2)
+            if correction:
+                payment_ledger.stage(uow, [payment(invoice_number, created_at, correction, payment_reference, kind='adjustment')])
+        else:
+            if not existing_payment_history and total_paid > 0:
+                existing_payment_history.append({
+                    'amount': total_paid,
+                    'reference': payment_reference,
+                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                })
+            row_amount_paid = total_paid
+            row_payment_history = json.dumps(existing_payment_history)
         products_summary = "; ".join(
             f"{i['name']} ({i['quantity']} pcs x PHP {i['price']:.2f}) = PHP {i['subtotal']:.2f}"
             for i in normalized_items
@@ -1578,6 +2279,7 @@ def update_invoice():
 
         # Sync inventory + sold sheets for this invoice edit by rollback + reapply.
         _sync_invoice_with_inventory_and_sold(
+            uow,
             invoice_number=invoice_number,
             created_at=created_at,
             items=normalized_items,
@@ -1586,6 +2288,24 @@ def update_invoice():
             delete_only=False
         )
 
+        # Move this invoice's contribution from the old customer totals to the new ones.
+        _update_customer_aggregates(uow, [
+            {
+                'customer_name': first_row.get('customer_name', ''),
+                'items': _invoice_rows_to_items(existing_rows),
+                'total_amount': _to_float(first_row.get('total_amount', 0)),
+                'invoice_date': str(first_row.get('invoice_date', '') or ''),
+                'sign': -1
+            },
+            {
+                'customer_name': customer_name,
+                'items': normalized_items,
+                'total_amount': total_amount,
+                'invoice_date': invoice_date,
+                'sign': 1
+            }
+        ], remaining_invoices=df[~existing_mask])
+
         rebuilt_rows = []
         for item in normalized_items:
             rebuilt_rows.append({
@@ -1602,9 +2322,9 @@ def update_invoice():
                 'created_at': created_at,
                 'paid': bool(paid),
                 'fulfilled': bool(fulfilled),
-                'amount_paid': amount_paid,
+                'amount_paid': row_amount_paid,
                 'payment_reference': payment_reference,
-                'payment_history': json.dumps(existing_payment_history)
+                'payment_history': row_payment_history
             })
 
         remaining_df = df[~existing_mask]
@@ -1618,7 +2338,9 @@ def update_invoice():
                 updated_df[col] = ''
         updated_df = updated_df[required_columns]
         updated_df = _normalize_invoice_boolean_columns(updated_df)
-        connector.write_to_sheets(updated_df, INVOICES_SHEET_URL)
+        uow.write_to_sheets(updated_df, INVOICES_SHEET_URL)
+        _commit_unit_of_work(uow)
+        audit('invoice_updated', invoice_number=invoice_number, total_amount=total_amount, amount_paid=amount_paid)
 
         return jsonify({
             'success': True,
@@ -1635,6 +2357,7 @@ def update_invoice():
 
 
 @app.route('/api/add_invoice_payment', methods=['POST'])
+@retry_on_sheet_conflict
 def add_invoice_payment():
     """Add payment to an invoice and update its outstanding balance."""
     try:
@@ -1652,7 +2375,8 @@ def add_invoice_payment():
         if not INVOICES_SHEET_URL:
             return jsonify({'success': False, 'message': 'Invoice sheet is not configured'}), 400
 
-        df = connector.read_from_sheets(INVOICES_SHEET_URL)
+        uow = _new_unit_of_work()
+        df = uow.read_from_sheets(INVOICES_SHEET_URL)
         if df.empty:
             return jsonify({'success': False, 'message': 'Invoice not found'}), 404
 
@@ -1669,41 +2393,52 @@ def add_invoice_payment():
                     'message': 'This invoice number matches multiple invoices. Please refresh and retry from the latest list.'
                 }), 409
 
-        if 'amount_paid' not in df.columns:
-            df['amount_paid'] = 0.0
-        if 'payment_reference' not in df.columns:
-            df['payment_reference'] = ''
-        if 'payment_history' not in df.columns:
-            df['payment_history'] = '[]'
-
         first_row = df[mask].iloc[0]
         total_amount = _to_float(first_row.get('total_amount', 0))
-        current_paid = _to_float(first_row.get('amount_paid', 0))
-        payment_history = _parse_payment_history(first_row.get('payment_history', '[]'))
+        payment_index = _get_payment_index()
+        current_paid, payment_history, _ = _invoice_payment_state(first_row, payment_index)
+        current_paid = min(total_amount, max(0.0, current_paid))
         updated_paid = min(total_amount, max(0.0, current_paid + payment_amount))
         balance_due = max(0.0, total_amount - updated_paid)
         is_paid = balance_due <= 0
+        new_payment = payment(invoice_number, first_row.get('created_at', ''), payment_amount, payment_reference)
         payment_history.append({
             'amount': payment_amount,
             'reference': payment_reference,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'timestamp': new_payment['timestamp']
         })
 
-        df.loc[mask, 'amount_paid'] = updated_paid
-        if payment_reference:
-            df.loc[mask, 'payment_reference'] = payment_reference
-        df.loc[mask, 'payment_history'] = json.dumps(payment_history)
-        df.loc[mask, 'paid'] = 'True' if bool(is_paid) else 'False'
+        if payment_index is not None:
+            # One appended ledger row; the invoice rows are not rewritten, but an edit to them since they
+            # were read (e.g. a new total) makes the commit conflict and the payment is re-applied to it
+            payment_ledger.stage(uow, [new_payment])
+            uow.check_unchanged(INVOICES_SHEET_URL)
+        else:
+            if 'amount_paid' not in df.columns:
+                df['amount_paid'] = 0.0
+            if 'payment_reference' not in df.columns:
+                df['payment_reference'] = ''
+            if 'payment_history' not in df.columns:
+                df['payment_history'] = '[]'
+            df.loc[mask, 'amount_paid'] = updated_paid
+            if payment_reference:
+                df.loc[mask, 'payment_reference'] = payment_reference
+            df.loc[mask, 'payment_history'] = json.dumps(payment_history)
+            df.loc[mask, 'paid'] = 'True' if bool(is_paid) else 'False'
 
-        for col in INVOICE_REQUIRED_COLUMNS:
-            if col not in df.columns and col in ['fulfilled', 'paid']:
-                df[col] = 'False'
-            elif col not in df.columns:
-                df[col] = ''
-        df = df[INVOICE_REQUIRED_COLUMNS]
-        df = _normalize_invoice_boolean_columns(df)
+            required_columns = INVOICE_REQUIRED_COLUMNS
+            for col in required_columns:
+                if col not in df.columns and col in ['fulfilled', 'paid']:
+                    df[col] = 'False'
+                elif col not in df.columns:
+                    df[col] = ''
+            df = df[required_columns]
+            df = _normalize_invoice_boolean_columns(df)
+            uow.write_to_sheets(df, INVOICES_SHEET_URL)
 
-        connector.write_to_sheets(df, INVOICES_SHEET_URL)
+        _commit_unit_of_work(uow)
+        audit('invoice_payment_added', invoice_number=invoice_number, amount=payment_amount,
+              reference=payment_reference, amount_paid=updated_paid, balance_due=balance_due)
         return jsonify({
             'success': True,
             'message': 'Payment recorded successfully',
@@ -1717,11 +2452,11 @@ def add_invoice_payment():
         return jsonify({'success': False, 'message': str(e)}), 400
 
 @app.route('/api/update_sold_item', methods=['POST'])
+@retry_on_sheet_conflict
 def update_sold_item():
     """Update a sold item (remarks, price, tithe kept)."""
     try:
         data = request.json or {}
-        item_id = int(data.get('item_id'))
         remarks = data.get('remarks', '')
         tithe_kept = data.get('tithe_kept', None)
         selling_price = data.get('selling_price', None)
@@ -1729,42 +2464,50 @@ def update_sold_item():
         if not SOLD_ITEMS_SHEET_URL:
             return jsonify({'success': False, 'message': 'Sold items sheet is not configured'}), 400
 
-        df = connector.read_from_sheets(SOLD_ITEMS_SHEET_URL)
-        if df.empty or item_id < 0 or item_id >= len(df):
-            return jsonify({'success': False, 'message': 'Sold item not found'}), 404
-
+        uow = _new_unit_of_work()
         # Keep remarks editable.
-        df.at[item_id, 'remarks'] = remarks
+        changes = {'remarks': remarks}
 
         # Keep tithe_kept editable.
         if tithe_kept is not None:
             if isinstance(tithe_kept, str):
                 tithe_kept = tithe_kept.lower() in ['true', '1', 'yes']
-            df.at[item_id, 'tithe_kept'] = 'True' if tithe_kept else 'False'
+            changes['tithe_kept'] = 'True' if tithe_kept else 'False'
 
-        # If selling price changes, recompute derived values.
+        # If selling price changes, recompute derived values from the row's current quantity and cost.
         if selling_price is not None and str(selling_price) != '':
+            rows = _read_addressed_row(uow, SOLD_ITEMS_SHEET_URL, data, 'item_id')
+            if rows.empty:
+                return jsonify({'success': False, 'message': 'Sold item not found'}), 404
+            row = rows.iloc[0]
             selling_price = float(selling_price)
-            quantity = int(float(df.at[item_id, 'quantity'])) if pd.notna(df.at[item_id, 'quantity']) else 0
-            cost_per_unit = float(df.at[item_id, 'total_cost_per_unit']) if pd.notna(df.at[item_id, 'total_cost_per_unit']) else 0.0
+            quantity = int(float(row['quantity'])) if pd.notna(row.get('quantity')) else 0
+            cost_per_unit = float(row['total_cost_per_unit']) if pd.notna(row.get('total_cost_per_unit')) else 0.0
             total_cost = cost_per_unit * quantity
             profit = selling_price - total_cost
             tithe = profit * 0.10
             profit_after_tithe = profit - tithe
 
-            df.at[item_id, 'selling_price'] = selling_price
-            df.at[item_id, 'total_cost'] = total_cost
-            df.at[item_id, 'profit'] = profit
-            df.at[item_id, 'tithe'] = tithe
-            df.at[item_id, 'profit_after_tithe'] = profit_after_tithe
+            changes.update({
+                'selling_price': selling_price,
+                'total_cost': total_cost,
+                'profit': profit,
+                'tithe': tithe,
+                'profit_after_tithe': profit_after_tithe,
+            })
 
-        connector.write_to_sheets(df, SOLD_ITEMS_SHEET_URL)
+        row_id = _stage_addressed_row_update(uow, SOLD_ITEMS_SHEET_URL, data, 'item_id', changes)
+        _commit_unit_of_work(uow)
+        audit('sold_item_updated', row_id=row_id, selling_price=selling_price, tithe_kept=tithe_kept)
         return jsonify({'success': True, 'message': 'Sold item updated successfully'})
+    except RowNotFoundError:
+        return jsonify({'success': False, 'message': 'Sold item not found'}), 404
     except Exception as e:
         logger.error(f"Error updating sold item: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'message': str(e)}), 400
 
 @app.route('/api/delete_invoice', methods=['POST'])
+@retry_on_sheet_conflict
 def delete_invoice():
     """Delete an invoice"""
     try:
@@ -1776,7 +2519,8 @@ def delete_invoice():
             return jsonify({'success': False, 'message': 'Invoice number is required'}), 400
         
         if INVOICES_SHEET_URL:
-            df = connector.read_from_sheets(INVOICES_SHEET_URL)
+            uow = _new_unit_of_work()
+            df = uow.read_from_sheets(INVOICES_SHEET_URL)
             if df.empty:
                 return jsonify({'success': False, 'message': 'Invoice not found'}), 404
             
@@ -1800,6 +2544,7 @@ def delete_invoice():
 
             # Roll back inventory and sold rows linked to this invoice.
             _sync_invoice_with_inventory_and_sold(
+                uow,
                 invoice_number=invoice_number,
                 created_at=created_at,
                 items=[],
@@ -1808,13 +2553,25 @@ def delete_invoice():
                 delete_only=True
             )
 
+            deleted_rows = df[delete_mask]
+            first_deleted = deleted_rows.iloc[0]
+            _update_customer_aggregates(uow, [{
+                'customer_name': first_deleted.get('customer_name', ''),
+                'items': _invoice_rows_to_items(deleted_rows),
+                'total_amount': _to_float(first_deleted.get('total_amount', 0)),
+                'invoice_date': str(first_deleted.get('invoice_date', '') or ''),
+                'sign': -1
+            }], remaining_invoices=df[~delete_mask])
+
             df = df[~delete_mask]
             
             if len(df) == initial_count:
                 return jsonify({'success': False, 'message': 'Invoice not found'}), 404
             
-            connector.write_to_sheets(df, INVOICES_SHEET_URL)
+            uow.write_to_sheets(df, INVOICES_SHEET_URL)
+            _commit_unit_of_work(uow)
             logger.info(f"Deleted invoice {invoice_number}")
+            audit('invoice_deleted', invoice_number=invoice_number, rows=initial_count - len(df))
         
         return jsonify({'success': True, 'message': 'Invoice deleted successfully'})
     except Exception as e:
@@ -1826,10 +2583,12 @@ def delete_invoice():
 
 
 @app.route('/api/rebuild_invoice_sync', methods=['POST'])
+@retry_on_sheet_conflict
 def rebuild_invoice_sync():
     """Rebuild inventory/sold data from current invoice rows."""
     try:
         result = _rebuild_invoice_inventory_sold_sync()
+        audit('invoice_sync_rebuilt', replayed_rows=result['replayed_rows'], skipped_rows=len(result['skipped_rows']))
         message = f"Rebuild completed. Replayed {result['replayed_rows']} invoice rows."
         if result['skipped_rows']:
             message += f" Skipped {len(result['skipped_rows'])} rows due to stock mismatch."
@@ -1842,13 +2601,76 @@ def rebuild_invoice_sync():
         logger.error(f"Error rebuilding invoice sync: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'message': str(e)}), 400
 
+@app.route('/api/rebuild_customers', methods=['POST'])
+@retry_on_sheet_conflict
+def rebuild_customers():
+    """Recompute all customer totals from current invoice rows."""
+    try:
+        if not CUSTOMERS_SHEET_URL or not INVOICES_SHEET_URL:
+            raise ValueError("Customers and Invoices sheet URLs must be configured.")
+        uow = _new_unit_of_work()
+        invoice_df = uow.read_from_sheets(INVOICES_SHEET_URL)
+        customers_df = uow.read_from_sheets(CUSTOMERS_SHEET_URL)
+        rebuilt_df = recompute_customers(invoice_df, customers_df)
+        uow.write_to_sheets(rebuilt_df, CUSTOMERS_SHEET_URL)
+        _commit_unit_of_work(uow)
+        logger.info(f"Rebuilt {len(rebuilt_df)} customer rows from invoices")
+        audit('customers_rebuilt', customers_total=len(rebuilt_df))
+        return jsonify({
+            'success': True,
+            'message': f"Rebuild completed. Recomputed {len(rebuilt_df)} customers.",
+            'result': {'customers_total': len(rebuilt_df)}
+        })
+    except Exception as e:
+        logger.error(f"Error rebuilding customers: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+@app.route('/api/assign_row_ids', methods=['POST'])
+def assign_row_ids():
+    """Give every row of the row-id tabs a row_id (adding the column when a tab has none).
+
+    This is the one place ids are backfilled; pages only read. Each tab's id column is written
+    with a version check and re-read on a conflict, so running it from two browsers is safe.
+    """
+    try:
+        assigned = {}
+        for name, url in ROW_ID_TABS.items():
+            if not url:
+                continue
+            for attempt in range(1, SHEET_CONFLICT_MAX_ATTEMPTS + 1):
+                try:
+                    assigned[name] = connector.ensure_row_ids(url)
+                    break
+                except SheetConflictError:
+                    if attempt == SHEET_CONFLICT_MAX_ATTEMPTS:
+                        raise
+                    time.sleep(0.05 * attempt)
+            if assigned[name]:
+                _snapshots_written([url])
+        total = sum(assigned.values())
+        logger.info(f"Assigned row ids to {total} rows")
+        audit('row_ids_assigned', rows=total, **{name.lower(): count for name, count in assigned.items()})
+        return jsonify({
+            'success': True,
+            'message': f"Assigned row ids to {total} rows.",
+            'result': assigned
+        })
+    except SheetConflictError:
+        return jsonify({
+            'success': False,
+            'message': 'Someone else updated this data at the same time. Please refresh and try again.'
+        }), 409
+    except Exception as e:
+        logger.error(f"Error assigning row ids: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': str(e)}), 400
+
 if __name__ == '__main__':
-    # Create necessary directories
-    os.makedirs('logs', exist_ok=True)
-    
     # Get port from environment (Railway sets this automatically)
     port = int(os.environ.get('PORT', 5000))
     # Debug mode only in development (not production)
     debug_mode = os.environ.get('FLASK_ENV') == 'development'
+    # With the reloader only the child process serves requests, so only it warms up
+    if not debug_mode or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warm_up()
     app.run(host='0.0.0.0', port=port, debug=debug_mode)
 
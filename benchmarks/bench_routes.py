@@ -0,0 +1,178 @@
+"""
+Route and helper benchmarks on generated data
+Runs every page, the main mutating routes, the invoice/stock rebuild and the sheet write
+serialization against FakeDataConnector at each data size, and saves timings as JSON
+(tagged with the git commit) so runs can be compared across commits.
+
+Usage: python benchmarks/bench_routes.py --rows 1000 10000 --repeat 5 --only inventory invoices
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+# Measure the routes themselves: no snapshot cache, no background threads, no warm-up
+os.environ.setdefault('SNAPSHOT_TTL_SECONDS', '0')
+os.environ.setdefault('WARM_UP_ON_START', 'false')
+os.environ.setdefault('BENCH_ROWS', '10')
+os.environ.setdefault('BENCH_LATENCY', '0')
+
+from benchmarks import fake_app  # noqa: E402
+from data_sources import DataConnector  # noqa: E402
+
+app_module = fake_app.app_module
+
+
+class _NullWorksheet:
+    """Accepts writes without sending them anywhere, so only payload building is timed"""
+    row_count = 1
+    col_count = 1
+
+    def update(self, *args, **kwargs):
+        return None
+
+    def resize(self, rows=None, cols=None):
+        self.row_count, self.col_count = rows or self.row_count, cols or self.col_count
+
+
+class _NullSpreadsheet:
+    def get_worksheet_by_id(self, gid):
+        return _NullWorksheet()
+
+
+class _NullClient:
+    session = None
+
+    def open_by_key(self, key):
+        return _NullSpreadsheet()
+
+
+def _in_stock_row_ids(datasets, needed):
+    inventory = datasets['inventory']
+    return inventory.loc[inventory['remaining_qty'] >= needed, 'row_id'].head(needed).tolist()
+
+
+def _invoice_payload(datasets, i):
+    products = datasets['index']['product_name'].tolist()
+    items = [
+        {'name': products[(i * 2) % len(products)], 'quantity': 1, 'price': 500, 'subtotal': 500},
+        {'name': products[(i * 2 + 1) % len(products)], 'quantity': 2, 'price': 750, 'subtotal': 1500},
+    ]
+    return {'customer_name': f"Bench Customer {i % 7}", 'items': items, 'shipment_fee': 100,
+            'total_amount': 2100, 'invoice_date': '2026-01-15'}
+
+
+def _scenarios(client, datasets, repeat):
+    """name -> callable(i) running one iteration; each must leave the app usable for the next."""
+    row_ids = _in_stock_row_ids(datasets, repeat + 1)
+    null_connector = DataConnector({})
+    null_connector.client = _NullClient()
+    url = os.environ['INVENTORY_SHEET_URL']
+
+    def get(path):
+        def run(i):
+            response = client.get(path)
+            assert response.status_code == 200, f"{path} returned {response.status_code}"
+        return run
+
+    def post(path, payload):
+        def run(i):
+            response = client.post(path, json=payload(i))
+            assert response.status_code == 200 and response.json.get('success'), f"{path}: {response.json}"
+        return run
+
+    def rebuild(i):
+        with app_module.app.test_request_context():
+            app_module._rebuild_invoice_inventory_sold_sync()
+
+    return {
+        'inventory': get('/inventory'),
+        'invoices': get('/invoices'),
+        'sold': get('/sold'),
+        'used_freebie': get('/used_freebie'),
+        'products_suggest': get('/api/products/suggest?q=tirz'),
+        'create_invoice': post('/api/create_invoice', lambda i: _invoice_payload(datasets, i)),
+        'update_status': post('/api/update_status', lambda i: {
+            'row_id': row_ids[i % len(row_ids)], 'status': 'sold',
+            'quantity_used': 1, 'selling_price': 900}),
+        'rebuild_invoice_inventory_sold_sync': rebuild,
+        'write_to_sheets_serialization': lambda i: null_connector.write_to_sheets(datasets['inventory'], url),
+        'batch_payload_serialization': lambda i: null_connector._batch_requests(0, {
+            'kind': 'replace', 'url': url, 'df': datasets['inventory']}),
+    }
+
+
+def run(row_counts, repeat, latency, only=None, seed=0):
+    results = []
+    client = app_module.app.test_client()
+    for rows in row_counts:
+        started = time.perf_counter()
+        connector, datasets = fake_app.build_connector(rows, latency=latency, seed=seed)
+        app_module.connector = connector
+        print(f"rows={rows}: generated data in {time.perf_counter() - started:.1f}s", flush=True)
+        for name, scenario in _scenarios(client, datasets, repeat).items():
+            if only and name not in only:
+                continue
+            timings = []
+            calls_before = len(connector.calls)
+            for i in range(repeat):
+                started = time.perf_counter()
+                scenario(i)
+                timings.append(time.perf_counter() - started)
+            result = {
+                'scenario': name,
+                'rows': rows,
+                'repeat': repeat,
+                'median_ms': round(statistics.median(timings) * 1000, 2),
+                'min_ms': round(min(timings) * 1000, 2),
+                'max_ms': round(max(timings) * 1000, 2),
+                'sheets_calls_per_run': round((len(connector.calls) - calls_before) / repeat, 2),
+            }
+            results.append(result)
+            print(f"  {name:<38} median {result['median_ms']:>10.2f} ms   "
+                  f"min {result['min_ms']:>10.2f} ms   calls/run {result['sheets_calls_per_run']}", flush=True)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated seconds per Sheets call')
+    parser.add_argument('--only', nargs='+', help='Run only these scenarios')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results', 'routes.json'))
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = run(args.rows, args.repeat, args.latency, only=args.only, seed=args.seed)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as handle:
+        json.dump({
+            'benchmark': 'routes',
+            'commit': _git_commit(),
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'settings': vars(args),
+            'results': results,
+        }, handle, indent=2)
+    print(f"Saved results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
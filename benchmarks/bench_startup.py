@@ -0,0 +1,120 @@
+"""
+Startup benchmark: how long a fresh process takes from `import app` to serving its first request
+Each run uses a new interpreter so nothing is cached; 'import' times the module import and the first
+request in-process, 'gunicorn' times a cold gunicorn start until the port answers.
+
+Usage: python benchmarks/bench_startup.py --runs 5 --modes import gunicorn
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from bench_workers import _free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside a fresh interpreter and prints one JSON line with its timings
+_IMPORT_PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get({path!r})
+served = time.perf_counter()
+print(json.dumps({{
+    'import_seconds': imported - started,
+    'first_request_seconds': served - imported,
+    'ready_seconds': served - started,
+    'status': response.status_code,
+}}))
+"""
+
+
+def _probe_import(path, env):
+    output = subprocess.run(
+        [sys.executable, '-c', _IMPORT_PROBE.format(path=path)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _probe_gunicorn(path, env, timeout=60):
+    port = _free_port()
+    env = dict(env, PORT=str(port), WEB_CONCURRENCY='1', GUNICORN_ACCESS_LOG='', GUNICORN_LOG_LEVEL='warning')
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                conn.request('GET', path)
+                status = conn.getresponse().status
+                conn.close()
+                return {'ready_seconds': time.perf_counter() - started, 'status': status}
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError('gunicorn did not answer before the timeout')
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def _summarize(samples):
+    summary = {}
+    for key in samples[0]:
+        if key == 'status':
+            summary['statuses'] = sorted({s['status'] for s in samples})
+            continue
+        values = [s[key] for s in samples]
+        summary[key] = {
+            'median': round(statistics.median(values), 4),
+            'min': round(min(values), 4),
+            'max': round(max(values), 4),
+        }
+    return summary
+
+
+def run(modes, runs, path, warm_up):
+    env = dict(os.environ, WARM_UP_ON_START='true' if warm_up else 'false')
+    probes = {'import': _probe_import, 'gunicorn': _probe_gunicorn}
+    results = {}
+    for mode in modes:
+        samples = [probes[mode](path, env) for _ in range(runs)]
+        results[mode] = _summarize(samples)
+        print(f"{mode:<9} ready in {results[mode]['ready_seconds']['median']:.3f}s (median of {runs})")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=['import', 'gunicorn'], default=['import', 'gunicorn'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/inventory')
+    parser.add_argument('--warm-up', action='store_true', help='Leave WARM_UP_ON_START enabled')
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results', 'startup.json'))
+    args = parser.parse_args()
+
+    results = run(args.modes, args.runs, args.path, args.warm_up)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as handle:
+        json.dump({
+            'benchmark': 'startup',
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'settings': vars(args),
+            'results': results,
+        }, handle, indent=2)
+    print(f"Saved results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
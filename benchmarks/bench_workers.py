@@ -0,0 +1,150 @@
+"""
+Load benchmark: throughput of the gunicorn setup as the worker count grows
+Starts gunicorn on benchmarks.fake_app (simulated Sheets latency) for each worker count,
+drives it with concurrent clients and prints/saves requests per second as JSON.
+
+Usage: python benchmarks/bench_workers.py --workers 1 2 4 --threads 1 --clients 16 --duration 10
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/products/suggest?q=')
+            conn.getresponse().read()
+            conn.close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def _drive(port, path, clients, duration):
+    stop_at = time.time() + duration
+    counts = [0] * clients
+    errors = [0] * clients
+    latencies = [[] for _ in range(clients)]
+
+    def client(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while time.time() < stop_at:
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    counts[i] += 1
+                    latencies[i].append(time.perf_counter() - started)
+                else:
+                    errors[i] += 1
+            except (OSError, http.client.HTTPException):
+                errors[i] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    all_latencies = sorted(x for per_client in latencies for x in per_client)
+    total = sum(counts)
+
+    def pct(p):
+        if not all_latencies:
+            return None
+        return round(all_latencies[min(len(all_latencies) - 1, int(len(all_latencies) * p))] * 1000, 2)
+
+    return {
+        'requests': total,
+        'errors': sum(errors),
+        'requests_per_second': round(total / duration, 2),
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+    }
+
+
+def run(worker_counts, threads, clients, duration, path, latency, rows, worker_class):
+    results = []
+    for workers in worker_counts:
+        port = _free_port()
+        env = dict(os.environ)
+        env.update({
+            'PORT': str(port),
+            'WEB_CONCURRENCY': str(workers),
+            'GUNICORN_THREADS': str(threads),
+            'GUNICORN_WORKER_CLASS': worker_class,
+            'GUNICORN_ACCESS_LOG': '',
+            'GUNICORN_LOG_LEVEL': 'warning',
+            'BENCH_LATENCY': str(latency),
+            'BENCH_ROWS': str(rows),
+        })
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'benchmarks.fake_app:app'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            if not _wait_until_up(port):
+                raise RuntimeError(f"gunicorn with {workers} workers did not start")
+            result = _drive(port, path, clients, duration)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+        result.update({'workers': workers, 'threads': threads})
+        results.append(result)
+        print(f"workers={workers:<3} threads={threads:<3} {result['requests_per_second']:>8} req/s  "
+              f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms errors={result['errors']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--worker-class', default='gthread')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--path', default='/sold')
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated seconds per Sheets call')
+    parser.add_argument('--rows', type=int, default=500, help='Inventory rows in the fake sheet')
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results', 'workers.json'))
+    args = parser.parse_args()
+
+    results = run(args.workers, args.threads, args.clients, args.duration, args.path,
+                  args.latency, args.rows, args.worker_class)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as handle:
+        json.dump({
+            'benchmark': 'workers',
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'settings': vars(args),
+            'results': results,
+        }, handle, indent=2)
+    print(f"Saved results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Synthetic sheet data for benchmarks
+Builds Inventory, Sold Items, Invoices, Customers, Used/Freebie and INDEX tables with the same
+columns the app writes, from 1k up to 1M rows, deterministically from a seed.
+
+Usage: python benchmarks/data_generator.py --rows 100000 --output benchmarks/data
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from components.customer_aggregates import recompute_customers  # noqa: E402
+from components.stock_movements import MOVEMENT_COLUMNS  # noqa: E402
+from components.payment_ledger import PAYMENT_COLUMNS  # noqa: E402
+from data_sources import ROW_ID_COLUMN  # noqa: E402
+
+PRODUCT_BASES = [
+    'Tirzepatide', 'Semaglutide', 'Retatrutide', 'BPC-157', 'TB-500', 'GHK-Cu', 'Ipamorelin',
+    'CJC-1295', 'Sermorelin', 'Tesamorelin', 'Epitalon', 'Selank', 'Semax', 'MOTS-c', 'NAD+',
+    'Kisspeptin', 'PT-141', 'AOD-9604', 'Cagrilintide', 'Thymosin Alpha-1'
+]
+DOSES = [2, 5, 10, 15, 20, 30, 50, 100]
+SUPPLIERS = ['Supplier A', 'Supplier B', 'Supplier C', 'Local Reseller', 'Direct Import']
+CUSTOMER_FIRST = ['Ana', 'Ben', 'Carla', 'Dino', 'Ella', 'Franz', 'Gina', 'Hugo', 'Ivy', 'Jojo', 'Kat', 'Leo']
+CUSTOMER_LAST = ['Santos', 'Reyes', 'Cruz', 'Garcia', 'Mendoza', 'Torres', 'Flores', 'Ramos', 'Lim', 'Tan']
+START = pd.Timestamp('2025-01-01 08:00:00')
+
+
+def product_names(count):
+    """count distinct product names like 'Tirzepatide 10mg' (a batch suffix is added past 160)."""
+    names = []
+    for i in range(count):
+        base = PRODUCT_BASES[i % len(PRODUCT_BASES)]
+        dose = DOSES[(i // len(PRODUCT_BASES)) % len(DOSES)]
+        batch = i // (len(PRODUCT_BASES) * len(DOSES))
+        names.append(f"{base} {dose}mg" + (f" Batch {batch + 1}" if batch else ''))
+    return names
+
+
+def _timestamps(rng, count, days=365):
+    offsets = pd.to_timedelta(rng.integers(0, days * 24 * 3600, size=count), unit='s')
+    return (START + offsets).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def generate_inventory(rows, products, rng):
+    bought = rng.integers(50, 200, size=rows)
+    total_price = rng.integers(20, 400, size=rows) * 50
+    fee = rng.choice([0, 50, 100, 150], size=rows)
+    cost = np.round((total_price + fee) / bought, 2)
+    return pd.DataFrame({
+        'product_name': np.asarray(products, dtype=object)[rng.integers(0, len(products), size=rows)],
+        'total_price': total_price,
+        'shipping_admin_fee': fee,
+        'total_cost_per_unit': cost,
+        'quantity': bought,
+        'total_bought_quantity': bought,
+        'remaining_qty': bought,
+        'supplier': np.asarray(SUPPLIERS, dtype=object)[rng.integers(0, len(SUPPLIERS), size=rows)],
+        'date_added': _timestamps(rng, rows),
+        'remarks': None,
+        'status': 'in_stock',
+        'selling_price': None,
+        'profit': None,
+        'tithe': None,
+        'profit_after_tithe': None,
+        'date_sold': None,
+    })
+
+
+def generate_invoices(rows, products, customers, rng):
+    """rows invoice lines grouped into invoices of 1-4 lines each."""
+    sizes = rng.integers(1, 5, size=rows)
+    invoice_idx = np.searchsorted(np.cumsum(sizes), np.arange(rows), side='right')
+    invoice_count = int(invoice_idx[-1]) + 1 if rows else 0
+
+    invoice_dates = pd.Series(_timestamps(rng, invoice_count))
+    created_at = invoice_dates.to_numpy(dtype=object)[invoice_idx]
+    day = pd.Series(created_at).str.slice(0, 10)
+    invoice_number = ('INV-' + day.str.replace('-', '', regex=False) + '-'
+                      + pd.Series(invoice_idx % 1000).astype(str).str.zfill(3)).to_numpy()
+
+    product = np.asarray(products, dtype=object)[rng.integers(0, len(products), size=rows)]
+    quantity = rng.integers(1, 4, size=rows)
+    price = rng.integers(8, 60, size=rows) * 50
+    line_total = price * quantity
+    shipment_fee = rng.choice([0, 100, 150, 200], size=invoice_count)[invoice_idx]
+    invoice_total = np.bincount(invoice_idx, weights=line_total, minlength=invoice_count)[invoice_idx] + shipment_fee
+
+    lines = pd.DataFrame({'invoice': invoice_idx, 'summary': [
+        f"{p} ({q} pcs × ₱{pr:.2f}) = ₱{t:.2f}" for p, q, pr, t in zip(product, quantity, price, line_total)
+    ]})
+    summaries = lines.groupby('invoice')['summary'].agg('; '.join).to_numpy()[invoice_idx]
+
+    paid = rng.random(invoice_count) < 0.7
+    fulfilled = rng.random(invoice_count) < 0.8
+    amount_paid = np.where(paid[invoice_idx], invoice_total, 0.0)
+    history = np.where(
+        paid[invoice_idx],
+        [json.dumps([{'amount': float(a), 'reference': 'GCash', 'timestamp': c}]) for a, c in zip(amount_paid, created_at)],
+        '[]'
+    )
+    return pd.DataFrame({
+        'invoice_number': invoice_number,
+        'customer_name': np.asarray(customers, dtype=object)[rng.integers(0, len(customers), size=invoice_count)][invoice_idx],
+        'products_summary': summaries,
+        'product_name': product,
+        'price_sold': price,
+        'quantity': quantity,
+        'line_total': line_total,
+        'shipment_fee': shipment_fee,
+        'total_amount': invoice_total,
+        'invoice_date': pd.Series(created_at).str.slice(0, 10).to_numpy(),
+        'created_at': created_at,
+        'fulfilled': np.where(fulfilled[invoice_idx], 'True', 'False'),
+        'paid': np.where(paid[invoice_idx], 'True', 'False'),
+        'amount_paid': amount_paid,
+        'payment_reference': np.where(paid[invoice_idx], 'GCash', ''),
+        'payment_history': history,
+    })
+
+
+def generate_sold(rows, invoices, rng):
+    """Sold rows: up to half mirror invoice lines (with the sync marker), the rest are manual sales."""
+    linked = invoices.head(min(len(invoices), rows // 2))
+    manual_rows = rows - len(linked)
+    cost = np.round(rng.uniform(50, 400, size=rows), 2)
+    quantity = np.concatenate([linked['quantity'].to_numpy(), rng.integers(1, 4, size=manual_rows)])
+    selling = np.concatenate([linked['line_total'].to_numpy(), rng.integers(8, 60, size=manual_rows) * 50 * quantity[len(linked):]])
+    total_cost = np.round(cost * quantity, 2)
+    profit = selling - total_cost
+    remarks = np.concatenate([
+        ('INV_SYNC:' + linked['invoice_number'] + '|' + linked['created_at'] + '|line:' + linked['product_name']).to_numpy(),
+        np.full(manual_rows, '', dtype=object),
+    ])
+    names = np.concatenate([
+        linked['product_name'].to_numpy(),
+        np.asarray(invoices['product_name'].to_numpy() if len(invoices) else ['Product'], dtype=object)[
+            rng.integers(0, max(1, len(invoices)), size=manual_rows)],
+    ])
+    dates = np.concatenate([linked['invoice_date'].to_numpy(), np.asarray(_timestamps(rng, manual_rows))])
+    return pd.DataFrame({
+        'product_name': names,
+        'quantity': quantity,
+        'total_cost_per_unit': cost,
+        'selling_price': selling,
+        'total_cost': total_cost,
+        'profit': profit,
+        'tithe': np.round(profit * 0.10, 2),
+        'profit_after_tithe': np.round(profit * 0.90, 2),
+        'tithe_kept': np.where(rng.random(rows) < 0.5, 'True', 'False'),
+        'remarks': remarks,
+        'date_sold': dates,
+    })
+
+
+def generate_used_freebie(rows, products, rng):
+    return pd.DataFrame({
+        'product_name': np.asarray(products, dtype=object)[rng.integers(0, len(products), size=rows)],
+        'quantity': rng.integers(1, 3, size=rows),
+        'total_cost_per_unit': np.round(rng.uniform(50, 400, size=rows), 2),
+        'status': np.where(rng.random(rows) < 0.5, 'used', 'freebie'),
+        'remarks': '',
+        'date_used': _timestamps(rng, rows),
+    })
+
+
+def generate_datasets(rows, seed=0, products=None):
+    """All sheets at roughly `rows` rows each (customers and used/freebie are a tenth of that)."""
+    rng = np.random.default_rng(seed)
+    products = product_names(products or max(10, min(2000, rows // 20)))
+    customers = [f"{CUSTOMER_FIRST[i % len(CUSTOMER_FIRST)]} {CUSTOMER_LAST[(i // len(CUSTOMER_FIRST)) % len(CUSTOMER_LAST)]}"
+                 + (f" {i // (len(CUSTOMER_FIRST) * len(CUSTOMER_LAST)) + 1}" if i >= len(CUSTOMER_FIRST) * len(CUSTOMER_LAST) else '')
+                 for i in range(max(1, rows // 10))]
+    invoices = generate_invoices(rows, products, customers, rng)
+    datasets = {
+        'inventory': generate_inventory(rows, products, rng),
+        'sold': generate_sold(rows, invoices, rng),
+        'invoices': invoices,
+        'customers': recompute_customers(invoices),
+        'used_freebie': generate_used_freebie(max(1, rows // 10), products, rng),
+        'index': pd.DataFrame({'product_name': products}),
+        'stock_movements': pd.DataFrame(columns=MOVEMENT_COLUMNS),
+        'payments': pd.DataFrame(columns=PAYMENT_COLUMNS),
+    }
+    # Row ids like the app assigns to the tabs pages edit by row, from their own generator so the other columns stay as before
+    id_rng = np.random.default_rng(seed + 1)
+    for df in (datasets['inventory'], datasets['sold'], datasets['used_freebie']):
+        df[ROW_ID_COLUMN] = ['r' + format(int(value), '015x') for value in id_rng.integers(0, 16 ** 15, size=len(df))]
+    return datasets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for name, df in generate_datasets(args.rows, seed=args.seed).items():
+        path = os.path.join(args.output, f"{name}_{args.rows}.csv")
+        df.to_csv(path, index=False)
+        print(f"{name:<13} {len(df):>9} rows -> {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+WSGI entry point serving the real app on top of FakeDataConnector
+Run with: gunicorn -c gunicorn.conf.py benchmarks.fake_app:app
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_SPREADSHEET = 'https://docs.google.com/spreadsheets/d/BENCHMARK/edit#gid='
+BENCH_SHEETS = {
+    'INVENTORY_SHEET_URL': 0,
+    'SOLD_ITEMS_SHEET_URL': 1,
+    'INVOICES_SHEET_URL': 2,
+    'CUSTOMERS_SHEET_URL': 3,
+    'USED_FREEBIE_SHEET_URL': 4,
+    'INDEX_SHEET_URL': 5,
+    'STOCK_MOVEMENTS_SHEET_URL': 6,
+    'PAYMENTS_SHEET_URL': 7,
+}
+for env_name, gid in BENCH_SHEETS.items():
+    os.environ[env_name] = f"{BENCH_SPREADSHEET}{gid}"
+
+import app as app_module  # noqa: E402
+from benchmarks.data_generator import generate_datasets  # noqa: E402
+from benchmarks.fake_connector import FakeDataConnector  # noqa: E402
+
+# Generator dataset name for each sheet URL env var
+SHEET_DATASETS = {
+    'INVENTORY_SHEET_URL': 'inventory',
+    'SOLD_ITEMS_SHEET_URL': 'sold',
+    'INVOICES_SHEET_URL': 'invoices',
+    'CUSTOMERS_SHEET_URL': 'customers',
+    'USED_FREEBIE_SHEET_URL': 'used_freebie',
+    'INDEX_SHEET_URL': 'index',
+    'STOCK_MOVEMENTS_SHEET_URL': 'stock_movements',
+    'PAYMENTS_SHEET_URL': 'payments',
+}
+
+
+def build_connector(rows, latency=0.0, seed=0):
+    """A FakeDataConnector holding generated data for every sheet, plus the datasets themselves."""
+    datasets = generate_datasets(rows, seed=seed)
+    sheets = {os.environ[env_name]: datasets[name] for env_name, name in SHEET_DATASETS.items()}
+    return FakeDataConnector(sheets=sheets, latency=latency), datasets
+
+
+connector, _ = build_connector(
+    int(os.getenv('BENCH_ROWS', '500')),
+    latency=float(os.getenv('BENCH_LATENCY', '0.05')),
+)
+app_module.connector = connector
+app = app_module.app
@@ -0,0 +1,147 @@
+"""
+In-memory stand-in for DataConnector used by the benchmarks
+Stores one DataFrame per sheet URL and can sleep to simulate Google Sheets latency
+"""
+import threading
+import time
+
+import pandas as pd
+
+from components.sheets_metrics import SHEETS_METRICS
+
+
+class FakeDataConnector:
+    """Implements the DataConnector read/write API against in-memory DataFrames"""
+
+    def __init__(self, sheets=None, latency=0.0):
+        self.client = object()  # Routes treat a missing client as "not configured"
+        self.latency = float(latency)
+        self.sheets = {url: df.copy() for url, df in (sheets or {}).items()}
+        self.versions = {url: 0 for url in self.sheets}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def reset_client(self):
+        pass
+
+    def warm_up(self):
+        return True
+
+    def _simulate_call(self, operation, url):
+        with self._lock:
+            self.calls.append((operation, url))
+        with SHEETS_METRICS.track(operation, url):
+            if self.latency > 0:
+                time.sleep(self.latency)
+
+    def read_from_sheets(self, url):
+        df, _ = self.read_versioned_from_sheets(url)
+        return df
+
+    def read_versioned_from_sheets(self, url):
+        self._simulate_call('read', url)
+        with self._lock:
+            df = self.sheets.get(url)
+            version = self.versions.get(url, 0)
+            return (pd.DataFrame() if df is None else df.copy()), version
+
+    def read_header(self, url):
+        self._simulate_call('read_header', url)
+        with self._lock:
+            df = self.sheets.get(url)
+            return [] if df is None else [str(col) for col in df.columns]
+
+    def read_rows(self, url, row_ids):
+        from data_sources import ROW_ID_COLUMN
+
+        self._simulate_call('read_rows', url)
+        with self._lock:
+            df = self.sheets.get(url)
+            version = self.versions.get(url, 0)
+            if df is None or ROW_ID_COLUMN not in df.columns:
+                return pd.DataFrame(), version
+            wanted = {str(row_id).strip() for row_id in row_ids}
+            return df[df[ROW_ID_COLUMN].astype(str).str.strip().isin(wanted)].reset_index(drop=True), version
+
+    def _store(self, url, df):
+        self.sheets[url] = df.reset_index(drop=True).copy()
+        self.versions[url] = self.versions.get(url, 0) + 1
+
+    def write_to_sheets(self, df, url):
+        self._simulate_call('write', url)
+        with self._lock:
+            self._store(url, df)
+        return True
+
+    def write_rows_to_sheets(self, df, url, positions):
+        self._simulate_call('write_rows', url)
+        with self._lock:
+            current = self.sheets.get(url, pd.DataFrame(columns=df.columns)).astype(object)
+            for pos in positions:
+                current.iloc[pos] = df.iloc[pos].values
+            self._store(url, current)
+        return True
+
+    def append_to_sheets(self, df, url):
+        self._simulate_call('append', url)
+        with self._lock:
+            self._store(url, self._appended(url, df))
+        return True
+
+    def _appended(self, url, df):
+        current = self.sheets.get(url)
+        if current is None or current.empty:
+            return df
+        return pd.concat([current, df], ignore_index=True)
+
+    def update_rows(self, url, updates):
+        return self.batch_write_to_sheets([{'kind': 'cells', 'url': url, 'updates': updates}])
+
+    def ensure_row_ids(self, url):
+        from data_sources import ROW_ID_COLUMN, fill_row_ids
+
+        self._simulate_call('write', url)
+        with self._lock:
+            current = self.sheets.get(url)
+            if current is None or len(current.columns) == 0:
+                return 0
+            before = current[ROW_ID_COLUMN].copy() if ROW_ID_COLUMN in current.columns else None
+            filled = fill_row_ids(current.copy())
+            changed = len(filled) if before is None else int((filled[ROW_ID_COLUMN] != before).sum())
+            if changed:
+                self._store(url, filled)
+            return changed
+
+    def batch_write_to_sheets(self, changes, expected_versions=None):
+        from data_sources import SheetConflictError, apply_row_updates
+
+        self._simulate_call('batch', None)
+        with self._lock:
+            conflicts = [
+                url for url, version in (expected_versions or {}).items()
+                if self.versions.get(url, 0) != version
+            ]
+            if conflicts:
+                raise SheetConflictError(conflicts)
+            staged = {}
+            for change in changes:
+                # Keyed updates are checked before anything is stored, like the real batch
+                if change['kind'] == 'cells':
+                    current = staged.get(change['url'], self.sheets.get(change['url'], pd.DataFrame()))
+                    staged[change['url']] = apply_row_updates(current.copy(), change['updates'], change['url'])
+            for change in changes:
+                url, df = change['url'], change.get('df')
+                if change['kind'] == 'check':
+                    continue
+                if change['kind'] == 'cells':
+                    self._store(url, apply_row_updates(self.sheets[url].copy(), change['updates'], url))
+                elif change['kind'] in ('replace', 'row_ids'):
+                    self._store(url, df)
+                elif change['kind'] == 'rows':
+                    current = self.sheets[url].astype(object)
+                    for pos in change['positions']:
+                        current.iloc[pos] = df.iloc[pos].values
+                    self._store(url, current)
+                else:
+                    self._store(url, self._appended(url, df))
+        return True
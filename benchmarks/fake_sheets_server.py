@@ -0,0 +1,505 @@
+"""
+Local stand-in for the Google Sheets v4 / Drive v3 HTTP APIs, for end-to-end load tests
+Implements the calls gspread makes for this app (spreadsheet metadata, values get/update/append/
+batchUpdate/clear, spreadsheet batchUpdate incl. resize, updateCells, appendCells and developer
+metadata, Drive file listing) on in-memory sheets, with injectable latency and 429 responses.
+
+Point the app at it with SHEETS_API_BASE_URL=http://127.0.0.1:<port> (no credentials needed).
+
+Usage: python benchmarks/fake_sheets_server.py --port 8765 --rows 1000 --latency 0.15 --error-rate 0.02
+Runtime knobs: POST /_fake/config {"latency": 0.2, "error_rate": 0.05, "quota_per_minute": 300},
+GET /_fake/stats, POST /_fake/reset
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SPREADSHEET_ID = 'BENCHMARK'
+# Same spreadsheet/gids as benchmarks/fake_app.py, so both can share the env URLs
+SEED_SHEETS = [
+    ('INVENTORY_SHEET_URL', 'Inventory', 'inventory'),
+    ('SOLD_ITEMS_SHEET_URL', 'Sold Items', 'sold'),
+    ('INVOICES_SHEET_URL', 'Invoices', 'invoices'),
+    ('CUSTOMERS_SHEET_URL', 'Customers', 'customers'),
+    ('USED_FREEBIE_SHEET_URL', 'Used Freebie', 'used_freebie'),
+    ('INDEX_SHEET_URL', 'INDEX', 'index'),
+    ('STOCK_MOVEMENTS_SHEET_URL', 'Stock Movements', 'stock_movements'),
+    ('PAYMENTS_SHEET_URL', 'Payments', 'payments'),
+]
+
+_CELL = re.compile(r'^([A-Za-z]*)(\d*)$')
+
+
+class ApiError(Exception):
+    def __init__(self, code, message, status):
+        super().__init__(message)
+        self.code, self.message, self.status = code, message, status
+
+
+def _column_index(letters):
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + (ord(char) - 64)
+    return index - 1
+
+
+def _column_letters(index):
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class FakeSheetsBackend:
+    """In-memory spreadsheets plus the latency/429 fault injection shared by all handler threads"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, quota_per_minute=0, seed=None):
+        self.lock = threading.Lock()
+        self.spreadsheets = {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self.stats = Counter()
+        self._recent = deque()
+        self._random = random.Random(seed)
+        self._next_metadata_id = 1
+
+    # Data ---------------------------------------------------------------------------
+
+    def add_spreadsheet(self, spreadsheet_id, title):
+        self.spreadsheets[spreadsheet_id] = {'title': title, 'sheets': []}
+
+    def add_sheet(self, spreadsheet_id, sheet_id, title, values):
+        values = [[_cell_text(v) for v in row] for row in values]
+        columns = max([len(r) for r in values] + [26])
+        self.spreadsheets[spreadsheet_id]['sheets'].append({
+            'properties': {
+                'sheetId': sheet_id, 'title': title,
+                'index': len(self.spreadsheets[spreadsheet_id]['sheets']), 'sheetType': 'GRID',
+                'gridProperties': {'rowCount': max(len(values), 1000), 'columnCount': columns},
+            },
+            'developerMetadata': [],
+            'values': values,
+        })
+
+    def seed_from_datasets(self, datasets):
+        self.add_spreadsheet(SPREADSHEET_ID, 'Inventory Benchmark')
+        for gid, (_, title, name) in enumerate(SEED_SHEETS):
+            df = datasets[name]
+            rows = [list(map(str, df.columns))] + df.astype(object).where(df.notna(), None).values.tolist()
+            self.add_sheet(SPREADSHEET_ID, gid, title, rows)
+
+    def _spreadsheet(self, spreadsheet_id):
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            raise ApiError(404, f"Requested entity was not found: {spreadsheet_id}", 'NOT_FOUND')
+        return spreadsheet
+
+    @staticmethod
+    def _sheet_by(spreadsheet, sheet_id=None, title=None):
+        for sheet in spreadsheet['sheets']:
+            props = sheet['properties']
+            if (sheet_id is not None and props['sheetId'] == sheet_id) or (title is not None and props['title'] == title):
+                return sheet
+        raise ApiError(400, f"Unable to parse range / unknown sheet: {title if title is not None else sheet_id}", 'INVALID_ARGUMENT')
+
+    def _resolve_range(self, spreadsheet, range_name):
+        """'Title'!A1:C3 -> (sheet, row0, col0, row1 or None, col1 or None), all 0-based inclusive."""
+        range_name = unquote(range_name)
+        if '!' in range_name:
+            title, cells = range_name.rsplit('!', 1)
+        elif range_name and any(s['properties']['title'] == range_name.strip("'").replace("''", "'") for s in spreadsheet['sheets']):
+            title, cells = range_name, ''
+        else:
+            title, cells = None, range_name
+        if title is None:
+            sheet = spreadsheet['sheets'][0]
+        else:
+            if title.startswith("'") and title.endswith("'"):
+                title = title[1:-1].replace("''", "'")
+            sheet = self._sheet_by(spreadsheet, title=title)
+        start, _, end = cells.partition(':')
+        row0, col0, row1, col1 = 0, 0, None, None
+        if start:
+            match = _CELL.match(start)
+            if not match:
+                raise ApiError(400, f"Unable to parse range: {range_name}", 'INVALID_ARGUMENT')
+            col0 = _column_index(match.group(1)) if match.group(1) else 0
+            row0 = int(match.group(2)) - 1 if match.group(2) else 0
+            if not end:
+                row1, col1 = (row0 if match.group(2) else None), (col0 if match.group(1) else None)
+        if end:
+            match = _CELL.match(end)
+            if not match:
+                raise ApiError(400, f"Unable to parse range: {range_name}", 'INVALID_ARGUMENT')
+            col1 = _column_index(match.group(1)) if match.group(1) else None
+            row1 = int(match.group(2)) - 1 if match.group(2) else None
+        return sheet, row0, col0, row1, col1
+
+    @staticmethod
+    def _a1(sheet, row0, col0, row1, col1):
+        title = sheet['properties']['title'].replace("'", "''")
+        return f"'{title}'!{_column_letters(col0)}{row0 + 1}:{_column_letters(col1)}{row1 + 1}"
+
+    @staticmethod
+    def _write(sheet, row0, col0, rows):
+        values = sheet['values']
+        grid = sheet['properties']['gridProperties']
+        for r, row in enumerate(rows):
+            target = row0 + r
+            while len(values) <= target:
+                values.append([])
+            line = values[target]
+            for c, value in enumerate(row):
+                while len(line) <= col0 + c:
+                    line.append('')
+                if value is not None:
+                    line[col0 + c] = _cell_text(value)
+        grid['rowCount'] = max(grid['rowCount'], row0 + len(rows))
+        grid['columnCount'] = max(grid['columnCount'], col0 + max([len(r) for r in rows] + [0]))
+
+    @staticmethod
+    def _last_row(sheet):
+        values = sheet['values']
+        for index in range(len(values) - 1, -1, -1):
+            if any(cell != '' for cell in values[index]):
+                return index
+        return -1
+
+    # Sheets API -----------------------------------------------------------------------
+
+    def get_spreadsheet(self, spreadsheet_id):
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        return {
+            'spreadsheetId': spreadsheet_id,
+            'properties': {'title': spreadsheet['title'], 'locale': 'en_US', 'timeZone': 'Asia/Manila'},
+            'sheets': [{k: copy.deepcopy(v) for k, v in sheet.items() if k != 'values'} for sheet in spreadsheet['sheets']],
+            'spreadsheetUrl': f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit",
+        }
+
+    def values_get(self, spreadsheet_id, range_name):
+        sheet, row0, col0, row1, col1 = self._resolve_range(self._spreadsheet(spreadsheet_id), range_name)
+        rows = sheet['values'][row0:None if row1 is None else row1 + 1]
+        out = [row[col0:None if col1 is None else col1 + 1] for row in rows]
+        out = [row[:max([i + 1 for i, v in enumerate(row) if v != ''] + [0])] for row in out]
+        while out and not out[-1]:
+            out.pop()
+        response = {'range': self._a1(sheet, row0, col0, row0 + max(len(out), 1) - 1,
+                                      col0 + max([len(r) for r in out] + [1]) - 1), 'majorDimension': 'ROWS'}
+        if out:
+            response['values'] = out
+        return response
+
+    def values_update(self, spreadsheet_id, range_name, body):
+        sheet, row0, col0, _, _ = self._resolve_range(self._spreadsheet(spreadsheet_id), range_name)
+        rows = body.get('values', [])
+        self._write(sheet, row0, col0, rows)
+        width = max([len(r) for r in rows] + [1])
+        return {'spreadsheetId': spreadsheet_id, 'updatedRange': self._a1(sheet, row0, col0, row0 + len(rows) - 1, col0 + width - 1),
+                'updatedRows': len(rows), 'updatedColumns': width, 'updatedCells': sum(len(r) for r in rows)}
+
+    def values_batch_update(self, spreadsheet_id, body):
+        responses = [self.values_update(spreadsheet_id, item['range'], item) for item in body.get('data', [])]
+        return {'spreadsheetId': spreadsheet_id, 'totalUpdatedRows': sum(r['updatedRows'] for r in responses),
+                'totalUpdatedCells': sum(r['updatedCells'] for r in responses), 'responses': responses}
+
+    def values_append(self, spreadsheet_id, range_name, body):
+        sheet, _, col0, _, _ = self._resolve_range(self._spreadsheet(spreadsheet_id), range_name)
+        rows = body.get('values', [])
+        row0 = self._last_row(sheet) + 1
+        update = self.values_update(spreadsheet_id, self._a1(sheet, row0, col0, row0, col0), {'values': rows}) if rows else {}
+        return {'spreadsheetId': spreadsheet_id, 'tableRange': self._a1(sheet, 0, 0, max(row0 - 1, 0), 0), 'updates': update}
+
+    def values_clear(self, spreadsheet_id, range_name):
+        sheet, row0, col0, row1, col1 = self._resolve_range(self._spreadsheet(spreadsheet_id), range_name)
+        for row in sheet['values'][row0:None if row1 is None else row1 + 1]:
+            for c in range(col0, len(row) if col1 is None else min(col1 + 1, len(row))):
+                row[c] = ''
+        return {'spreadsheetId': spreadsheet_id, 'clearedRange': range_name}
+
+    def batch_update(self, spreadsheet_id, body):
+        """Apply every request to a copy and swap it in only if all succeed (the API is atomic)."""
+        working = copy.deepcopy(self._spreadsheet(spreadsheet_id))
+        replies = [self._apply(working, request) for request in body.get('requests', [])]
+        self.spreadsheets[spreadsheet_id] = working
+        return {'spreadsheetId': spreadsheet_id, 'replies': replies}
+
+    def _apply(self, spreadsheet, request):
+        kind, spec = next(iter(request.items()))
+        if kind == 'updateSheetProperties':
+            props = spec['properties']
+            sheet = self._sheet_by(spreadsheet, sheet_id=props.get('sheetId', 0))
+            grid = props.get('gridProperties', {})
+            fields = spec.get('fields', '')
+            if 'title' in props and 'title' in fields:
+                sheet['properties']['title'] = props['title']
+            if 'rowCount' in grid and 'rowCount' in fields:
+                sheet['properties']['gridProperties']['rowCount'] = grid['rowCount']
+                del sheet['values'][grid['rowCount']:]
+            if 'columnCount' in grid and 'columnCount' in fields:
+                sheet['properties']['gridProperties']['columnCount'] = grid['columnCount']
+                sheet['values'] = [row[:grid['columnCount']] for row in sheet['values']]
+            return {}
+        if kind in ('updateCells', 'appendCells'):
+            sheet = self._sheet_by(spreadsheet, sheet_id=(spec.get('start') or spec).get('sheetId', 0))
+            rows = [[self._user_entered(cell) for cell in row.get('values', [])] for row in spec.get('rows', [])]
+            if kind == 'appendCells':
+                row0, col0 = self._last_row(sheet) + 1, 0
+            else:
+                row0, col0 = spec['start'].get('rowIndex', 0), spec['start'].get('columnIndex', 0)
+                grid = sheet['properties']['gridProperties']
+                width = max([len(r) for r in rows] + [0])
+                if row0 + len(rows) > grid['rowCount'] or col0 + width > grid['columnCount']:
+                    raise ApiError(400, 'Invalid requests[updateCells]: range exceeds grid limits', 'INVALID_ARGUMENT')
+            # Cells sent as {} clear the value when fields covers userEnteredValue
+            self._write(sheet, row0, col0, [['' if v is None else v for v in row] for row in rows])
+            return {}
+        if kind == 'createDeveloperMetadata':
+            metadata = copy.deepcopy(spec['developerMetadata'])
+            metadata['metadataId'] = self._next_metadata_id
+            self._next_metadata_id += 1
+            sheet = self._sheet_by(spreadsheet, sheet_id=metadata.get('location', {}).get('sheetId', 0))
+            metadata['location'] = {'locationType': 'SHEET', 'sheetId': sheet['properties']['sheetId']}
+            sheet['developerMetadata'].append(metadata)
+            return {'createDeveloperMetadata': {'developerMetadata': metadata}}
+        if kind == 'updateDeveloperMetadata':
+            ids = {f['developerMetadataLookup'].get('metadataId') for f in spec.get('dataFilters', [])}
+            updated = []
+            for sheet in spreadsheet['sheets']:
+                for metadata in sheet['developerMetadata']:
+                    if metadata['metadataId'] in ids:
+                        metadata['metadataValue'] = spec['developerMetadata'].get('metadataValue', metadata.get('metadataValue'))
+                        updated.append(copy.deepcopy(metadata))
+            return {'updateDeveloperMetadata': {'developerMetadata': updated}}
+        if kind == 'addSheet':
+            props = spec.get('properties', {})
+            sheet_id = props.get('sheetId', max([s['properties']['sheetId'] for s in spreadsheet['sheets']] + [-1]) + 1)
+            sheet = {'properties': {'sheetId': sheet_id, 'title': props.get('title', f"Sheet{sheet_id}"),
+                                    'index': len(spreadsheet['sheets']), 'sheetType': 'GRID',
+                                    'gridProperties': {'rowCount': 1000, 'columnCount': 26}},
+                     'developerMetadata': [], 'values': []}
+            spreadsheet['sheets'].append(sheet)
+            return {'addSheet': {'properties': copy.deepcopy(sheet['properties'])}}
+        raise ApiError(400, f"Unsupported request in fake server: {kind}", 'INVALID_ARGUMENT')
+
+    @staticmethod
+    def _user_entered(cell):
+        value = cell.get('userEnteredValue')
+        if not value:
+            return None
+        for key in ('stringValue', 'numberValue', 'boolValue', 'formulaValue'):
+            if key in value:
+                return value[key]
+        return None
+
+    # Drive API ------------------------------------------------------------------------
+
+    def drive_files(self):
+        return {'kind': 'drive#fileList', 'files': [self.drive_file(i) for i in self.spreadsheets]}
+
+    def drive_file(self, spreadsheet_id):
+        spreadsheet = self._spreadsheet(spreadsheet_id)
+        return {'kind': 'drive#file', 'id': spreadsheet_id, 'name': spreadsheet['title'],
+                'mimeType': 'application/vnd.google-apps.spreadsheet',
+                'createdTime': '2026-01-01T00:00:00.000Z', 'modifiedTime': '2026-01-01T00:00:00.000Z'}
+
+    # Fault injection ------------------------------------------------------------------
+
+    def throttle(self):
+        """Sleep for the configured latency; return True if this request should get a 429."""
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        with self.lock:
+            now = time.monotonic()
+            if self.quota_per_minute:
+                while self._recent and now - self._recent[0] > 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.quota_per_minute:
+                    return True
+                self._recent.append(now)
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    backend = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        backend = self.backend
+        parsed = urlparse(self.path)
+        path, query = parsed.path, parse_qs(parsed.query)
+        body = self._body() if method in ('PUT', 'POST') else {}
+
+        if path.startswith('/_fake/'):
+            return self._admin(method, path, body)
+
+        backend.stats['requests'] += 1
+        if backend.throttle():
+            backend.stats['429'] += 1
+            return self._send(429, {'error': {
+                'code': 429, 'status': 'RESOURCE_EXHAUSTED',
+                'message': "Quota exceeded for quota metric 'Read requests' and limit 'Read requests per minute per user'"}})
+        try:
+            with backend.lock:
+                payload = self._route(method, path, query, body)
+            self._send(200, payload)
+        except ApiError as e:
+            backend.stats[str(e.code)] += 1
+            self._send(e.code, {'error': {'code': e.code, 'message': e.message, 'status': e.status}})
+
+    def _route(self, method, path, query, body):
+        backend = self.backend
+        if path.startswith('/drive/v3/files'):
+            backend.stats['drive'] += 1
+            file_id = path[len('/drive/v3/files'):].strip('/')
+            return backend.drive_file(file_id) if file_id else backend.drive_files()
+
+        match = re.match(r'^/v4/spreadsheets/([^/:]+)(.*)$', path)
+        if not match:
+            raise ApiError(404, f"Unknown endpoint {path}", 'NOT_FOUND')
+        spreadsheet_id, rest = match.groups()
+        if rest == '' and method == 'GET':
+            backend.stats['get_spreadsheet'] += 1
+            return backend.get_spreadsheet(spreadsheet_id)
+        if rest == ':batchUpdate' and method == 'POST':
+            backend.stats['batch_update'] += 1
+            return backend.batch_update(spreadsheet_id, body)
+        if rest == '/values:batchUpdate' and method == 'POST':
+            backend.stats['values_batch_update'] += 1
+            return backend.values_batch_update(spreadsheet_id, body)
+        if rest == '/values:batchGet' and method == 'GET':
+            backend.stats['values_batch_get'] += 1
+            return {'spreadsheetId': spreadsheet_id,
+                    'valueRanges': [backend.values_get(spreadsheet_id, r) for r in query.get('ranges', [])]}
+        if rest == '/values:batchClear' and method == 'POST':
+            backend.stats['values_clear'] += 1
+            for range_name in body.get('ranges', []):
+                backend.values_clear(spreadsheet_id, range_name)
+            return {'spreadsheetId': spreadsheet_id, 'clearedRanges': body.get('ranges', [])}
+        if rest.startswith('/values/'):
+            range_name, _, action = rest[len('/values/'):].partition(':')
+            if method == 'GET' and not action:
+                backend.stats['values_get'] += 1
+                return backend.values_get(spreadsheet_id, range_name)
+            if method == 'PUT' and not action:
+                backend.stats['values_update'] += 1
+                return backend.values_update(spreadsheet_id, range_name, body)
+            if method == 'POST' and action == 'append':
+                backend.stats['values_append'] += 1
+                return backend.values_append(spreadsheet_id, range_name, body)
+            if method == 'POST' and action == 'clear':
+                backend.stats['values_clear'] += 1
+                return backend.values_clear(spreadsheet_id, range_name)
+        raise ApiError(404, f"Unsupported call {method} {path}", 'NOT_FOUND')
+
+    def _admin(self, method, path, body):
+        backend = self.backend
+        if path == '/_fake/stats':
+            return self._send(200, dict(backend.stats))
+        if path == '/_fake/reset' and method == 'POST':
+            backend.stats.clear()
+            return self._send(200, {'ok': True})
+        if path == '/_fake/config' and method == 'POST':
+            for key in ('latency', 'jitter', 'error_rate', 'quota_per_minute'):
+                if key in body:
+                    setattr(backend, key, type(getattr(backend, key))(body[key]))
+            return self._send(200, {key: getattr(backend, key) for key in ('latency', 'jitter', 'error_rate', 'quota_per_minute')})
+        return self._send(404, {'error': {'code': 404, 'message': 'Unknown admin endpoint', 'status': 'NOT_FOUND'}})
+
+
+def make_server(backend, host='127.0.0.1', port=8765):
+    handler = type('BoundFakeSheetsHandler', (FakeSheetsHandler,), {'backend': backend})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def sheet_env(base_url):
+    """Environment that points the app at this server's seeded spreadsheet."""
+    env = {'SHEETS_API_BASE_URL': base_url}
+    for gid, (env_name, _, _) in enumerate(SEED_SHEETS):
+        env[env_name] = f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/edit#gid={gid}"
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rows', type=int, default=1000, help='Rows of generated data per sheet')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every API call')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random 0..jitter seconds per call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of calls answered with 429')
+    parser.add_argument('--quota-per-minute', type=int, default=0, help='Answer 429 beyond this many calls a minute')
+    args = parser.parse_args()
+
+    from benchmarks.data_generator import generate_datasets
+
+    backend = FakeSheetsBackend(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                quota_per_minute=args.quota_per_minute, seed=args.seed)
+    backend.seed_from_datasets(generate_datasets(args.rows, seed=args.seed))
+    server = make_server(backend, args.host, args.port)
+    base_url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"Fake Google Sheets API listening on {base_url}", flush=True)
+    for key, value in sheet_env(base_url).items():
+        print(f"{key}={value}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
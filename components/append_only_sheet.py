@@ -0,0 +1,66 @@
+"""
+Append-only sheets (logs and ledgers)
+Rows are only ever added, so writes are plain appends staged on a unit of work, and lookups are
+served by indexes that only need to look at rows added since they were last updated.
+"""
+import pandas as pd
+
+
+class AppendOnlySheet:
+    """Stages rows on a unit of work as appends to one sheet with a fixed set of columns.
+
+    The header is checked once per process: while the sheet is still empty the first write is
+    a (version-checked) replace that creates it; every later write is a plain append.
+    """
+
+    def __init__(self, url, columns):
+        self.url = url
+        self.columns = list(columns)
+        self._header = None
+
+    def stage(self, uow, rows):
+        if not self.url or not rows:
+            return False
+        frame = pd.DataFrame(rows, columns=self.columns)
+        if self._header is None:
+            existing = uow.read_from_sheets(self.url)
+            if existing is None or len(existing.columns) == 0:
+                return uow.write_to_sheets(frame, self.url)
+            header = [str(col) for col in existing.columns]
+            missing = [col for col in self.columns if col not in header]
+            if missing:
+                combined = pd.concat([existing, frame], ignore_index=True).reindex(columns=header + missing)
+                return uow.write_to_sheets(combined, self.url)
+            self._header = header
+        return uow.append_to_sheets(frame.reindex(columns=self._header), self.url)
+
+
+class AppendOnlyIndex:
+    """Base for lookups over an append-only sheet; subclasses index rows in _index_rows(df, start)"""
+
+    def __init__(self):
+        self.size = 0
+        self._df = pd.DataFrame()
+        self._reset()
+
+    def _reset(self):
+        pass
+
+    def _index_rows(self, df, start):
+        raise NotImplementedError
+
+    def update(self, df):
+        """Index rows added since the last update; rebuilds if the sheet shrank (edited by hand)."""
+        if df is None or df.empty or len(df) < self.size:
+            self.size = 0
+            self._reset()
+        if df is None or df.empty:
+            self._df = pd.DataFrame()
+            return self
+        self._index_rows(df, self.size)
+        self.size = len(df)
+        self._df = df
+        return self
+
+    def _rows(self, positions):
+        return self._df.iloc[positions] if positions else self._df.iloc[0:0]
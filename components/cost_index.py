@@ -0,0 +1,105 @@
+"""
+Running weighted-average cost per product
+Keeps, per product, the sum of cost x remaining units and the remaining units of its in-stock lots.
+Built from the Inventory rows in one vectorized pass and updated by delta as lots are consumed or
+restored, so the normalized cost per unit is an O(1) lookup for the invoice stock sync, the inventory
+summary and reports.
+"""
+import pandas as pd
+
+
+def product_key(value):
+    """Name a lot is grouped under: stripped text, '' for blanks and the 'Unknown' placeholder."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    name = str(value).strip()
+    return '' if name == 'Unknown' else name
+
+
+def product_keys(series):
+    """product_key() of a whole column at once."""
+    names = series.where(series.notna(), '').astype(str).str.strip()
+    return names.where(names != 'Unknown', '')
+
+
+def _quantities(series):
+    """Sheet quantities as ints ('2.0' -> 2, blanks and junk -> 0)."""
+    return pd.to_numeric(series, errors='coerce').fillna(0).astype(float).astype(int)
+
+
+def _costs(series):
+    return pd.to_numeric(series, errors='coerce').fillna(0.0).astype(float)
+
+
+class CostIndex:
+    """Per-product totals: bought, remaining, lot count and the weighted cost of remaining stock"""
+
+    def __init__(self):
+        self._products = {}  # product_name -> [total_bought, total_remaining, entry_count, cost_sum, cost_qty]
+
+    @classmethod
+    def from_inventory(cls, df):
+        """Build from Inventory rows in one vectorized pass."""
+        index = cls()
+        if df is None or df.empty or 'product_name' not in df.columns:
+            return index
+        names = product_keys(df['product_name'])
+        if 'total_bought_quantity' in df.columns:
+            bought = _quantities(df['total_bought_quantity'])
+        elif 'quantity' in df.columns:
+            bought = _quantities(df['quantity'])
+        else:
+            bought = pd.Series(0, index=df.index)
+        remaining = _quantities(df['remaining_qty']) if 'remaining_qty' in df.columns else bought
+        cost = _costs(df['total_cost_per_unit']) if 'total_cost_per_unit' in df.columns else pd.Series(0.0, index=df.index)
+        in_stock = remaining > 0
+        frame = pd.DataFrame({
+            'name': names,
+            'bought': bought,
+            'remaining': remaining,
+            'cost_sum': (cost * remaining).where(in_stock, 0.0),
+            'cost_qty': remaining.where(in_stock, 0),
+        })
+        frame = frame[frame['name'] != '']
+        grouped = frame.groupby('name', sort=False).agg(
+            bought=('bought', 'sum'), remaining=('remaining', 'sum'), entries=('bought', 'size'),
+            cost_sum=('cost_sum', 'sum'), cost_qty=('cost_qty', 'sum'))
+        for name, row in zip(grouped.index, grouped.itertuples(index=False)):
+            index._products[name] = [int(row.bought), int(row.remaining), int(row.entries),
+                                     float(row.cost_sum), int(row.cost_qty)]
+        return index
+
+    def _entry(self, product_name):
+        return self._products.setdefault(product_key(product_name), [0, 0, 0, 0.0, 0])
+
+    def adjust(self, product_name, cost_per_unit, old_remaining, new_remaining):
+        """A lot's remaining quantity changed from old to new (consumption or restore)."""
+        entry = self._entry(product_name)
+        entry[1] += new_remaining - old_remaining
+        old_stock, new_stock = max(old_remaining, 0), max(new_remaining, 0)
+        entry[3] += cost_per_unit * (new_stock - old_stock)
+        entry[4] += new_stock - old_stock
+
+    def remaining(self, product_name):
+        entry = self._products.get(product_key(product_name))
+        return entry[1] if entry else 0
+
+    def average_cost(self, product_name):
+        """Weighted-average cost per unit of the product's remaining stock (0 when none is left)."""
+        entry = self._products.get(product_key(product_name))
+        if not entry or entry[4] <= 0:
+            return 0.0
+        return entry[3] / entry[4]
+
+    def summary(self):
+        """Rows for the inventory page's per-product summary, sorted by product name."""
+        rows = [{
+            'product_name': name,
+            'total_bought': entry[0],
+            'total_remaining': entry[1],
+            'entry_count': entry[2],
+            'weighted_cost_sum': entry[3],
+            'weighted_cost_qty': entry[4],
+            'normalized_cost_per_unit': (entry[3] / entry[4]) if entry[4] > 0 else 0.0,
+        } for name, entry in self._products.items()]
+        return sorted(rows, key=lambda row: row['product_name'].lower())
@@ -0,0 +1,155 @@
+"""
+Cost-lot engine (FIFO / LIFO / weighted average)
+Keeps, per product, a deque of its open inventory lots in purchase order. Consuming stock takes
+units from one end of the deque and prices them in the same pass, so the cost of goods on a sold
+row is always the cost of the lots whose remaining quantity went down.
+"""
+from collections import deque
+
+import pandas as pd
+
+from components.cost_index import CostIndex, product_key, product_keys, _quantities, _costs
+
+COST_POLICIES = ('fifo', 'lifo', 'average')
+
+
+class CostLotEngine:
+    """Open lots per product, consumed according to a cost-flow policy.
+
+    fifo    - oldest lots first, cost of goods is the cost of the units taken
+    lifo    - newest lots first, cost of goods is the cost of the units taken
+    average - oldest lots first, cost of goods is the weighted average of the remaining stock
+
+    Lots are identified by their inventory row index. Each deque only holds lots with stock left
+    and is only popped at its ends, so consuming is O(1) amortized per lot however many lots a
+    product has. The running per-product totals are kept in a CostIndex (engine.index).
+    """
+
+    def __init__(self, policy='average'):
+        policy = str(policy or 'average').strip().lower()
+        if policy not in COST_POLICIES:
+            raise ValueError(f"Unknown cost policy '{policy}'. Use one of: {', '.join(COST_POLICIES)}")
+        self.policy = policy
+        self.index = CostIndex()
+        self._open = {}      # product_name -> deque of open lot row indexes, oldest on the left
+        self._all = {}       # product_name -> row indexes of all its lots (open or not), oldest first
+        self._lots = {}      # row index -> [product_name, unit_cost, remaining, bought]
+
+    @classmethod
+    def from_inventory(cls, df, policy='average'):
+        """Build from Inventory rows; lots are ordered by date_added (sheet order breaks ties)."""
+        engine = cls(policy)
+        engine.index = CostIndex.from_inventory(df)
+        if df is None or df.empty or 'product_name' not in df.columns:
+            return engine
+        if 'total_bought_quantity' in df.columns:
+            bought = _quantities(df['total_bought_quantity'])
+        elif 'quantity' in df.columns:
+            bought = _quantities(df['quantity'])
+        else:
+            bought = pd.Series(0, index=df.index)
+        remaining = _quantities(df['remaining_qty']) if 'remaining_qty' in df.columns else bought
+        lots = pd.DataFrame({
+            'name': product_keys(df['product_name']),
+            'cost': _costs(df['total_cost_per_unit']) if 'total_cost_per_unit' in df.columns else 0.0,
+            'remaining': remaining,
+            'bought': bought,
+            'added': pd.to_datetime(df['date_added'], errors='coerce') if 'date_added' in df.columns else pd.NaT,
+        }, index=df.index)
+        lots = lots[lots['name'] != ''].sort_values('added', kind='stable', na_position='last')
+        for idx, name, cost, qty, bought in zip(lots.index, lots['name'], lots['cost'], lots['remaining'], lots['bought']):
+            engine._track(idx, name, float(cost), int(qty), int(bought))
+        return engine
+
+    def _track(self, idx, product_name, unit_cost, remaining, bought):
+        self._lots[idx] = [product_name, unit_cost, remaining, bought]
+        self._all.setdefault(product_name, []).append(idx)
+        if remaining > 0:
+            self._open.setdefault(product_name, deque()).append(idx)
+
+    def remaining(self, product_name):
+        return self.index.remaining(product_name)
+
+    def average_cost(self, product_name):
+        return self.index.average_cost(product_name)
+
+    def consume(self, product_name, quantity):
+        """Take quantity units of a product.
+
+        Returns (takes, cost_of_goods) where takes is a list of (row_index, taken, remaining_after).
+        Raises ValueError (and changes nothing) when there is not enough stock, by the product
+        totals or in the open lots themselves, so a sale is never partly taken and costed at zero.
+        """
+        product_name = product_key(product_name)
+        available = self.remaining(product_name)
+        if quantity > available:
+            raise ValueError(f"Insufficient stock for '{product_name}'. Needed {quantity}, available {available}.")
+        average = self.average_cost(product_name)
+        open_lots = self._open.get(product_name, deque())
+        take_from_newest = self.policy == 'lifo'
+        in_lots = 0
+        for idx in (reversed(open_lots) if take_from_newest else open_lots):
+            in_lots += self._lots[idx][2]
+            if in_lots >= quantity:
+                break
+        if in_lots < quantity:
+            raise ValueError(
+                f"Insufficient stock in the lots of '{product_name}'. Needed {quantity}, open lots hold {in_lots}."
+            )
+        takes = []
+        cost_of_goods = 0.0
+        left = quantity
+        while left > 0 and open_lots:
+            idx = open_lots[-1] if take_from_newest else open_lots[0]
+            lot = self._lots[idx]
+            taken = min(lot[2], left)
+            self.index.adjust(product_name, lot[1], lot[2], lot[2] - taken)
+            lot[2] -= taken
+            left -= taken
+            cost_of_goods += lot[1] * taken
+            takes.append((idx, taken, lot[2]))
+            if lot[2] <= 0:
+                if take_from_newest:
+                    open_lots.pop()
+                else:
+                    open_lots.popleft()
+        if self.policy == 'average':
+            cost_of_goods = average * quantity
+        return takes, cost_of_goods
+
+    def restore(self, product_name, quantity):
+        """Put units back, undoing consumption in reverse order (newest consumed lot first).
+
+        Lots are refilled up to their bought quantity; anything beyond that goes on the lot the
+        policy consumes first. Returns a list of (row_index, remaining_before, remaining_after).
+        Restores only happen when an invoice is edited or deleted, so this may walk all lots of
+        the product.
+        """
+        product_name = product_key(product_name)
+        all_lots = self._all.get(product_name)
+        if not all_lots or quantity <= 0:
+            return []
+        refill_order = all_lots if self.policy == 'lifo' else all_lots[::-1]
+        added = {}
+        left = quantity
+        for idx in refill_order:
+            if left <= 0:
+                break
+            lot = self._lots[idx]
+            room = lot[3] - lot[2]
+            if room > 0:
+                added[idx] = min(room, left)
+                left -= added[idx]
+        if left > 0:
+            first = refill_order[-1]
+            added[first] = added.get(first, 0) + left
+        changes = []
+        for idx, qty in added.items():
+            lot = self._lots[idx]
+            before = lot[2]
+            self.index.adjust(product_name, lot[1], before, before + qty)
+            lot[2] += qty
+            changes.append((idx, before, lot[2]))
+        # Refilled lots can sit anywhere in purchase order, so re-queue the product's open lots
+        self._open[product_name] = deque(idx for idx in all_lots if self._lots[idx][2] > 0)
+        return changes
@@ -0,0 +1,239 @@
+"""
+Customer aggregate engine for the Customers tab
+Applies per-invoice deltas to a single customer row and rebuilds all rows from the Invoices tab
+"""
+import json
+
+import pandas as pd
+
+CUSTOMER_COLUMNS = [
+    'customer_name', 'total_orders', 'total_spent', 'first_order_date',
+    'last_order_date', 'products_purchased'
+]
+
+
+def _num(value, default=0.0):
+    try:
+        if value is None or pd.isna(value) or value == '':
+            return default
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _key(customer_name):
+    return str(customer_name or '').strip()
+
+
+def _clean_amount(value):
+    value = round(float(value), 2)
+    return int(value) if value.is_integer() else value
+
+
+def summarize_items(items):
+    """Collapse invoice items into {product_name: {'qty', 'total_amount'}}."""
+    summary = {}
+    for item in items or []:
+        product_name = str(item.get('name', '') or '').strip()
+        if not product_name:
+            continue
+        qty = _num(item.get('quantity', 0))
+        price = _num(item.get('price', 0))
+        entry = summary.setdefault(product_name, {'qty': 0, 'total_amount': 0})
+        entry['qty'] = _clean_amount(entry['qty'] + qty)
+        entry['total_amount'] = _clean_amount(entry['total_amount'] + price * qty)
+    return summary
+
+
+def _parse_products(value):
+    if isinstance(value, dict):
+        return value
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return {}
+    try:
+        parsed = json.loads(str(value))
+        return parsed if isinstance(parsed, dict) else {}
+    except (ValueError, TypeError):
+        return {}
+
+
+class CustomerAggregates:
+    """Customers sheet rows with a name -> row hash index and dirty-row tracking
+
+    invoice_df, when given, holds the invoice rows that remain once the removed invoices are gone;
+    it is used to recompute a customer's first/last order date when one of them is removed.
+    """
+
+    def __init__(self, customers_df, invoice_df=None):
+        self.invoice_df = invoice_df
+        if customers_df is None or customers_df.empty:
+            customers_df = pd.DataFrame(columns=CUSTOMER_COLUMNS)
+        missing = [col for col in CUSTOMER_COLUMNS if col not in customers_df.columns]
+        self.schema_changed = bool(missing)
+        if missing:
+            customers_df = customers_df.copy()  # The table may be shared through the request's TableContext
+            for col in missing:
+                customers_df[col] = None
+        self.df = customers_df.reset_index(drop=True).astype(object)
+        self.base_row_count = len(self.df)
+        self.dirty_positions = set()
+        self._index = {}
+        for pos, name in enumerate(self.df['customer_name'].tolist()):
+            key = _key(name)
+            if key and key not in self._index:
+                self._index[key] = pos
+
+    def position_of(self, customer_name):
+        return self._index.get(_key(customer_name))
+
+    def apply_invoice(self, customer_name, items, total_amount, invoice_date, sign=1, count_order=True):
+        """Add (sign=1) or remove (sign=-1) one invoice's contribution to its customer row."""
+        key = _key(customer_name)
+        if not key:
+            return None
+        pos = self._index.get(key)
+        if pos is None:
+            if sign < 0:
+                return None
+            pos = len(self.df)
+            self.df.loc[pos] = {
+                'customer_name': key,
+                'total_orders': 0,
+                'total_spent': 0,
+                'first_order_date': invoice_date,
+                'last_order_date': invoice_date,
+                'products_purchased': '{}'
+            }
+            self._index[key] = pos
+
+        at = self.df.at
+        if count_order:
+            at[pos, 'total_orders'] = max(0, int(_num(at[pos, 'total_orders'])) + sign)
+        at[pos, 'total_spent'] = _clean_amount(max(0.0, _num(at[pos, 'total_spent']) + sign * _num(total_amount)))
+        if sign > 0 and invoice_date:
+            first = str(at[pos, 'first_order_date'] or '').strip()
+            last = str(at[pos, 'last_order_date'] or '').strip()
+            if not first or str(invoice_date) < first:
+                at[pos, 'first_order_date'] = invoice_date
+            if not last or str(invoice_date) > last:
+                at[pos, 'last_order_date'] = invoice_date
+
+        elif sign < 0 and invoice_date:
+            removed = str(invoice_date).strip()
+            if removed in (str(at[pos, 'first_order_date'] or '').strip(), str(at[pos, 'last_order_date'] or '').strip()):
+                self._recompute_order_dates(pos, key)
+
+        products = _parse_products(at[pos, 'products_purchased'])
+        for product_name, details in summarize_items(items).items():
+            entry = products.get(product_name) or {'qty': 0, 'total_amount': 0}
+            qty = _num(entry.get('qty', 0)) + sign * details['qty']
+            amount = _num(entry.get('total_amount', 0)) + sign * details['total_amount']
+            if qty <= 0:
+                products.pop(product_name, None)
+            else:
+                products[product_name] = {'qty': _clean_amount(qty), 'total_amount': _clean_amount(amount)}
+        at[pos, 'products_purchased'] = json.dumps(products)
+
+        self.dirty_positions.add(pos)
+        return pos
+
+    def _recompute_order_dates(self, pos, key):
+        """First/last order date of a customer from their remaining invoices (blank when none are left)."""
+        if self.invoice_df is None:
+            return
+        df = self.invoice_df
+        if df.empty or 'customer_name' not in df.columns or 'invoice_date' not in df.columns:
+            dates = []
+        else:
+            mine = df[df['customer_name'].fillna('').astype(str).str.strip() == key]
+            dates = sorted(d for d in mine['invoice_date'].fillna('').astype(str).str.strip() if d)
+        self.df.at[pos, 'first_order_date'] = dates[0] if dates else ''
+        self.df.at[pos, 'last_order_date'] = dates[-1] if dates else ''
+
+    def updated_positions(self):
+        return sorted(p for p in self.dirty_positions if p < self.base_row_count)
+
+    def new_rows(self):
+        new_positions = sorted(p for p in self.dirty_positions if p >= self.base_row_count)
+        return self.df.iloc[new_positions]
+
+    def persist(self, connector, url):
+        """Write only the touched rows; fall back to a full write when the sheet schema changed."""
+        if not self.dirty_positions:
+            return True
+        if self.schema_changed or self.base_row_count == 0:
+            return connector.write_to_sheets(self.df, url)
+        ok = connector.write_rows_to_sheets(self.df, url, self.updated_positions())
+        new_rows = self.new_rows()
+        if ok and not new_rows.empty:
+            ok = connector.append_to_sheets(new_rows, url)
+        return ok
+
+
+def recompute_customers(invoice_df, existing_customers_df=None):
+    """Rebuild the Customers table from invoice line rows in one vectorized pass."""
+    if invoice_df is None or invoice_df.empty or 'customer_name' not in invoice_df.columns:
+        return pd.DataFrame(columns=CUSTOMER_COLUMNS)
+
+    lines = invoice_df.copy()
+    for col in ['invoice_number', 'created_at', 'invoice_date', 'product_name']:
+        if col not in lines.columns:
+            lines[col] = ''
+    lines['customer_name'] = lines['customer_name'].fillna('').astype(str).str.strip()
+    lines = lines[lines['customer_name'] != '']
+    if lines.empty:
+        return pd.DataFrame(columns=CUSTOMER_COLUMNS)
+
+    lines['product_name'] = lines['product_name'].fillna('').astype(str).str.strip()
+    lines['invoice_date'] = lines['invoice_date'].fillna('').astype(str).str.strip()
+    lines['_qty'] = pd.to_numeric(lines.get('quantity'), errors='coerce').fillna(0)
+    lines['_price'] = pd.to_numeric(lines.get('price_sold'), errors='coerce').fillna(0)
+    lines['_total'] = pd.to_numeric(lines.get('total_amount'), errors='coerce').fillna(0)
+    lines['_line_amount'] = lines['_qty'] * lines['_price']
+    lines['_invoice_key'] = (
+        lines['invoice_number'].fillna('').astype(str).str.strip() + '|' +
+        lines['created_at'].fillna('').astype(str).str.strip()
+    )
+
+    # Invoice-level totals repeat on every line row, so count each invoice once.
+    invoices = lines.drop_duplicates(subset=['customer_name', '_invoice_key'])
+    dated = invoices[invoices['invoice_date'] != '']
+    totals = invoices.groupby('customer_name', sort=True).agg(
+        total_orders=('_invoice_key', 'size'),
+        total_spent=('_total', 'sum')
+    )
+    # Sort once and take first/last: string min/max fall back to a slow per-group Python path.
+    by_date = dated.sort_values('invoice_date', kind='stable').groupby('customer_name')['invoice_date']
+    totals['first_order_date'] = by_date.first()
+    totals['last_order_date'] = by_date.last()
+
+    products = (
+        lines[(lines['product_name'] != '') & (lines['_qty'] > 0)]
+        .groupby(['customer_name', 'product_name'], sort=True)
+        .agg(qty=('_qty', 'sum'), total_amount=('_line_amount', 'sum'))
+    )
+    products_by_customer = {}
+    for (customer_name, product_name), qty, amount in zip(products.index, products['qty'], products['total_amount']):
+        products_by_customer.setdefault(customer_name, {})[product_name] = {
+            'qty': _clean_amount(qty),
+            'total_amount': _clean_amount(amount)
+        }
+
+    result = totals.reset_index()
+    result['total_spent'] = result['total_spent'].apply(_clean_amount)
+    result['first_order_date'] = result['first_order_date'].fillna('')
+    result['last_order_date'] = result['last_order_date'].fillna('')
+    result['products_purchased'] = result['customer_name'].map(
+        lambda name: json.dumps(products_by_customer.get(name, {}))
+    )
+
+    # Keep any extra columns the user added to the Customers tab.
+    if existing_customers_df is not None and not existing_customers_df.empty and 'customer_name' in existing_customers_df.columns:
+        extra_cols = [c for c in existing_customers_df.columns if c not in CUSTOMER_COLUMNS]
+        if extra_cols:
+            extras = existing_customers_df[['customer_name'] + extra_cols].copy()
+            extras['customer_name'] = extras['customer_name'].fillna('').astype(str).str.strip()
+            extras = extras.drop_duplicates(subset=['customer_name'])
+            result = result.merge(extras, on='customer_name', how='left')
+
+    return result[CUSTOMER_COLUMNS + [c for c in result.columns if c not in CUSTOMER_COLUMNS]]
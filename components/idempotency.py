@@ -0,0 +1,136 @@
+"""
+Idempotency keys for mutating requests
+A client that retries a POST sends the same Idempotency-Key header again. The first successful
+response is stored under that key and replayed to the retries, so a retried request never reaches
+Google Sheets twice. Keys expire after a TTL and at most max_keys are kept (oldest evicted first);
+the store is shared by all workers through a components.shared_sqlite database when there is one
+(in-process otherwise).
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+MAX_KEY_LENGTH = 255
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    status INTEGER,
+    mimetype TEXT,
+    body BLOB
+);
+CREATE INDEX IF NOT EXISTS idempotency_keys_by_time ON idempotency_keys (started_at);
+"""
+
+
+def request_fingerprint(method, path, body):
+    """Hash of what a key was first used for; a key sent again with another request is rejected."""
+    digest = hashlib.sha256(f"{method} {path}\n".encode('utf-8'))
+    digest.update(body or b'')
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """Completed responses by Idempotency-Key, plus leases for requests still running.
+
+    begin() returns one of
+      ('started', token, None)      - the caller runs the request, then finish() or abandon()
+      ('replay', None, response)    - (status, mimetype, body) of the completed request
+      ('in_progress', None, None)   - another worker is running a request with this key
+      ('mismatch', None, None)      - the key was used for a different request
+    A lease that is never finished (the worker died) expires after lease_seconds.
+    """
+
+    def __init__(self, ttl_seconds=86400.0, max_keys=10000, lease_seconds=300.0, store=None):
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_keys = max(1, int(max_keys))
+        self.lease_seconds = float(lease_seconds)
+        self.store = store  # SharedDatabase
+        if store is not None:
+            store.create(_SCHEMA)
+        self._entries = OrderedDict()  # key -> [fingerprint, started_at, response or None], oldest first
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        cutoff = now - self.ttl_seconds
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[1] >= cutoff and len(self._entries) <= self.max_keys:
+                break
+            del self._entries[key]
+
+    def _begin_shared(self, key, fingerprint, now):
+        with self.store.transaction() as conn:
+            conn.execute(
+                'DELETE FROM idempotency_keys WHERE started_at < ? OR (status IS NULL AND started_at < ?)',
+                (now - self.ttl_seconds, now - self.lease_seconds)
+            )
+            row = conn.execute(
+                'SELECT fingerprint, status, mimetype, body FROM idempotency_keys WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    'INSERT INTO idempotency_keys (key, fingerprint, started_at) VALUES (?, ?, ?)',
+                    (key, fingerprint, now)
+                )
+                conn.execute(
+                    'DELETE FROM idempotency_keys WHERE key IN '
+                    '(SELECT key FROM idempotency_keys ORDER BY started_at DESC LIMIT -1 OFFSET ?)',
+                    (self.max_keys,)
+                )
+                return 'started', now, None
+            if row[0] != fingerprint:
+                return 'mismatch', None, None
+            if row[1] is None:
+                return 'in_progress', None, None
+            return 'replay', None, (row[1], row[2], bytes(row[3] or b''))
+
+    def begin(self, key, fingerprint, now=None):
+        now = time.time() if now is None else now
+        if self.store is not None:
+            return self._begin_shared(key, fingerprint, now)
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is None and entry[1] < now - self.lease_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._entries[key] = [fingerprint, now, None]
+                self._evict(now)
+                return 'started', now, None
+            if entry[0] != fingerprint:
+                return 'mismatch', None, None
+            if entry[2] is None:
+                return 'in_progress', None, None
+            return 'replay', None, entry[2]
+
+    def finish(self, key, token, status, mimetype, body):
+        """Store the response of a request started with begin()."""
+        if self.store is not None:
+            self.store.connection().execute(
+                'UPDATE idempotency_keys SET status = ?, mimetype = ?, body = ? '
+                'WHERE key = ? AND started_at = ? AND status IS NULL',
+                (status, mimetype, sqlite3.Binary(body), key, token)
+            )
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == token and entry[2] is None:
+                entry[2] = (status, mimetype, body)
+
+    def abandon(self, key, token):
+        """Drop the lease of a request that did not succeed, so the client can retry it for real."""
+        if self.store is not None:
+            self.store.connection().execute(
+                'DELETE FROM idempotency_keys WHERE key = ? AND started_at = ? AND status IS NULL', (key, token)
+            )
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == token and entry[2] is None:
+                del self._entries[key]
@@ -0,0 +1,264 @@
+"""
+Bulk import of inventory purchases from CSV
+Reads the file in chunks, validates and prices each chunk with vectorized pandas operations,
+checks for duplicates within the file and, through the same recent-submissions window as
+Add Product, against recent purchases, and stages every accepted row as a single append.
+Used by /api/import_inventory and from the command line:
+
+    python components/inventory_import.py delivery.csv [--dry-run] [--allow-duplicates]
+
+CSV columns: product_name, total_price, quantity (required); shipping_admin_fee, supplier,
+remarks, date_added (optional). total_cost_per_unit is (total_price + shipping_admin_fee) / quantity.
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path (the module also runs as a script)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from components.recent_submissions import purchase_fingerprint
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_COLUMNS = [
+    'product_name', 'total_price', 'shipping_admin_fee', 'total_cost_per_unit', 'quantity',
+    'total_bought_quantity', 'remaining_qty', 'supplier', 'date_added', 'remarks', 'status',
+    'selling_price', 'profit', 'tithe', 'profit_after_tithe', 'date_sold'
+]
+REQUIRED_IMPORT_COLUMNS = ['product_name', 'total_price', 'quantity']
+OPTIONAL_IMPORT_COLUMNS = ['shipping_admin_fee', 'supplier', 'remarks', 'date_added']
+IMPORT_CHUNK_ROWS = 1000
+
+# Rows of one file are duplicates when the same purchase is dated within this window of each other
+DUPLICATE_WINDOW = pd.Timedelta(minutes=2)
+
+
+def _numbers(series):
+    return pd.to_numeric(series.astype(str).str.replace(',', '', regex=False).str.strip(), errors='coerce')
+
+
+def _normalize_header(columns):
+    return [str(col).strip().lower().replace(' ', '_') for col in columns]
+
+
+def validate_chunk(chunk, first_line, now):
+    """Validate and price one chunk of CSV rows.
+
+    Returns (rows, errors, keys): Inventory rows (a DataFrame in INVENTORY_COLUMNS order, indexed
+    by CSV line number) for the valid lines, {'line', 'product_name', 'message'} dicts for the
+    others and the purchase_fingerprint and timestamp of each valid row.
+    """
+    chunk = chunk.reset_index(drop=True)
+    chunk.index = range(first_line, first_line + len(chunk))
+    blank = pd.Series('', index=chunk.index)
+    names = chunk['product_name'].astype(str).str.strip()
+    prices = _numbers(chunk['total_price'])
+    fee_text = chunk['shipping_admin_fee'].astype(str).str.strip() if 'shipping_admin_fee' in chunk.columns else blank
+    fees = _numbers(fee_text).where(fee_text != '', 0.0)
+    quantities = _numbers(chunk['quantity'])
+    date_text = chunk['date_added'].astype(str).str.strip() if 'date_added' in chunk.columns else blank
+    dates = pd.to_datetime(date_text.where(date_text != ''), errors='coerce', format='mixed')
+    dates = dates.where(date_text != '', now)
+
+    checks = [
+        (names == '', 'product_name is required'),
+        (prices.isna(), 'total_price must be a number'),
+        (prices < 0, 'total_price cannot be negative'),
+        (fees.isna(), 'shipping_admin_fee must be a number'),
+        (fees < 0, 'shipping_admin_fee cannot be negative'),
+        (quantities.isna() | (quantities % 1 != 0), 'quantity must be a whole number'),
+        (quantities <= 0, 'quantity must be at least 1'),
+        (dates.isna(), 'date_added is not a valid date'),
+    ]
+    messages = pd.Series(
+        np.select([mask.fillna(False).to_numpy() for mask, _ in checks], [message for _, message in checks], ''),
+        index=chunk.index
+    )
+    errors = [
+        {'line': int(line), 'product_name': names[line], 'message': message}
+        for line, message in messages[messages != ''].items()
+    ]
+
+    valid = messages == ''
+    quantity = quantities[valid].astype(int)
+    price, fee = prices[valid].astype(float), fees[valid].astype(float)
+    suppliers = chunk['supplier'].astype(str).str.strip()[valid] if 'supplier' in chunk.columns else blank[valid]
+    rows = pd.DataFrame({
+        'product_name': names[valid],
+        'total_price': price,
+        'shipping_admin_fee': fee,
+        'total_cost_per_unit': (price + fee) / quantity,
+        'quantity': quantity,
+        'total_bought_quantity': quantity,
+        'remaining_qty': quantity,
+        'supplier': suppliers,
+        'date_added': dates[valid].dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'remarks': chunk['remarks'].astype(str).str.strip()[valid] if 'remarks' in chunk.columns else blank[valid],
+        'status': 'in_stock',
+    }, index=chunk.index[valid]).reindex(columns=INVENTORY_COLUMNS)
+    fingerprints = [
+        purchase_fingerprint(*purchase)
+        for purchase in zip(rows['product_name'], price, fee, quantity, suppliers)
+    ]
+    return rows, errors, list(zip(fingerprints, dates[valid]))
+
+
+def read_import(stream, allow_duplicates=False, chunk_rows=IMPORT_CHUNK_ROWS, now=None):
+    """Validate a CSV stream, dropping rows that repeat an earlier purchase of the same file.
+
+    Returns (accepted rows DataFrame, the fingerprint each is claimed under in the recent-submissions
+    window, result dict with counts and per-line errors). Raises ValueError when the file itself is unusable (missing columns, not CSV).
+    """
+    now = pd.Timestamp(now or datetime.now()).floor('s')
+    seen_in_file = {}  # fingerprint -> [(timestamp, line)] of rows accepted from this file
+    accepted, fingerprints, errors = [], [], []
+    rows_read = 0
+    ignored_columns = []
+    header_checked = False
+    try:
+        reader = pd.read_csv(stream, chunksize=chunk_rows, dtype=str, keep_default_na=False,
+                             skipinitialspace=True, encoding='utf-8-sig')
+        for chunk in reader:
+            if not header_checked:
+                header_checked = True
+                header = _normalize_header(chunk.columns)
+                missing = [col for col in REQUIRED_IMPORT_COLUMNS if col not in header]
+                if missing:
+                    raise ValueError(f"CSV is missing required column(s): {', '.join(missing)}")
+                ignored_columns = [col for col in header if col not in REQUIRED_IMPORT_COLUMNS + OPTIONAL_IMPORT_COLUMNS]
+            chunk.columns = _normalize_header(chunk.columns)
+            rows, chunk_errors, keys = validate_chunk(chunk, rows_read + 2, now)  # line 1 is the header
+            rows_read += len(chunk)
+            errors.extend(chunk_errors)
+            keep = []
+            for line, (key, timestamp) in zip(rows.index, keys):
+                earlier = None if allow_duplicates else next(
+                    (seen_line for seen, seen_line in seen_in_file.get(key, ()) if abs(seen - timestamp) <= DUPLICATE_WINDOW),
+                    None
+                )
+                if earlier is not None:
+                    errors.append({'line': int(line), 'product_name': rows.at[line, 'product_name'],
+                                   'message': f'Duplicate of line {earlier} in this file'})
+                else:
+                    keep.append(line)
+                    # Undated rows are purchases made now, like Add Product's; dated ones are told apart by their date
+                    fingerprints.append(key if timestamp == now else f"{key}|{timestamp:%Y-%m-%d %H:%M:%S}")
+                    seen_in_file.setdefault(key, []).append((timestamp, int(line)))
+            accepted.append(rows.loc[keep])
+    except pd.errors.EmptyDataError:
+        raise ValueError('CSV file is empty')
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise ValueError(f'Could not read CSV: {str(e)[:120]}')
+
+    accepted_df = pd.concat(accepted) if accepted else pd.DataFrame(columns=INVENTORY_COLUMNS)
+    return accepted_df, fingerprints, {
+        'rows_read': rows_read,
+        'accepted': len(accepted_df),
+        'rejected': len(errors),
+        'errors': errors,
+        'ignored_columns': ignored_columns,
+    }
+
+
+def release_claims(recent, claims):
+    """Give back the recent-submission claims of an import whose rows were not saved."""
+    for fingerprint, token in claims:
+        recent.release(fingerprint, token)
+
+
+def stage_import(uow, url, stream, recent=None, allow_duplicates=False, dry_run=False):
+    """Validate a CSV stream and stage the accepted rows on the unit of work as one append.
+
+    Each row is claimed in recent (the RecentSubmissions that Add Product checks), so a purchase
+    submitted within its window, by either path, is rejected as a duplicate; the Inventory sheet is
+    only read when its header lacks a column. Returns (result, claims): pass the claims to
+    release_claims() if the staged rows are not saved. A dry run gives its claims back right away.
+    """
+    accepted, fingerprints, result = read_import(stream, allow_duplicates=allow_duplicates)
+    claims = []
+    if recent is not None and not allow_duplicates and not accepted.empty:
+        keep = []
+        for line, fingerprint in zip(accepted.index, fingerprints):
+            token = recent.claim(fingerprint)
+            if token is None:
+                result['errors'].append({'line': int(line), 'product_name': accepted.at[line, 'product_name'],
+                                         'message': 'Duplicate of a purchase added recently'})
+            else:
+                keep.append(line)
+                claims.append((fingerprint, token))
+        accepted = accepted.loc[keep]
+        result['accepted'], result['rejected'] = len(accepted), len(result['errors'])
+    result['errors'].sort(key=lambda error: error['line'])
+    accepted = accepted.reset_index(drop=True)
+    result['dry_run'] = bool(dry_run)
+    if dry_run:
+        release_claims(recent, claims)
+        return result, []
+    if accepted.empty:
+        return result, claims
+    header = uow.read_header(url)
+    if header and all(col in header for col in INVENTORY_COLUMNS):
+        uow.append_to_sheets(accepted.reindex(columns=header), url)
+        return result, claims
+    existing = uow.read_from_sheets(url)
+    if existing is None or len(existing.columns) == 0:
+        uow.write_to_sheets(accepted, url)
+        return result, claims
+    header = [str(col) for col in existing.columns]
+    missing = [col for col in INVENTORY_COLUMNS if col not in header]
+    # The header has to grow first, so this one import rewrites the sheet
+    combined = pd.concat([existing, accepted], ignore_index=True).reindex(columns=header + missing)
+    uow.write_to_sheets(combined, url)
+    return result, claims
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('WARM_UP_ON_START', 'false')
+    os.environ.setdefault('SNAPSHOT_BACKGROUND_REFRESH', 'false')
+    import app as inventory_app
+    from components.log_pipeline import audit, shutdown_logging
+
+    parser = argparse.ArgumentParser(description='Import inventory purchases from a CSV file')
+    parser.add_argument('csv_path')
+    parser.add_argument('--url', default=os.getenv('INVENTORY_SHEET_URL'), help='Inventory sheet URL (default: INVENTORY_SHEET_URL)')
+    parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+    parser.add_argument('--allow-duplicates', action='store_true', help='Skip the duplicate check')
+    args = parser.parse_args()
+    if not args.url:
+        parser.error('No inventory sheet URL (set INVENTORY_SHEET_URL or pass --url)')
+
+    # Same duplicate window as the app's Add Product, shared with running workers through the snapshot cache
+    recent = inventory_app.recent_submissions
+    uow = inventory_app._new_unit_of_work()
+    try:
+        with open(args.csv_path, 'rb') as handle:
+            result, claims = stage_import(uow, args.url, handle, recent=recent,
+                                          allow_duplicates=args.allow_duplicates, dry_run=args.dry_run)
+    except ValueError as e:
+        logger.error(str(e))
+        shutdown_logging()
+        sys.exit(2)
+    for error in result['errors']:
+        print(f"line {error['line']}: {error['product_name'] or '-'}: {error['message']}")
+    try:
+        committed = args.dry_run or not uow.pending or uow.commit()
+    except inventory_app.SheetConflictError:
+        logger.error('The Inventory sheet changed while importing; nothing was written, please run the import again')
+        committed = False
+    if not committed:
+        release_claims(recent, claims)
+        logger.error('Could not save the import to Google Sheets; nothing was written')
+        shutdown_logging()
+        sys.exit(1)
+    if not args.dry_run and result['accepted']:
+        audit('inventory_imported', source=os.path.basename(args.csv_path), accepted=result['accepted'],
+              rejected=result['rejected'])
+    print(f"{result['rows_read']} rows read, {result['accepted']} {'valid' if args.dry_run else 'imported'}, "
+          f"{result['rejected']} rejected")
+    shutdown_logging()
+    sys.exit(1 if result['rejected'] else 0)
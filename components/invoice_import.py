@@ -0,0 +1,177 @@
+"""
+Bulk invoice import (migrating orders from chats or marketplace exports)
+Parses and normalizes a batch of invoices from JSON or CSV; app.import_invoice_batch then creates
+them together: invoice numbers allocated at once, stock checked for the whole batch, lots consumed
+in one pass and each of Invoices, Sold Items, Inventory and Customers written once.
+
+    python components/invoice_import.py orders.csv [--dry-run]
+
+CSV: one row per invoice line with order_ref (lines with the same ref form one invoice),
+customer_name, product_name, quantity, price and optional shipment_fee, invoice_date,
+amount_paid, payment_reference. JSON: {"invoices": [{customer_name, items: [{name, quantity,
+price}], shipment_fee, total_amount, invoice_date, amount_paid, payment_reference}, ...]}.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+INVOICE_CSV_REQUIRED = ['order_ref', 'customer_name', 'product_name', 'quantity', 'price']
+INVOICE_CSV_OPTIONAL = ['shipment_fee', 'invoice_date', 'amount_paid', 'payment_reference']
+MAX_BATCH_INVOICES = 2000
+
+
+def _number(value, default=0.0):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return default
+    try:
+        number = float(str(value).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+    return None if pd.isna(number) else number
+
+
+def invoices_from_csv(stream):
+    """Group CSV line rows into invoice dicts by order_ref (first row of a ref carries the header fields)."""
+    try:
+        df = pd.read_csv(stream, dtype=str, keep_default_na=False, skipinitialspace=True, encoding='utf-8-sig')
+    except pd.errors.EmptyDataError:
+        raise ValueError('CSV file is empty')
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise ValueError(f'Could not read CSV: {str(e)[:120]}')
+    df.columns = [str(col).strip().lower().replace(' ', '_') for col in df.columns]
+    missing = [col for col in INVOICE_CSV_REQUIRED if col not in df.columns]
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(missing)}")
+    for col in INVOICE_CSV_OPTIONAL:
+        if col not in df.columns:
+            df[col] = ''
+    df['_line'] = range(2, len(df) + 2)  # line 1 is the header
+    invoices = []
+    for ref, lines in df.groupby(df['order_ref'].str.strip(), sort=False):
+        first = lines.iloc[0]
+        invoices.append({
+            'ref': ref or f"line {first['_line']}",
+            'customer_name': first['customer_name'],
+            'items': [
+                {'name': name, 'quantity': qty, 'price': price}
+                for name, qty, price in zip(lines['product_name'], lines['quantity'], lines['price'])
+            ],
+            'shipment_fee': first['shipment_fee'],
+            'invoice_date': first['invoice_date'],
+            'amount_paid': first['amount_paid'],
+            'payment_reference': first['payment_reference'],
+        })
+    return invoices
+
+
+def invoices_from_json(payload):
+    invoices = payload.get('invoices') if isinstance(payload, dict) else payload
+    if not isinstance(invoices, list):
+        raise ValueError('Expected {"invoices": [...]}')
+    return [invoice if isinstance(invoice, dict) else {} for invoice in invoices]
+
+
+def normalize_invoice(invoice, position, today=None):
+    """Validate one invoice; returns (normalized dict, None) or (None, error message).
+
+    Line subtotals and a missing total_amount are derived from the items (total = lines + shipment fee);
+    amount_paid is capped at the total like create_invoice does.
+    """
+    customer_name = str(invoice.get('customer_name') or '').strip()
+    if not customer_name:
+        return None, 'customer_name is required'
+    items = []
+    for line_no, item in enumerate(invoice.get('items') or [], start=1):
+        item = item if isinstance(item, dict) else {}
+        name = str(item.get('name') or item.get('product_name') or '').strip()
+        quantity = _number(item.get('quantity'), None)
+        price = _number(item.get('price'), None)
+        if not name:
+            return None, f'item {line_no}: product name is required'
+        if quantity is None or quantity <= 0 or quantity % 1:
+            return None, f'item {line_no} ({name}): quantity must be a whole number of at least 1'
+        if price is None or price < 0:
+            return None, f'item {line_no} ({name}): price must be a number of at least 0'
+        items.append({'name': name, 'quantity': int(quantity), 'price': price, 'subtotal': price * int(quantity)})
+    if not items:
+        return None, 'at least one item is required'
+    shipment_fee = _number(invoice.get('shipment_fee'))
+    amount_paid = _number(invoice.get('amount_paid'))
+    if shipment_fee is None or shipment_fee < 0:
+        return None, 'shipment_fee must be a number of at least 0'
+    if amount_paid is None or amount_paid < 0:
+        return None, 'amount_paid must be a number of at least 0'
+    total_amount = _number(invoice.get('total_amount'), sum(item['subtotal'] for item in items) + shipment_fee)
+    if total_amount is None or total_amount < 0:
+        return None, 'total_amount must be a number of at least 0'
+    invoice_date = str(invoice.get('invoice_date') or '').strip() or (today or datetime.now().strftime('%Y-%m-%d'))
+    if pd.isna(pd.to_datetime(invoice_date, errors='coerce')):
+        return None, f"invoice_date '{invoice_date}' is not a valid date"
+    return {
+        'ref': str(invoice.get('ref') or f'invoice {position}'),
+        'customer_name': customer_name,
+        'items': items,
+        'shipment_fee': shipment_fee,
+        'total_amount': total_amount,
+        'invoice_date': invoice_date,
+        'amount_paid': max(0.0, min(amount_paid, total_amount)),
+        'payment_reference': str(invoice.get('payment_reference') or '').strip(),
+    }, None
+
+
+def normalize_invoices(invoices):
+    """Normalize a batch; returns (valid invoices, [{'invoice', 'ref', 'message'}] for the rejected ones)."""
+    if len(invoices) > MAX_BATCH_INVOICES:
+        raise ValueError(f'A batch can hold at most {MAX_BATCH_INVOICES} invoices')
+    valid, errors = [], []
+    today = datetime.now().strftime('%Y-%m-%d')
+    for position, invoice in enumerate(invoices, start=1):
+        normalized, message = normalize_invoice(invoice, position, today)
+        if message:
+            errors.append({'invoice': position, 'ref': str(invoice.get('ref') or ''), 'message': message})
+        else:
+            valid.append(normalized)
+    return valid, errors
+
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('WARM_UP_ON_START', 'false')
+    os.environ.setdefault('SNAPSHOT_BACKGROUND_REFRESH', 'false')
+    import app as inventory_app
+    from components.log_pipeline import shutdown_logging
+
+    parser = argparse.ArgumentParser(description='Create many invoices at once from a CSV or JSON file')
+    parser.add_argument('path', help='orders.csv or orders.json')
+    parser.add_argument('--dry-run', action='store_true', help='Validate and check stock only, write nothing')
+    args = parser.parse_args()
+
+    exit_code = 0
+    try:
+        if args.path.lower().endswith('.json'):
+            with open(args.path, encoding='utf-8') as handle:
+                invoices = invoices_from_json(json.load(handle))
+        else:
+            with open(args.path, 'rb') as handle:
+                invoices = invoices_from_csv(handle)
+        with inventory_app.app.app_context():
+            result = inventory_app.import_invoice_batch(invoices, dry_run=args.dry_run)
+        for error in result['errors']:
+            print(f"invoice {error['invoice']} ({error['ref'] or '-'}): {error['message']}")
+        for created in result['created']:
+            print(f"{created['ref']}: {created['invoice_number']}")
+        print(f"{len(invoices)} invoices read, {len(result['created'])} {'valid' if args.dry_run else 'created'}, "
+              f"{len(result['errors'])} rejected")
+        exit_code = 1 if result['errors'] else 0
+    except inventory_app.SheetConflictError:
+        print('Sheets changed while importing; nothing was written, please run the import again')
+        exit_code = 1
+    except (ValueError, OSError) as e:
+        print(f'Import failed, nothing was written: {e}')
+        exit_code = 2
+    shutdown_logging()
+    sys.exit(exit_code)
@@ -0,0 +1,220 @@
+"""
+Queue-based application and audit logging
+Request threads only put records on an in-memory queue; a background QueueListener formats them
+and writes the rotating log files, so disk I/O never sits on the request path. Business mutations
+go to a separate audit stream (JSON lines) that debug noise cannot drown out. All gunicorn workers
+append to the same files; rollovers are coordinated through a lock file so none of them is lost.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+AUDIT_LOGGER_NAME = 'inventory.audit'
+TEXT_FORMAT = '%(asctime)s | %(levelname)s | %(message)s'
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and goes into JSON output
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, extra fields and any traceback"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _StreamFilter(logging.Filter):
+    """Routes audit records to the audit handler only, and everything else away from it"""
+
+    def __init__(self, audit):
+        super().__init__()
+        self.audit = audit
+
+    def filter(self, record):
+        return (record.name == AUDIT_LOGGER_NAME) == self.audit
+
+
+@contextmanager
+def _rotation_lock(path):
+    """Exclusive lock shared by every process writing path (no-op where fcntl is unavailable)"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class _SharedRotationMixin:
+    """Rollover that is safe when several worker processes append to the same file.
+
+    Every process appends to the file at baseFilename; the first to reach the rollover point
+    renames it under a lock, and the others, finding a different file there, just reopen it
+    instead of rotating a second time (which would rename away fresh records).
+    """
+
+    def _rotated_elsewhere(self):
+        if self.stream is None:
+            return True
+        try:
+            return os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except OSError:
+            return True
+
+    def _reopen(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = self._open()
+
+    def doRollover(self):
+        with _rotation_lock(self.baseFilename):
+            if self._rotated_elsewhere():
+                self._reopen()
+                self._rolled_elsewhere()
+                return
+            super().doRollover()
+
+    def _rolled_elsewhere(self):
+        pass
+
+
+class _SharedRotatingFileHandler(_SharedRotationMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+
+class _SharedTimedRotatingFileHandler(_SharedRotationMixin, logging.handlers.TimedRotatingFileHandler):
+    def _rolled_elsewhere(self):
+        self.rolloverAt = self.computeRollover(int(time.time()))
+
+
+def _file_handler(path, rotation, max_bytes, backups, when):
+    if rotation == 'time':
+        return _SharedTimedRotatingFileHandler(path, when=when, backupCount=backups, encoding='utf-8')
+    return _SharedRotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller; records are counted and dropped if the queue is full"""
+    dropped = 0
+
+    def prepare(self, record):
+        # Same-process queue: skip the default pre-formatting so formatting and tracebacks are
+        # rendered on the writer thread; only resolve %-args so later mutation cannot change the text
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+def configure_logging(log_dir=None, level=None):
+    """Install the queue handler on the root logger and start the writer thread (safe to call twice).
+
+    Settings come from the environment: LOG_DIR, LOG_LEVEL, LOG_FORMAT (text or json),
+    LOG_ROTATION (size or time), LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ROTATE_WHEN, LOG_QUEUE_SIZE.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_dir = log_dir or os.getenv('LOG_DIR', 'logs')
+    level = level or os.getenv('LOG_LEVEL', 'INFO').upper()
+    rotation = os.getenv('LOG_ROTATION', 'size').lower()
+    max_bytes = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    backups = int(os.getenv('LOG_BACKUP_COUNT', '10'))
+    when = os.getenv('LOG_ROTATE_WHEN', 'midnight')
+    os.makedirs(log_dir, exist_ok=True)
+
+    formatter = JsonFormatter() if os.getenv('LOG_FORMAT', 'text').lower() == 'json' else logging.Formatter(TEXT_FORMAT)
+
+    app_file = _file_handler(os.path.join(log_dir, 'audit_log.txt'), rotation, max_bytes, backups, when)
+    console = logging.StreamHandler()
+    audit_file = _file_handler(os.path.join(log_dir, 'audit_events.jsonl'), rotation, max_bytes, backups, when)
+    for handler in (app_file, console):
+        handler.setFormatter(formatter)
+        handler.addFilter(_StreamFilter(audit=False))
+    audit_file.setFormatter(JsonFormatter())
+    audit_file.addFilter(_StreamFilter(audit=True))
+
+    # Bounded so a stalled disk cannot grow memory without limit; QueueHandler drops records when full
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DroppingQueueHandler(log_queue))
+    root.setLevel(level)
+    audit_logger = logging.getLogger(AUDIT_LOGGER_NAME)
+    audit_logger.setLevel(logging.INFO)
+
+    _listener = logging.handlers.QueueListener(log_queue, app_file, console, audit_file, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread (runs at exit; call before os._exit/fork)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def restart_logging():
+    """Start a fresh writer thread in a forked worker; threads do not survive fork().
+
+    The queue is replaced too: the parent's writer may have held its lock at the moment of the fork.
+    A new listener is built around the same handlers, since a QueueListener cannot be started twice.
+    """
+    global _listener
+    if _listener is None:
+        return
+    if _listener._thread is not None and _listener._thread.is_alive():
+        _listener.stop()  # Not forked after all: flush and end the running writer first
+    fresh = queue.Queue(maxsize=_listener.queue.maxsize)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            handler.queue = fresh
+    _listener = logging.handlers.QueueListener(fresh, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def audit(event, **fields):
+    """Record a business mutation (e.g. audit('invoice_created', invoice_number=...)) on the audit stream."""
+    logging.getLogger(AUDIT_LOGGER_NAME).info(event, extra={'event': event, **fields})
+
+
+def dropped_records():
+    """Log records discarded because the queue was full (exported on /metrics)."""
+    return _DroppingQueueHandler.dropped
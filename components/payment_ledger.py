@@ -0,0 +1,71 @@
+"""
+Invoice payment ledger
+One appended row per payment (or correction) keyed by invoice, instead of a JSON payment history
+copied into every line row of the invoice. Paid amounts come from a per-invoice running sum.
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from components.append_only_sheet import AppendOnlySheet, AppendOnlyIndex
+
+PAYMENT_COLUMNS = ['timestamp', 'invoice_key', 'invoice_number', 'amount', 'reference', 'kind']
+
+
+def invoice_key(invoice_number, created_at):
+    """Invoices are identified by number plus creation time (numbers can repeat across days)."""
+    return f"{str(invoice_number or '').strip()}|{str(created_at or '').strip()}"
+
+
+def payment(invoice_number, created_at, amount, reference='', kind='payment', timestamp=None):
+    return {
+        'timestamp': timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'invoice_key': invoice_key(invoice_number, created_at),
+        'invoice_number': str(invoice_number or '').strip(),
+        'amount': round(float(amount), 2),
+        'reference': str(reference or '').strip(),
+        'kind': kind,
+    }
+
+
+class PaymentLedger(AppendOnlySheet):
+    """Stages payment rows as appends to the payments sheet"""
+
+    def __init__(self, url):
+        super().__init__(url, PAYMENT_COLUMNS)
+
+
+class PaymentIndex(AppendOnlyIndex):
+    """Running paid total, latest reference and payment entries per invoice key"""
+
+    def _reset(self):
+        self.totals = {}
+        self.entries = {}
+        self.last_reference = {}
+
+    def _index_rows(self, df, start):
+        if 'invoice_key' not in df.columns:
+            return
+        new_rows = df.iloc[start:]
+        amounts = new_rows['amount'] if 'amount' in df.columns else [0] * len(new_rows)
+        references = new_rows['reference'] if 'reference' in df.columns else [''] * len(new_rows)
+        timestamps = new_rows['timestamp'] if 'timestamp' in df.columns else [''] * len(new_rows)
+        for key, amount, reference, timestamp in zip(new_rows['invoice_key'].astype(str), amounts, references, timestamps):
+            try:
+                amount = float(amount)
+            except (TypeError, ValueError):
+                continue
+            reference = '' if pd.isna(reference) else str(reference).strip()
+            self.totals[key] = self.totals.get(key, 0.0) + amount
+            self.entries.setdefault(key, []).append({
+                'amount': amount, 'reference': reference, 'timestamp': str(timestamp or '').strip()
+            })
+            if reference:
+                self.last_reference[key] = reference
+
+    def paid(self, key):
+        return self.totals.get(key, 0.0)
+
+    def history(self, key):
+        """Payments of one invoice as {'amount', 'reference', 'timestamp'} dicts, oldest first."""
+        return list(self.entries.get(key, []))
@@ -0,0 +1,108 @@
+"""
+In-memory product name index used by the autocomplete endpoint
+Keeps a sorted list of names for prefix lookups and an n-gram map for substring lookups
+"""
+import bisect
+import hashlib
+import heapq
+
+NGRAM_SIZE = 3
+
+
+def _normalize(name):
+    return ' '.join(str(name or '').lower().split())
+
+
+def _ngrams(text, size):
+    if len(text) < size:
+        return set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def names_signature(names):
+    """Build a stable signature so callers can tell when the catalog changed."""
+    digest = hashlib.sha1()
+    for name in sorted({str(n).strip() for n in names if str(n or '').strip()}):
+        digest.update(name.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class ProductNameIndex:
+    """Ranked prefix/substring search over a set of product names"""
+
+    def __init__(self, names=()):
+        display_by_key = {}
+        for name in names:
+            display = str(name or '').strip()
+            key = _normalize(display)
+            if key and key not in display_by_key:
+                display_by_key[key] = display
+
+        self.signature = names_signature(display_by_key.values())
+        self._keys = sorted(display_by_key)
+        self._display = [display_by_key[k] for k in self._keys]
+        # Gram posting lists hold positions into the sorted key list.
+        # Grams shorter than NGRAM_SIZE are indexed too so 1-2 char queries stay exact.
+        self._grams = {}
+        for pos, key in enumerate(self._keys):
+            grams = set()
+            for size in range(1, NGRAM_SIZE + 1):
+                grams |= _ngrams(key, size)
+            for gram in grams:
+                self._grams.setdefault(gram, []).append(pos)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _prefix_positions(self, query):
+        start = bisect.bisect_left(self._keys, query)
+        end = bisect.bisect_left(self._keys, query + '\uffff')
+        return range(start, end)
+
+    def _substring_positions(self, query):
+        if len(query) <= NGRAM_SIZE:
+            return self._grams.get(query, [])
+        postings = []
+        for gram in _ngrams(query, NGRAM_SIZE):
+            posting = self._grams.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return [pos for pos in candidates if query in self._keys[pos]]
+
+    def _rank(self, pos, query):
+        key = self._keys[pos]
+        if key == query:
+            tier = 0
+        elif key.startswith(query):
+            tier = 1
+        elif (' ' + query) in key:
+            tier = 2
+        else:
+            tier = 3
+        return (tier, key.find(query), len(key), key)
+
+    def suggest(self, query, limit=7):
+        """Return up to `limit` display names ranked exact > prefix > word start > substring."""
+        limit = max(1, int(limit))
+        query = _normalize(query)
+        if not query:
+            return self._display[:limit]
+
+        prefix_positions = self._prefix_positions(query)
+        if len(prefix_positions) >= limit:
+            # Prefix hits always outrank other matches, so the substring pass can be skipped.
+            positions = prefix_positions
+        else:
+            positions = set(prefix_positions)
+            positions.update(self._substring_positions(query))
+
+        best = heapq.nsmallest(limit, positions, key=lambda pos: self._rank(pos, query))
+        return [self._display[pos] for pos in best]
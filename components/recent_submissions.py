@@ -0,0 +1,89 @@
+"""
+Rolling window of recent submissions for duplicate detection
+A double-submitted form shows up as the same normalized fingerprint twice within a short window.
+Claims are O(1) lookups in a hash map whose expired entries are evicted oldest first, shared by
+all workers through a components.shared_sqlite database when there is one (in-process otherwise).
+"""
+import hashlib
+import threading
+import time
+from collections import deque
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recent_submissions (
+    fingerprint TEXT PRIMARY KEY,
+    submitted_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recent_submissions_by_time ON recent_submissions (submitted_at);
+"""
+
+
+def _text(value):
+    return ' '.join(str(value or '').split()).casefold()
+
+
+def _amount(value):
+    try:
+        return f"{float(value):.2f}"
+    except (TypeError, ValueError):
+        return _text(value)
+
+
+def purchase_fingerprint(product_name, total_price, shipping_admin_fee, quantity, supplier):
+    """Stable key of a purchase: names compared case- and whitespace-insensitively, amounts to the cent."""
+    parts = [_text(product_name), _amount(total_price), _amount(shipping_admin_fee), _amount(quantity), _text(supplier)]
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+class RecentSubmissions:
+    """Fingerprints seen in the last window_seconds; claim() is an atomic check-and-record"""
+
+    def __init__(self, window_seconds=120.0, store=None):
+        self.window_seconds = float(window_seconds)
+        self.store = store  # SharedDatabase
+        if store is not None:
+            store.create(_SCHEMA)
+        self._seen = {}         # fingerprint -> claim time
+        self._order = deque()   # (claim time, fingerprint), oldest first
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        cutoff = now - self.window_seconds
+        while self._order and self._order[0][0] < cutoff:
+            claimed_at, fingerprint = self._order.popleft()
+            if self._seen.get(fingerprint) == claimed_at:
+                del self._seen[fingerprint]
+
+    def _claim_shared(self, fingerprint, now):
+        with self.store.transaction() as conn:
+            conn.execute('DELETE FROM recent_submissions WHERE submitted_at < ?', (now - self.window_seconds,))
+            if conn.execute('SELECT 1 FROM recent_submissions WHERE fingerprint = ?', (fingerprint,)).fetchone():
+                return None
+            conn.execute('INSERT INTO recent_submissions (fingerprint, submitted_at) VALUES (?, ?)', (fingerprint, now))
+            return now
+
+    def claim(self, fingerprint, now=None):
+        """Returns a claim token, or None when the fingerprint was already submitted within the window."""
+        now = time.time() if now is None else now
+        if self.store is not None:
+            return self._claim_shared(fingerprint, now)
+        with self._lock:
+            self._evict(now)
+            if fingerprint in self._seen:
+                return None
+            self._seen[fingerprint] = now
+            self._order.append((now, fingerprint))
+            return now
+
+    def release(self, fingerprint, token):
+        """Undo a claim (the write it guarded failed)."""
+        if token is None:
+            return
+        if self.store is not None:
+            self.store.connection().execute(
+                'DELETE FROM recent_submissions WHERE fingerprint = ? AND submitted_at = ?', (fingerprint, token)
+            )
+            return
+        with self._lock:
+            if self._seen.get(fingerprint) == token:
+                del self._seen[fingerprint]
@@ -0,0 +1,155 @@
+"""
+Opt-in sampling profiler for slow requests
+Samples the stack of the thread serving a chosen request and writes it in the collapsed-stack
+format read by flamegraph.pl, speedscope and inferno. Nothing is hooked into Flask unless enabled.
+"""
+import hmac
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Records the call stack of one thread every `interval` seconds from a helper thread"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+
+def collapsed_stacks(stacks):
+    """Folded stacks ('root;child;leaf count' per line), the flamegraph input format."""
+    return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+
+def top_functions(stacks, limit=10):
+    """[(function, self samples, total samples)] sorted by samples spent in the function itself."""
+    own = Counter()
+    total = Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for label in set(stack):
+            total[label] += count
+    return [(label, samples, total[label]) for label, samples in own.most_common(limit)]
+
+
+class RequestProfiler:
+    """Profiles requests to the configured endpoints, or any request carrying ?profile=<admin token>"""
+
+    def __init__(self, endpoints=None, admin_token=None, directory='profiles', keep=50, interval=0.005):
+        self.endpoints = {e.strip() for e in (endpoints or []) if e.strip()}
+        self.admin_token = admin_token or None
+        self.directory = directory
+        self.keep = max(1, int(keep))
+        self.interval = float(interval)
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            endpoints=os.getenv('PROFILE_ENDPOINTS', '').split(','),
+            admin_token=os.getenv('PROFILER_ADMIN_TOKEN'),
+            directory=os.getenv('PROFILE_DIR', 'profiles'),
+            keep=int(os.getenv('PROFILE_KEEP', '50')),
+            interval=float(os.getenv('PROFILE_INTERVAL_MS', '5')) / 1000.0
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.endpoints or self.admin_token)
+
+    def init_app(self, app):
+        """Register the Flask hooks; does nothing (no per-request cost) when profiling is off."""
+        if not self.enabled:
+            return False
+        from flask import g, request
+
+        @app.before_request
+        def _start_profiling():
+            if self.should_profile(request.endpoint, request.args.get('profile')):
+                g.profile_started = time.perf_counter()
+                g.profile_sampler = StackSampler(threading.get_ident(), self.interval).start()
+
+        @app.teardown_request
+        def _finish_profiling(exc=None):
+            sampler = g.pop('profile_sampler', None)
+            if sampler is not None:
+                elapsed = time.perf_counter() - g.pop('profile_started')
+                self.save(request.endpoint or 'unknown', sampler.stop(), elapsed)
+
+        logger.info(f"Request profiler enabled (endpoints: {', '.join(sorted(self.endpoints)) or 'none'}, "
+                    f"admin flag: {'on' if self.admin_token else 'off'})")
+        return True
+
+    def should_profile(self, endpoint, flag=None):
+        if endpoint in self.endpoints or '*' in self.endpoints:
+            return True
+        return bool(self.admin_token and flag and hmac.compare_digest(flag, self.admin_token))
+
+    def save(self, endpoint, stacks, elapsed):
+        """Write the folded stacks to the profiles directory, prune old dumps and log the hot spots."""
+        samples = sum(stacks.values())
+        if not samples:
+            logger.info(f"Profile of {endpoint}: {elapsed * 1000:.0f} ms, too short to sample")
+            return None
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint)
+        filename = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{name}-{elapsed * 1000:.0f}ms.folded"
+        path = os.path.join(self.directory, filename)
+        try:
+            with self._write_lock:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(path, 'w') as handle:
+                    handle.write(collapsed_stacks(stacks))
+                self._rotate()
+        except OSError as e:
+            logger.warning(f"Could not write profile {path}: {str(e)}")
+            path = None
+
+        top = '; '.join(
+            f"{label} {own * 100 // samples}% self/{total * 100 // samples}% total"
+            for label, own, total in top_functions(stacks, limit=10)
+        )
+        logger.info(f"Profile of {endpoint}: {elapsed * 1000:.0f} ms, {samples} samples, saved to {path}. Top: {top}")
+        return path
+
+    def _rotate(self):
+        dumps = sorted(f for f in os.listdir(self.directory) if f.endswith('.folded'))
+        for old in dumps[:-self.keep]:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
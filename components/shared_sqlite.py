@@ -0,0 +1,71 @@
+"""
+Local SQLite file shared by the worker processes on one host
+Components that keep cross-worker state (sheet snapshots, duplicate-submission claims, Idempotency-Keys)
+each create their own tables in it. The file must sit in a directory only this user can write, so
+another local account cannot plant data the app would load.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+def default_cache_path():
+    """Per-user cache file under the temp directory, e.g. /tmp/inventory-app-1000/snapshots.sqlite"""
+    owner = os.getuid() if hasattr(os, 'getuid') else os.getenv('USERNAME', 'user')
+    return os.path.join(tempfile.gettempdir(), f"inventory-app-{owner}", 'snapshots.sqlite')
+
+
+def _check_private(path):
+    """Refuse a file or directory that another user owns or could write to (POSIX only)."""
+    if not hasattr(os, 'getuid'):
+        return
+    info = os.stat(path)
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by another user")
+    if info.st_mode & 0o022:
+        raise PermissionError(f"{path} is writable by other users")
+
+
+class SharedDatabase:
+    """A private SQLite file in WAL mode with one connection per thread and per process"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_private(directory)
+        if os.path.exists(path):
+            _check_private(path)
+        self.connection()
+        if hasattr(os, 'chmod'):
+            os.chmod(path, 0o600)
+
+    def connection(self):
+        # Connections must not cross a fork, nor be shared between threads.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, schema):
+        """Create a component's tables (CREATE ... IF NOT EXISTS statements)."""
+        self.connection().executescript(schema)
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT, rolled back on error; yields the connection."""
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
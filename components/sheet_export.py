@@ -0,0 +1,207 @@
+"""
+Streaming CSV / XLSX export of sheet snapshots
+Rows are encoded a chunk at a time by generators, so a response starts with the header right away
+and the encoded file is never built in memory; the snapshot DataFrame itself is held in full.
+"""
+import csv
+import io
+import math
+import numbers
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+EXPORT_CHUNK_ROWS = 500
+
+# Text starting with one of these is run as a formula by spreadsheet apps opening a CSV export
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Characters XML 1.0 does not allow (sheet cells occasionally contain pasted control characters)
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def filter_rows(df, date_column=None, start=None, end=None, columns=None):
+    """Rows of df whose date_column falls in [start, end] (whole days when no time is given), limited to columns.
+
+    Raises ValueError for unknown columns or unparseable dates.
+    """
+    if df is None:
+        df = pd.DataFrame()
+    if columns:
+        unknown = [col for col in columns if col not in df.columns]
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+    if (start or end) and not df.empty:
+        if not date_column or date_column not in df.columns:
+            raise ValueError('This tab has no date column to filter on')
+        dates = pd.to_datetime(df[date_column], errors='coerce', format='mixed')
+        mask = dates.notna()
+        if start:
+            mask &= dates >= _parse_bound(start)
+        if end:
+            bound = _parse_bound(end)
+            if bound == bound.normalize() and len(str(end).strip()) <= 10:
+                mask &= dates < bound + pd.Timedelta(days=1)
+            else:
+                mask &= dates <= bound
+        df = df[mask]
+    if columns:
+        df = df[list(columns)]
+    return df
+
+
+def _parse_bound(value):
+    bound = pd.to_datetime(str(value).strip(), errors='coerce')
+    if pd.isna(bound):
+        raise ValueError(f"Invalid date '{value}' (use YYYY-MM-DD)")
+    return bound
+
+
+def csv_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the CSV export of df as text chunks: header first, then chunk_rows rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([_safe_text(str(col)) for col in df.columns])
+    yield buffer.getvalue()
+    for start in range(0, len(df), chunk_rows):
+        buffer.seek(0)
+        buffer.truncate()
+        for row in df.iloc[start:start + chunk_rows].itertuples(index=False, name=None):
+            writer.writerow(['' if _is_blank(value) else _safe_text(value) for value in row])
+        yield buffer.getvalue()
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _safe_text(value):
+    """Text that would start a formula gets a leading apostrophe; numbers and other values pass through."""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable file object that collects what zipfile writes until it is drained"""
+
+    def __init__(self):
+        self._parts = []
+        self._offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="xl/workbook.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+    '<Relationship Id="rId2" Target="styles.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+
+def _workbook(sheet_name):
+    name = escape(_XML_ILLEGAL.sub('', sheet_name)[:31] or 'Sheet1', {'"': '&quot;'})
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    )
+
+
+def _xlsx_cell(value):
+    if _is_blank(value):
+        return '<c/>'
+    if isinstance(value, numbers.Real) and not isinstance(value, (bool, np.bool_)) and math.isfinite(value):
+        number = int(value) if isinstance(value, numbers.Integral) else float(value)
+        return f'<c t="n"><v>{number!r}</v></c>'
+    # Inline strings are never evaluated as formulas, so the text is kept as is
+    text = escape(_XML_ILLEGAL.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def xlsx_chunks(df, sheet_name='Sheet1', chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield an .xlsx workbook (one sheet, inline strings) of df as byte chunks.
+
+    The zip is written to an unseekable sink, so each part is streamed with a data descriptor
+    and the worksheet is compressed and sent chunk_rows rows at a time.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _workbook(sheet_name))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        archive.writestr('xl/styles.xml', _STYLES)
+        yield sink.drain()
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((_SHEET_START + _xlsx_row([str(col) for col in df.columns])).encode('utf-8'))
+            for start in range(0, len(df), chunk_rows):
+                rows = df.iloc[start:start + chunk_rows].itertuples(index=False, name=None)
+                sheet.write(''.join(_xlsx_row(row) for row in rows).encode('utf-8'))
+                data = sink.drain()
+                if data:
+                    yield data
+            sheet.write(_SHEET_END.encode('utf-8'))
+    yield sink.drain()
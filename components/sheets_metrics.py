@@ -0,0 +1,192 @@
+"""
+Google Sheets API instrumentation
+Counts, times and sizes every Sheets call by operation, route and sheet, and renders the
+numbers in the Prometheus text format for /metrics. Each worker process keeps its own counters.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qs
+
+# Upper bounds (seconds) of the latency histogram buckets; Sheets calls range from ~100ms to tens of seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_route = contextvars.ContextVar('sheets_metrics_route', default='background')
+_request_totals = contextvars.ContextVar('sheets_metrics_request_totals', default=None)
+_active_call = threading.local()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}'
+
+
+class RequestTotals:
+    """Sheets usage of one HTTP request, reported back in its response headers"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls = 0
+        self.seconds = 0.0
+        self.bytes = 0
+
+
+class SheetsMetrics:
+    """In-process registry of Sheets API counters and latency histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sheet_names = {}
+        self._calls = {}      # (operation, route, sheet, outcome) -> count
+        self._latency = {}    # (operation, route, sheet) -> [bucket counts..., sum, count]
+        self._bytes = {}      # (operation, route, sheet, direction) -> bytes
+        self._retries = {}    # (route, reason) -> count
+
+    def register_sheet(self, url, name):
+        """Label a sheet URL with a readable name (e.g. INVENTORY) instead of its gid."""
+        if url:
+            self._sheet_names[url] = name
+
+    def sheet_label(self, url):
+        if not url:
+            return 'none'
+        if url in self._sheet_names:
+            return self._sheet_names[url]
+        parsed = urlparse(url)
+        gid = (parse_qs(parsed.fragment).get('gid') or parse_qs(parsed.query).get('gid') or ['0'])[0]
+        return f"gid:{gid}"
+
+    # Request context --------------------------------------------------------------
+
+    def start_request(self, route):
+        """Attribute the Sheets calls made by the current thread/context to route."""
+        _route.set(route or 'unknown')
+        totals = RequestTotals()
+        _request_totals.set(totals)
+        return totals
+
+    def finish_request(self):
+        totals = _request_totals.get()
+        _route.set('background')
+        _request_totals.set(None)
+        return totals
+
+    # Recording --------------------------------------------------------------------
+
+    @contextmanager
+    def track(self, operation, url=None, sheet=None):
+        """Time one Sheets API call; exceptions are counted as errors and re-raised."""
+        key = (operation, _route.get(), sheet or self.sheet_label(url))
+        previous = getattr(_active_call, 'key', None)
+        _active_call.key = key
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            yield
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            _active_call.key = previous
+            self._observe(key, outcome, elapsed)
+
+    def _observe(self, key, outcome, elapsed):
+        with self._lock:
+            self._calls[key + (outcome,)] = self._calls.get(key + (outcome,), 0) + 1
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+            index = bisect.bisect_left(LATENCY_BUCKETS, elapsed)
+            if index < len(LATENCY_BUCKETS):
+                histogram[index] += 1
+            histogram[-2] += elapsed
+            histogram[-1] += 1
+        totals = _request_totals.get()
+        if totals is not None:
+            totals.calls += 1
+            totals.seconds += elapsed
+
+    def add_bytes(self, direction, size):
+        """Attribute payload bytes to the call currently being tracked on this thread."""
+        key = getattr(_active_call, 'key', None) or ('other', _route.get(), 'none')
+        with self._lock:
+            self._bytes[key + (direction,)] = self._bytes.get(key + (direction,), 0) + size
+        totals = _request_totals.get()
+        if totals is not None:
+            totals.bytes += size
+
+    def count_retry(self, reason):
+        key = (_route.get(), reason)
+        with self._lock:
+            self._retries[key] = self._retries.get(key, 0) + 1
+
+    def instrument_session(self, session):
+        """Measure request/response bodies (and 429s) of a requests.Session used by gspread."""
+        def on_response(response, *args, **kwargs):
+            body = response.request.body if response.request is not None else None
+            if body:
+                self.add_bytes('sent', len(body))
+            self.add_bytes('received', len(response.content or b''))
+            if response.status_code == 429:
+                self.count_retry('rate_limited')
+        session.hooks.setdefault('response', []).append(on_response)
+
+    # Exposition -------------------------------------------------------------------
+
+    def render(self):
+        """Prometheus text exposition of every metric recorded so far."""
+        with self._lock:
+            calls = dict(self._calls)
+            latency = {key: list(values) for key, values in self._latency.items()}
+            payload = dict(self._bytes)
+            retries = dict(self._retries)
+
+        lines = [
+            '# HELP sheets_api_calls_total Google Sheets API calls by operation, route, sheet and outcome.',
+            '# TYPE sheets_api_calls_total counter',
+        ]
+        for key, value in sorted(calls.items()):
+            lines.append(f"sheets_api_calls_total{_labels(('operation', 'route', 'sheet', 'outcome'), key)} {value}")
+
+        lines += [
+            '# HELP sheets_api_call_duration_seconds Latency of Google Sheets API calls.',
+            '# TYPE sheets_api_call_duration_seconds histogram',
+        ]
+        names = ('operation', 'route', 'sheet')
+        for key, values in sorted(latency.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, values):
+                cumulative += count
+                bucket = _labels(names, key, 'le="%s"' % bound)
+                lines.append(f"sheets_api_call_duration_seconds_bucket{bucket} {cumulative}")
+            bucket = _labels(names, key, 'le="+Inf"')
+            lines.append(f"sheets_api_call_duration_seconds_bucket{bucket} {values[-1]}")
+            lines.append(f"sheets_api_call_duration_seconds_sum{_labels(names, key)} {values[-2]:.6f}")
+            lines.append(f"sheets_api_call_duration_seconds_count{_labels(names, key)} {values[-1]}")
+
+        lines += [
+            '# HELP sheets_api_payload_bytes_total Request and response body bytes of Google Sheets API calls.',
+            '# TYPE sheets_api_payload_bytes_total counter',
+        ]
+        for key, value in sorted(payload.items()):
+            lines.append(f"sheets_api_payload_bytes_total{_labels(('operation', 'route', 'sheet', 'direction'), key)} {value}")
+
+        lines += [
+            '# HELP sheets_api_retries_total Retried Google Sheets work by route and reason.',
+            '# TYPE sheets_api_retries_total counter',
+        ]
+        for key, value in sorted(retries.items()):
+            lines.append(f"sheets_api_retries_total{_labels(('route', 'reason'), key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+SHEETS_METRICS = SheetsMetrics()
@@ -0,0 +1,111 @@
+"""
+Background refresher for the shared sheet snapshots
+Keeps every configured sheet fresh on its own interval and serves reads stale-while-revalidate,
+so page requests return the latest snapshot immediately instead of waiting on Google Sheets.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotRefresher:
+    """Refreshes SnapshotStore entries from a daemon thread, one interval per sheet URL"""
+
+    def __init__(self, store, loader, intervals):
+        self.store = store
+        self.loader = loader  # loader(url) -> (df, version)
+        self.intervals = {url: float(seconds) for url, seconds in intervals.items() if url and seconds > 0}
+        self.stats = {'refreshes': 0, 'skipped': 0, 'errors': 0, 'revalidations': 0}
+        self._due = {}
+        self._requested = set()
+        self._wakeup = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._stopped = False
+
+    def ensure_started(self):
+        """Start the thread once per process (threads do not survive a gunicorn fork)."""
+        if not self.intervals or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._wakeup:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopped = False
+            self._due = {url: 0.0 for url in self.intervals}
+            self._requested = set()
+            self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+            self._thread.start()
+        logger.info(f"Snapshot refresher started for {len(self.intervals)} sheets")
+
+    def stop(self):
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify_all()
+
+    def revalidate(self, urls):
+        """Ask the thread to refresh these sheets as soon as possible (returns immediately)."""
+        urls = [u for u in urls if u in self.intervals]
+        if not urls:
+            return
+        self.ensure_started()
+        with self._wakeup:
+            self._requested.update(urls)
+            self.stats['revalidations'] += len(urls)
+            self._wakeup.notify_all()
+
+    def read(self, url):
+        """Serve the latest snapshot now; revalidate in the background if it is past its interval."""
+        df, age = self.store.latest(url)
+        if df is None:
+            # Nothing cached yet (cold start or just invalidated by a write): this read has to wait.
+            return self.store.get(url, lambda: self.loader(url))
+        if url in self.intervals and age >= self.intervals[url]:
+            self.revalidate([url])
+        return df
+
+    def ages(self):
+        """Seconds since each configured sheet's snapshot was fetched (None if not cached)."""
+        return {url: self.store.age(url) for url in self.intervals}
+
+    def _next_url(self):
+        # Called with self._wakeup held; returns the next URL to refresh, waiting until one is due.
+        while not self._stopped:
+            if self._requested:
+                return self._requested.pop()
+            now = time.time()
+            url, due = min(self._due.items(), key=lambda item: item[1])
+            if due <= now:
+                return url
+            self._wakeup.wait(timeout=due - now)
+        return None
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                url = self._next_url()
+            if url is None:
+                return
+            self._refresh(url)
+
+    def _refresh(self, url):
+        interval = self.intervals[url]
+        next_due = time.time() + interval
+        try:
+            age = self.store.age(url)
+            if age is not None and age < interval * 0.5:
+                # Another worker on this host refreshed it recently; follow its schedule instead.
+                self.stats['skipped'] += 1
+                next_due = time.time() + interval - age
+            elif self.store.refresh(url, lambda: self.loader(url)) is not None:
+                self.stats['refreshes'] += 1
+            else:
+                self.stats['skipped'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning(f"Background refresh of {url} failed: {str(e)}")
+        with self._wakeup:
+            self._due[url] = next_due
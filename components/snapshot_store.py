@@ -0,0 +1,209 @@
+"""
+Shared sheet snapshot cache for multi-worker deployments
+Snapshots live in a local SQLite file so every worker process on the host reuses one download per sheet.
+A per-sheet lease lock makes sure only one worker refreshes a sheet at a time. Tables are stored as
+plain JSON (column names and row values), never pickled, in the private file of components.shared_sqlite.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from components.shared_sqlite import SharedDatabase
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    url TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    version INTEGER,
+    fetched_at REAL NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS invalidations (
+    url TEXT PRIMARY KEY,
+    invalidated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refresh_locks (
+    url TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def _encode(df):
+    """DataFrame -> JSON bytes of its columns and row values (cell types as gspread returned them)"""
+    rows = df.astype(object).where(df.notna(), None).values.tolist()
+    return json.dumps({'columns': [str(col) for col in df.columns], 'rows': rows}, default=str).encode('utf-8')
+
+
+def _decode_payload(payload):
+    data = json.loads(bytes(payload).decode('utf-8'))
+    return pd.DataFrame(data['rows'], columns=data['columns'])
+
+
+class SnapshotStore:
+    """Cross-process cache of sheet DataFrames keyed by sheet URL and snapshot generation"""
+
+    def __init__(self, path, ttl_seconds=30.0, lock_timeout=30.0):
+        self.path = path
+        self.ttl_seconds = float(ttl_seconds)
+        self.lock_timeout = float(lock_timeout)
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'stale_served': 0, 'waits': 0}
+        self._decoded = {}  # url -> (generation, DataFrame) decoded once per process
+        self._decoded_lock = threading.Lock()
+        self.db = SharedDatabase(path)
+        self.db.create(_SCHEMA)
+
+    def _connection(self):
+        return self.db.connection()
+
+    def _count(self, name):
+        self.stats[name] += 1
+
+    def _row(self, url):
+        return self._connection().execute(
+            'SELECT generation, version, fetched_at FROM snapshots WHERE url = ?', (url,)
+        ).fetchone()
+
+    def _decode(self, url, generation):
+        with self._decoded_lock:
+            cached = self._decoded.get(url)
+            if cached and cached[0] == generation:
+                return cached[1].copy()
+        row = self._connection().execute(
+            'SELECT generation, payload FROM snapshots WHERE url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            df = _decode_payload(row[1])
+        except (ValueError, KeyError, TypeError, UnicodeDecodeError):
+            # e.g. a snapshot written by an older version in another format: treat it as missing
+            return None
+        with self._decoded_lock:
+            self._decoded[url] = (row[0], df)
+        return df.copy()
+
+    def _acquire(self, url):
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute('SELECT owner, expires_at FROM refresh_locks WHERE url = ?', (url,)).fetchone()
+            if row is not None and row[0] != self.owner and row[1] > now:
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO refresh_locks (url, owner, expires_at) VALUES (?, ?, ?)',
+                (url, self.owner, now + self.lock_timeout)
+            )
+            return True
+
+    def _release(self, url):
+        self._connection().execute('DELETE FROM refresh_locks WHERE url = ? AND owner = ?', (url, self.owner))
+
+    def _store(self, url, df, version, started_at):
+        payload = sqlite3.Binary(_encode(df))
+        with self.db.transaction() as conn:
+            invalidated = conn.execute('SELECT invalidated_at FROM invalidations WHERE url = ?', (url,)).fetchone()
+            if invalidated is not None and invalidated[0] >= started_at:
+                # A write landed while we were downloading; this data may predate it.
+                return None
+            # Time-based generations never repeat, even after a snapshot was invalidated.
+            generation = time.time_ns()
+            conn.execute(
+                'INSERT OR REPLACE INTO snapshots (url, generation, version, fetched_at, payload) VALUES (?, ?, ?, ?, ?)',
+                (url, generation, version, time.time(), payload)
+            )
+        with self._decoded_lock:
+            self._decoded[url] = (generation, df.copy())
+        return generation
+
+    def age(self, url):
+        """Seconds since the snapshot for url was fetched (None if there is none)."""
+        row = self._row(url)
+        return None if row is None else max(0.0, time.time() - row[2])
+
+    def latest(self, url):
+        """Return (DataFrame, age in seconds) of the current snapshot, however old, or (None, None)."""
+        row = self._row(url)
+        if row is None:
+            return None, None
+        df = self._decode(url, row[0])
+        if df is None:
+            return None, None
+        self._count('hits')
+        return df, max(0.0, time.time() - row[2])
+
+    def refresh(self, url, loader):
+        """Reload url with loader() -> (df, version) if no other worker is already doing it.
+
+        Returns the fresh DataFrame, or None when another worker holds the refresh lock.
+        """
+        if not self._acquire(url):
+            return None
+        try:
+            started_at = time.time()
+            df, version = loader()
+            self._count('refreshes')
+            if version is None:
+                # Failed reads come back as an empty frame without a version; never cache those.
+                return df
+            self._store(url, df, version, started_at)
+            return df.copy()
+        finally:
+            self._release(url)
+
+    def get(self, url, loader):
+        """Return the snapshot for url, refreshing it through loader() when older than the TTL."""
+        row = self._row(url)
+        if row is not None and (time.time() - row[2]) < self.ttl_seconds:
+            df = self._decode(url, row[0])
+            if df is not None:
+                self._count('hits')
+                return df
+
+        self._count('misses')
+        df = self.refresh(url, loader)
+        if df is not None:
+            return df
+
+        # Another worker is refreshing this sheet: serve what we have, or wait for its result.
+        if row is not None:
+            stale = self._decode(url, row[0])
+            if stale is not None:
+                self._count('stale_served')
+                return stale
+        self._count('waits')
+        deadline = time.time() + self.lock_timeout
+        while time.time() < deadline:
+            time.sleep(0.1)
+            row = self._row(url)
+            if row is not None:
+                df = self._decode(url, row[0])
+                if df is not None:
+                    return df
+        logger.warning(f"Timed out waiting for snapshot refresh of {url}; reading directly")
+        return loader()[0]
+
+    def invalidate(self, urls):
+        """Drop snapshots after a write so the next read sees the new data."""
+        urls = [u for u in urls if u]
+        if not urls:
+            return
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.executemany('DELETE FROM snapshots WHERE url = ?', [(u,) for u in urls])
+            conn.executemany(
+                'INSERT OR REPLACE INTO invalidations (url, invalidated_at) VALUES (?, ?)',
+                [(u, now) for u in urls]
+            )
+        with self._decoded_lock:
+            for url in urls:
+                self._decoded.pop(url, None)
@@ -0,0 +1,64 @@
+"""
+Append-only stock movement log
+One row per stock change of an inventory lot (sold, used, freebie, raffled, invoice consumption,
+restore), appended to its own sheet instead of rewriting a growing JSON cell on the lot row.
+"""
+from datetime import datetime
+
+from components.append_only_sheet import AppendOnlySheet, AppendOnlyIndex
+
+MOVEMENT_COLUMNS = [
+    'timestamp', 'lot_key', 'product_name', 'action', 'quantity', 'remaining_after', 'reference', 'remarks'
+]
+
+
+def lot_key(product_name, date_added):
+    """Identify an inventory lot by product name and purchase timestamp (stable across re-sorting)."""
+    return f"{str(product_name or '').strip()}|{str(date_added or '').strip()}"
+
+
+def inventory_lot_key(inventory_df, idx):
+    row = inventory_df.loc[idx]
+    return lot_key(row.get('product_name', ''), row.get('date_added', ''))
+
+
+def movement(lot, product_name, action, quantity, remaining_after, reference='', remarks='', timestamp=None):
+    return {
+        'timestamp': timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'lot_key': lot,
+        'product_name': str(product_name or '').strip(),
+        'action': action,
+        'quantity': quantity,
+        'remaining_after': remaining_after,
+        'reference': reference,
+        'remarks': remarks,
+    }
+
+
+class StockMovementLog(AppendOnlySheet):
+    """Stages movement rows as appends to the movements sheet"""
+
+    def __init__(self, url):
+        super().__init__(url, MOVEMENT_COLUMNS)
+
+
+class StockMovementIndex(AppendOnlyIndex):
+    """Positions of movement rows by lot and by product"""
+
+    def _reset(self):
+        self.by_lot = {}
+        self.by_product = {}
+
+    def _index_rows(self, df, start):
+        new_rows = df.iloc[start:]
+        lots = new_rows['lot_key'].astype(str) if 'lot_key' in df.columns else [''] * len(new_rows)
+        products = new_rows['product_name'].astype(str).str.strip() if 'product_name' in df.columns else [''] * len(new_rows)
+        for pos, lot, product in zip(range(start, len(df)), lots, products):
+            self.by_lot.setdefault(lot, []).append(pos)
+            self.by_product.setdefault(product, []).append(pos)
+
+    def for_lot(self, key):
+        return self._rows(self.by_lot.get(key, []))
+
+    def for_product(self, product_name):
+        return self._rows(self.by_product.get(str(product_name or '').strip(), []))
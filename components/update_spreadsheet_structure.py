@@ -11,16 +11,12 @@ import os
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from data_sources import DataConnector
+from components.log_pipeline import configure_logging, audit
+from components.stock_movements import MOVEMENT_COLUMNS
+from components.payment_ledger import PAYMENT_COLUMNS
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)s | %(message)s',
-    handlers=[
-        logging.FileHandler('logs/audit_log.txt', mode='a'),
-        logging.StreamHandler()
-    ]
-)
+# Setup logging (same queued, rotating pipeline as the app)
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -75,7 +71,9 @@ def update_spreadsheet_structure(spreadsheet_url):
         ],
         'Used Freebie': [
             'product_name', 'quantity', 'total_cost_per_unit', 'status', 'remarks', 'date_used'
-        ]
+        ],
+        'Stock Movements': MOVEMENT_COLUMNS,
+        'Payments': PAYMENT_COLUMNS
     }
     
     # Update each worksheet
@@ -154,6 +152,7 @@ def update_spreadsheet_structure(spreadsheet_url):
             logger.warning(f"  Tab '{tab_name}' not in structure definition, skipping")
     
     logger.info(f"SUMMARY: Updated {len(updated_tabs)} tabs: {', '.join(updated_tabs)}")
+    audit('spreadsheet_structure_updated', spreadsheet_url=spreadsheet_url, tabs=updated_tabs)
     logger.info("COMPLETED: Update Spreadsheet Structure")
     logger.info("="*50)
     
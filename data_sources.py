@@ -1,23 +1,194 @@
-import gspread
-from google.oauth2.service_account import Credentials
 import pandas as pd
 import os
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
 from urllib.parse import urlparse, parse_qs
 import logging
+from components.sheets_metrics import SHEETS_METRICS
 
 logger = logging.getLogger(__name__)
 
+# Developer metadata key holding each worksheet's version stamp (bumped on every batch write)
+SHEET_VERSION_KEY = 'inventory_app_version'
+
+# Column holding each row's stable identifier, given to a row the first time it is written
+ROW_ID_COLUMN = 'row_id'
+_LAYOUT_CHECK_MAX_ROWS = 50  # larger keyed updates re-read the whole id column instead of single cells
+
+_commit_thread_lock = threading.Lock()
+
+
+class SheetConflictError(Exception):
+    """Raised when a sheet changed between the time it was read and the time it is written"""
+
+    def __init__(self, urls):
+        self.urls = list(urls)
+        super().__init__(f"Sheet changed since it was read: {', '.join(self.urls)}")
+
+
+class RowNotFoundError(LookupError):
+    """Raised when a keyed update names a row_id the sheet does not have (nothing is written)"""
+
+    def __init__(self, url, row_ids):
+        self.url = url
+        self.row_ids = list(row_ids)
+        super().__init__(f"Row(s) not found: {', '.join(self.row_ids)}")
+
+
+def new_row_id():
+    # The letter keeps ids text: reads numericise cells, and hex such as '12e4...' would parse as a float
+    return 'r' + uuid.uuid4().hex[:15]
+
+
+def missing_row_ids(df):
+    """Mask of rows without a usable row_id (blank, or a copy of an earlier row's id)."""
+    ids = df[ROW_ID_COLUMN].astype(str).str.strip()
+    return df[ROW_ID_COLUMN].isna() | ids.isin(['', 'None', 'nan']) | ids.duplicated()
+
+
+def fill_row_ids(df):
+    """Give every row of df a row_id in place (the column is added last when missing); returns df."""
+    if df is None or len(df.columns) == 0:
+        return df
+    if ROW_ID_COLUMN not in df.columns:
+        df[ROW_ID_COLUMN] = [new_row_id() for _ in range(len(df))]
+        return df
+    missing = missing_row_ids(df)
+    if missing.any():
+        df[ROW_ID_COLUMN] = df[ROW_ID_COLUMN].astype(object)
+        df.loc[missing, ROW_ID_COLUMN] = [new_row_id() for _ in range(int(missing.sum()))]
+    return df
+
+
+def _trimmed(header):
+    """Header without trailing blank cells (the Sheets API omits them)"""
+    header = list(header)
+    while header and not str(header[-1]).strip():
+        header.pop()
+    return header
+
+
+def _keyed_updates(updates):
+    """Normalize {row_id: {column: value}}; the row_id column itself cannot be updated."""
+    updates = {str(row_id).strip(): dict(values) for row_id, values in (updates or {}).items() if values}
+    if any(ROW_ID_COLUMN in values for values in updates.values()):
+        raise ValueError("row_id cannot be changed by a keyed update")
+    return updates
+
+
+def apply_row_updates(df, updates, url=None):
+    """Set {row_id: {column: value}} on df in place, adding unknown columns; raises RowNotFoundError."""
+    if ROW_ID_COLUMN not in df.columns:
+        raise RowNotFoundError(url, updates.keys())
+    positions = pd.Series(range(len(df)), index=df[ROW_ID_COLUMN].astype(str).str.strip()).groupby(level=0).first()
+    missing = [row_id for row_id in updates if row_id not in positions.index]
+    if missing:
+        raise RowNotFoundError(url, missing)
+    for row_id, values in updates.items():
+        for column, value in values.items():
+            if column not in df.columns:
+                df[column] = None
+            elif df[column].dtype != object:
+                df[column] = df[column].astype(object)
+            df.iat[int(positions[row_id]), df.columns.get_loc(column)] = value
+    return df
+
+
+@contextmanager
+def _commit_lock():
+    """Serialize version check + write across threads and, through a lock file, across local workers"""
+    with _commit_thread_lock:
+        try:
+            import fcntl
+        except ImportError:  # Non-POSIX platforms only get the in-process lock
+            yield
+            return
+        lock_path = os.getenv('SHEETS_COMMIT_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'inventory_sheets_commit.lock'))
+        with open(lock_path, 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+# Google API hosts gspread talks to; rewritten when the connector points at a local fake server
+_GOOGLE_API_PREFIXES = ('https://sheets.googleapis.com', 'https://www.googleapis.com')
+
+
+def _redirecting_session(base_url):
+    """requests.Session that sends gspread's Google API calls to base_url instead (no auth)"""
+    import requests
+
+    base_url = base_url.rstrip('/')
+
+    class RedirectingSession(requests.Session):
+        def request(self, method, url, *args, **kwargs):
+            for prefix in _GOOGLE_API_PREFIXES:
+                if url.startswith(prefix):
+                    url = base_url + url[len(prefix):]
+                    break
+            return super().request(method, url, *args, **kwargs)
+
+    return RedirectingSession()
+
+
 class DataConnector:
-    """Handles Google Sheets read/write operations"""
+    """Handles Google Sheets read/write operations
+
+    The Google client is created on first use, so constructing a connector is free and
+    works without network access; call warm_up() to authenticate ahead of the first request.
+
+    config['sheets_api_base_url'] (or SHEETS_API_BASE_URL) sends every Sheets/Drive call to
+    that address instead of Google, e.g. benchmarks/fake_sheets_server.py for load tests.
+    """
     
     def __init__(self, config={}):
         self.config = config
-        self.client = None
-        self._initialize_client()
+        self._client = None
+        self._client_ready = False
+        self._client_lock = threading.Lock()
+        self._row_layouts = {}  # url -> (version, header, {row_id: grid row index}) for keyed updates
+        self._row_layouts_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if not self._client_ready:
+            with self._client_lock:
+                if not self._client_ready:
+                    self._initialize_client()
+                    self._client_ready = True  # Missing credentials are reported once, not per call
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+        self._client_ready = True
+
+    def reset_client(self):
+        """Drop the current client so the next use authenticates again (e.g. after a fork)"""
+        with self._client_lock:
+            self._client = None
+            self._client_ready = False
+
+    def warm_up(self):
+        """Authenticate now instead of on the first Sheets call; returns True if a client is available"""
+        return self.client is not None
     
     def _initialize_client(self):
         """Initialize Google Sheets client"""
+        # Imported here: gspread and google-auth are slow to import and only needed once we talk to Google
+        import gspread
+        from google.oauth2.service_account import Credentials
         try:
+            api_base_url = self.config.get('sheets_api_base_url') or os.getenv('SHEETS_API_BASE_URL')
+            if api_base_url:
+                self.client = gspread.Client(None, session=_redirecting_session(api_base_url))
+                SHEETS_METRICS.instrument_session(self._client.session)
+                logger.warning(f"Google Sheets calls are redirected to {api_base_url}")
+                return
             # Check for service account credentials
             creds_path = os.getenv('GOOGLE_CREDENTIALS_PATH')
             if creds_path and os.path.exists(creds_path):
@@ -37,6 +208,8 @@ class DataConnector:
                     self.client = gspread.authorize(creds)
                 else:
                     logger.warning("No Google credentials found. Google Sheets features will not work.")
+            if self._client is not None:
+                SHEETS_METRICS.instrument_session(self._client.session)
         except Exception as e:
             logger.error(f"Error initializing Google Sheets client: {str(e)}")
             self.client = None
@@ -67,41 +240,157 @@ class DataConnector:
             logger.error(f"Error extracting sheet info from URL: {str(e)}")
             return None, None
     
+    @staticmethod
+    def _sheet_version_entries(sheet_metadata):
+        """Return (version, metadata ids) stored on a worksheet's developer metadata"""
+        version = 0
+        metadata_ids = []
+        for entry in sheet_metadata.get('developerMetadata', []) or []:
+            if entry.get('metadataKey') != SHEET_VERSION_KEY:
+                continue
+            metadata_ids.append(entry.get('metadataId'))
+            try:
+                version = max(version, int(entry.get('metadataValue', 0)))
+            except (TypeError, ValueError):
+                continue
+        return version, metadata_ids
+
+    def _fetch_sheet_versions(self, spreadsheet):
+        """Fetch {sheetId: (version, metadata ids)} and {sheetId: properties} for every worksheet in one small call"""
+        metadata = spreadsheet.fetch_sheet_metadata(params={
+            'fields': 'sheets(properties(sheetId,title,gridProperties(rowCount,columnCount)),'
+                      'developerMetadata(metadataId,metadataKey,metadataValue))'
+        })
+        versions, properties = {}, {}
+        for sheet in metadata.get('sheets', []):
+            versions[sheet['properties']['sheetId']] = self._sheet_version_entries(sheet)
+            properties[sheet['properties']['sheetId']] = sheet['properties']
+        return versions, properties
+
+    def _remember_row_layout(self, url, version, df):
+        """Cache where each row_id sits in a sheet as of version (grid row index = position + 1)."""
+        if version is None:
+            return
+        header = [str(col) for col in df.columns]
+        rows = {}
+        if ROW_ID_COLUMN in df.columns:
+            for position, row_id in enumerate(df[ROW_ID_COLUMN]):
+                row_id = str(row_id).strip() if pd.notna(row_id) else ''
+                if row_id:
+                    rows.setdefault(row_id, position + 1)
+        with self._row_layouts_lock:
+            self._row_layouts[url] = (version, header, rows)
+
+    def _row_layout(self, spreadsheet, url, properties, version, row_ids):
+        """(header, {row_id: grid row index}) of a sheet for a keyed update of row_ids.
+
+        The version stamp only moves on this app's writes; sorting or inserting rows by hand does not.
+        A cached layout is therefore checked against the live header and the id cells of the target
+        rows (one small batchGet) and rebuilt from the live header and id column when they differ.
+        """
+        from gspread.utils import rowcol_to_a1
+        title = "'" + properties['title'].replace("'", "''") + "'"
+
+        def column_letters(header):
+            return rowcol_to_a1(1, header.index(ROW_ID_COLUMN) + 1).rstrip('1')
+
+        with self._row_layouts_lock:
+            cached = self._row_layouts.get(url)
+        header = None
+        with SHEETS_METRICS.track('read', url):
+            targets = [(row_id, cached[2].get(row_id)) for row_id in row_ids] if cached is not None else []
+            if (cached is not None and cached[0] == version and ROW_ID_COLUMN in cached[1]
+                    and len(targets) <= _LAYOUT_CHECK_MAX_ROWS and all(row for _, row in targets)):
+                column = column_letters(cached[1])
+                ranges = [f"{title}!1:1"] + [f"{title}!{column}{row + 1}" for _, row in targets]
+                live = [block.get('values', []) for block in spreadsheet.values_batch_get(ranges).get('valueRanges', [])]
+                header = [str(col) for col in (live[0][0] if live and live[0] else [])]
+                cells = [str(block[0][0]).strip() if block and block[0] else '' for block in live[1:]]
+                if _trimmed(header) == _trimmed(cached[1]) and cells == [row_id for row_id, _ in targets]:
+                    return cached[1], cached[2]
+                logger.info(f"Row layout of {SHEETS_METRICS.sheet_label(url)} changed outside the app; re-reading its id column")
+            if header is None:
+                header_rows = spreadsheet.values_get(f"{title}!1:1").get('values', [])
+                header = [str(col) for col in (header_rows[0] if header_rows else [])]
+            rows = {}
+            if ROW_ID_COLUMN in header:
+                column = column_letters(header)
+                for offset, cells in enumerate(spreadsheet.values_get(f"{title}!{column}2:{column}").get('values', [])):
+                    row_id = str(cells[0]).strip() if cells else ''
+                    if row_id:
+                        rows.setdefault(row_id, offset + 1)
+        with self._row_layouts_lock:
+            self._row_layouts[url] = (version, header, rows)
+        return header, rows
+
+    def _after_commit(self, changes, versions_before):
+        """Carry cached row layouts over to the new versions when a batch did not move any rows."""
+        with self._row_layouts_lock:
+            for url in {change['url'] for change in changes}:
+                kinds = {change['kind'] for change in changes if change['url'] == url}
+                cached = self._row_layouts.get(url)
+                if cached is None or cached[0] != versions_before.get(url):
+                    continue
+                columns = {column for change in changes if change['url'] == url and change['kind'] == 'cells'
+                           for values in change['updates'].values() for column in values}
+                if kinds & {'replace', 'append', 'row_ids'} or not columns <= set(cached[1]):
+                    self._row_layouts.pop(url, None)
+                else:
+                    self._row_layouts[url] = (cached[0] + 1,) + cached[1:]
+
     def read_from_sheets(self, url):
         """Read data from Google Sheets"""
+        df, _ = self.read_versioned_from_sheets(url)
+        return df
+
+    def read_versioned_from_sheets(self, url):
+        """Read data from Google Sheets along with the sheet version stamp (None if unknown)"""
         if not self.client:
             logger.warning("Google Sheets client not initialized. Check GOOGLE_CREDENTIALS_PATH or GOOGLE_CREDENTIALS_JSON environment variable.")
-            return pd.DataFrame()
+            return pd.DataFrame(), None
         
         if not url:
             logger.warning("No URL provided for Google Sheets")
-            return pd.DataFrame()
+            return pd.DataFrame(), None
         
         try:
             spreadsheet_id, gid = self._extract_sheet_info(url)
             if not spreadsheet_id:
                 logger.error(f"Could not extract spreadsheet ID from URL: {url}")
-                return pd.DataFrame()
+                return pd.DataFrame(), None
             
-            spreadsheet = self.client.open_by_key(spreadsheet_id)
-            worksheet = spreadsheet.get_worksheet_by_id(int(gid))
+            with SHEETS_METRICS.track('open', url):
+                spreadsheet = self.client.open_by_key(spreadsheet_id)
+                # Same metadata call get_worksheet_by_id makes, but keep it to pick up the version stamp.
+                sheet_metadata = None
+                for sheet in spreadsheet.fetch_sheet_metadata().get('sheets', []):
+                    if sheet['properties']['sheetId'] == int(gid):
+                        sheet_metadata = sheet
+                        break
+            import gspread
+            if sheet_metadata is None:
+                raise gspread.exceptions.WorksheetNotFound(f"id {gid} not found")
+            version, _ = self._sheet_version_entries(sheet_metadata)
+            worksheet = gspread.Worksheet(spreadsheet, sheet_metadata['properties'])
             
             # Get all values
-            data = worksheet.get_all_records()
+            with SHEETS_METRICS.track('read', url):
+                data = worksheet.get_all_records()
             
             if not data:
                 # Return empty DataFrame
                 logger.info("No data found in sheet (empty sheet)")
-                return pd.DataFrame()
+                return pd.DataFrame(), version
             
             df = pd.DataFrame(data)
             # Replace empty strings with None for consistency
             df = df.replace('', None)
+            self._remember_row_layout(url, version, df)
             logger.info(f"Read {len(df)} rows from Google Sheets")
-            return df
+            return df, version
         except Exception as e:
             logger.error(f"Error reading from Google Sheets (URL: {url}): {str(e)}", exc_info=True)
-            return pd.DataFrame()  # Return empty DataFrame instead of raising
+            return pd.DataFrame(), None  # Return empty DataFrame instead of raising
     
     def write_to_sheets(self, df, url):
         """Write DataFrame to Google Sheets"""
@@ -119,8 +408,9 @@ class DataConnector:
                 logger.error(f"Could not extract spreadsheet ID from URL: {url}")
                 return False
             
-            spreadsheet = self.client.open_by_key(spreadsheet_id)
-            worksheet = spreadsheet.get_worksheet_by_id(int(gid))
+            with SHEETS_METRICS.track('open', url):
+                spreadsheet = self.client.open_by_key(spreadsheet_id)
+                worksheet = spreadsheet.get_worksheet_by_id(int(gid))
             
             if df is None or len(df.columns) == 0:
                 logger.error("Refusing to write DataFrame with no columns to avoid wiping sheet")
@@ -136,13 +426,15 @@ class DataConnector:
             # Safer write path:
             # - no pre-clear (avoids blank sheet if write fails)
             # - single update call
-            worksheet.update('A1', values)
+            with SHEETS_METRICS.track('write', url):
+                worksheet.update('A1', values)
 
             # Resize after successful write to trim old trailing rows/columns.
             target_rows = max(1, len(values))
             target_cols = max(1, len(headers))
             if worksheet.row_count != target_rows or worksheet.col_count != target_cols:
-                worksheet.resize(rows=target_rows, cols=target_cols)
+                with SHEETS_METRICS.track('resize', url):
+                    worksheet.resize(rows=target_rows, cols=target_cols)
             
             logger.info(f"Wrote {len(df)} rows to Google Sheets")
             return True
@@ -150,3 +442,595 @@ class DataConnector:
             logger.error(f"Error writing to Google Sheets (URL: {url}): {str(e)}", exc_info=True)
             return False  # Return False instead of raising
 
+    def read_header(self, url):
+        """Column names in a sheet's first row, read without downloading the rows (None on error)"""
+        if not self.client:
+            logger.warning("Google Sheets client not initialized. Check GOOGLE_CREDENTIALS_PATH or GOOGLE_CREDENTIALS_JSON environment variable.")
+            return None
+        if not url:
+            return None
+        try:
+            worksheet = self._open_worksheet(url)
+            if worksheet is None:
+                return None
+            with SHEETS_METRICS.track('read', url):
+                return _trimmed(str(col) for col in worksheet.row_values(1))
+        except Exception as e:
+            logger.error(f"Error reading header from Google Sheets (URL: {url}): {str(e)}", exc_info=True)
+            return None
+
+    def read_rows(self, url, row_ids):
+        """Read only the rows addressed by row_id, along with the sheet version stamp.
+
+        Rows are located through the same cached row_id layout as update_rows and fetched in one
+        batchGet, so the sheet is never downloaded. Unknown ids are left out of the DataFrame.
+        """
+        if not self.client:
+            logger.warning("Google Sheets client not initialized. Check GOOGLE_CREDENTIALS_PATH or GOOGLE_CREDENTIALS_JSON environment variable.")
+            return pd.DataFrame(), None
+        if not url:
+            logger.warning("No URL provided for Google Sheets")
+            return pd.DataFrame(), None
+        row_ids = [str(row_id).strip() for row_id in row_ids]
+        try:
+            spreadsheet_id, gid = self._extract_sheet_info(url)
+            if not spreadsheet_id:
+                logger.error(f"Could not extract spreadsheet ID from URL: {url}")
+                return pd.DataFrame(), None
+            with SHEETS_METRICS.track('open', url):
+                spreadsheet = self.client.open_by_key(spreadsheet_id)
+                versions, properties = self._fetch_sheet_versions(spreadsheet)
+            import gspread
+            from gspread.utils import numericise_all
+            if int(gid) not in properties:
+                raise gspread.exceptions.WorksheetNotFound(f"id {gid} not found")
+            version, _ = versions[int(gid)]
+            header, layout = self._row_layout(spreadsheet, url, properties[int(gid)], version, row_ids)
+            header = _trimmed(header)
+            targets = [layout[row_id] for row_id in dict.fromkeys(row_ids) if row_id in layout]
+            records = []
+            if targets:
+                title = "'" + properties[int(gid)]['title'].replace("'", "''") + "'"
+                with SHEETS_METRICS.track('read', url):
+                    blocks = spreadsheet.values_batch_get([f"{title}!{row + 1}:{row + 1}" for row in targets])
+                for block in blocks.get('valueRanges', []):
+                    cells = (block.get('values') or [[]])[0][:len(header)]
+                    records.append(numericise_all(cells + [''] * (len(header) - len(cells))))
+            df = pd.DataFrame(records, columns=header).replace('', None)
+            if ROW_ID_COLUMN in df.columns:
+                # A row moved by hand between the layout check and the fetch is left out, not misread
+                df = df[df[ROW_ID_COLUMN].astype(str).str.strip().isin(row_ids)].reset_index(drop=True)
+            return df, version
+        except Exception as e:
+            logger.error(f"Error reading rows from Google Sheets (URL: {url}): {str(e)}", exc_info=True)
+            return pd.DataFrame(), None
+
+    def _open_worksheet(self, url):
+        """Resolve a sheet URL to its worksheet (None if the URL cannot be parsed)"""
+        spreadsheet_id, gid = self._extract_sheet_info(url)
+        if not spreadsheet_id:
+            logger.error(f"Could not extract spreadsheet ID from URL: {url}")
+            return None
+        with SHEETS_METRICS.track('open', url):
+            spreadsheet = self.client.open_by_key(spreadsheet_id)
+            return spreadsheet.get_worksheet_by_id(int(gid))
+
+    @staticmethod
+    def _row_values(row):
+        return [str(val) if pd.notna(val) else '' for val in row]
+
+    def write_rows_to_sheets(self, df, url, positions):
+        """Write only the given DataFrame rows (0-based positions) back to their sheet rows.
+
+        The DataFrame must have been read from the same sheet with its columns unchanged,
+        so position i maps to sheet row i + 2 (row 1 is the header).
+        """
+        if not self.client:
+            logger.warning("Google Sheets client not initialized. Check GOOGLE_CREDENTIALS_PATH or GOOGLE_CREDENTIALS_JSON environment variable.")
+            return False
+
+        if not url:
+            logger.warning("No URL provided for Google Sheets")
+            return False
+
+        positions = sorted(set(int(p) for p in positions))
+        if not positions:
+            return True
+
+        try:
+            worksheet = self._open_worksheet(url)
+            if worksheet is None:
+                return False
+
+            from gspread.utils import rowcol_to_a1
+            last_col = max(1, len(df.columns))
+            data = []
+            for pos in positions:
+                sheet_row = pos + 2
+                data.append({
+                    'range': f"{rowcol_to_a1(sheet_row, 1)}:{rowcol_to_a1(sheet_row, last_col)}",
+                    'values': [self._row_values(df.iloc[pos].values)]
+                })
+            with SHEETS_METRICS.track('write', url):
+                worksheet.batch_update(data)
+
+            logger.info(f"Updated {len(positions)} rows in Google Sheets")
+            return True
+        except Exception as e:
+            logger.error(f"Error updating rows in Google Sheets (URL: {url}): {str(e)}", exc_info=True)
+            return False
+
+    def append_to_sheets(self, df, url):
+        """Append DataFrame rows below the existing data, aligned to the sheet header"""
+        if not self.client:
+            logger.warning("Google Sheets client not initialized. Check GOOGLE_CREDENTIALS_PATH or GOOGLE_CREDENTIALS_JSON environment variable.")
+            return False
+
+        if not url:
+            logger.warning("No URL provided for Google Sheets")
+            return False
+
+        if df is None or df.empty:
+            return True
+
+        try:
+            worksheet = self._open_worksheet(url)
+            if worksheet is None:
+                return False
+
+            with SHEETS_METRICS.track('read', url):
+                header = [h for h in worksheet.row_values(1) if str(h).strip()]
+            new_columns = [str(col) for col in df.columns if str(col) not in header]
+            if not header or new_columns:
+                # Extend the header first so appended values line up with their columns.
+                header = header + new_columns
+                if worksheet.col_count < len(header):
+                    with SHEETS_METRICS.track('resize', url):
+                        worksheet.resize(cols=len(header))
+                with SHEETS_METRICS.track('write', url):
+                    worksheet.update('A1', [header])
+
+            frame = df.copy()
+            frame.columns = [str(col) for col in frame.columns]
+            frame = frame.reindex(columns=header)
+            rows = [self._row_values(values) for values in frame.itertuples(index=False, name=None)]
+            with SHEETS_METRICS.track('append', url):
+                worksheet.append_rows(rows, table_range='A1')
+
+            logger.info(f"Appended {len(rows)} rows to Google Sheets")
+            return True
+        except Exception as e:
+            logger.error(f"Error appending to Google Sheets (URL: {url}): {str(e)}", exc_info=True)
+            return False
+
+    def update_rows(self, url, updates):
+        """Set only the given cells of rows addressed by row_id ({row_id: {column: value}}) in one batch.
+
+        Sheet row numbers come from a row_id index cached per sheet version (kept from the last
+        read, else the header and id column are fetched) and checked against the live id cells of
+        the target rows first, so the sheet is never downloaded or rewritten. Columns the sheet
+        lacks are added to its header. Raises RowNotFoundError for unknown ids, in which case
+        nothing is written.
+        """
+        updates = _keyed_updates(updates)
+        if not updates:
+            return True
+        return self.batch_write_to_sheets([{'kind': 'cells', 'url': url, 'updates': updates}])
+
+    def ensure_row_ids(self, url):
+        """Give every row of a sheet a row_id (adding the column when needed); returns how many rows got one.
+
+        Only the id column is written, checked against the version the sheet was read at.
+        """
+        df, version = self.read_versioned_from_sheets(url)
+        if version is None or len(df.columns) == 0:
+            return 0
+        missing = len(df) if ROW_ID_COLUMN not in df.columns else int(missing_row_ids(df).sum())
+        if ROW_ID_COLUMN in df.columns and not missing:
+            return 0
+        fill_row_ids(df)
+        if not self.batch_write_to_sheets([{'kind': 'row_ids', 'url': url, 'df': df}], expected_versions={url: version}):
+            return 0
+        logger.info(f"Assigned row ids to {missing} rows")
+        return missing
+
+    @classmethod
+    def _grid_rows(cls, rows):
+        """Convert row value lists to Sheets API RowData (RAW string values)"""
+        grid = []
+        for values in rows:
+            cells = []
+            for value in values:
+                cells.append({'userEnteredValue': {'stringValue': value}} if value != '' else {})
+            grid.append({'values': cells})
+        return grid
+
+    @classmethod
+    def _cell_request(cls, sheet_id, row_index, column_index, values):
+        return {'updateCells': {
+            'rows': cls._grid_rows([[value] for value in values]),
+            'fields': 'userEnteredValue',
+            'start': {'sheetId': sheet_id, 'rowIndex': row_index, 'columnIndex': column_index}
+        }}
+
+    @staticmethod
+    def _grow_columns(sheet_id, properties, width):
+        if width <= properties.get('gridProperties', {}).get('columnCount', 0):
+            return []
+        return [{'updateSheetProperties': {
+            'properties': {'sheetId': sheet_id, 'gridProperties': {'columnCount': width}},
+            'fields': 'gridProperties.columnCount'
+        }}]
+
+    def _cells_requests(self, sheet_id, change, header, rows, properties):
+        """updateCells requests for {row_id: {column: value}}, extending the header with new columns."""
+        missing = [row_id for row_id in change['updates'] if str(row_id) not in rows]
+        if missing:
+            raise RowNotFoundError(change['url'], missing)
+        header = list(header)
+        requests = []
+        for row_id, values in change['updates'].items():
+            for column, value in values.items():
+                column = str(column)
+                if column == ROW_ID_COLUMN:
+                    raise ValueError("row_id cannot be changed by a keyed update")
+                if column not in header:
+                    header.append(column)
+                    requests.append(self._cell_request(sheet_id, 0, len(header) - 1, [column]))
+                requests.append(self._cell_request(
+                    sheet_id, rows[str(row_id)], header.index(column), self._row_values([value])
+                ))
+        return self._grow_columns(sheet_id, properties, len(header)) + requests
+
+    def _batch_requests(self, sheet_id, change, properties=None, layout=None):
+        kind, df = change['kind'], change.get('df')
+        if kind == 'check':
+            return []  # Only the version check above
+        if kind == 'cells':
+            return self._cells_requests(sheet_id, change, layout[0], layout[1], properties)
+        if kind == 'row_ids':
+            # The whole id column (header included) in one request; rows that had an id keep it
+            column = df.columns.get_loc(ROW_ID_COLUMN)
+            return self._grow_columns(sheet_id, properties, column + 1) + [
+                self._cell_request(sheet_id, 0, column, self._row_values([ROW_ID_COLUMN] + list(df[ROW_ID_COLUMN])))
+            ]
+        if kind == 'replace':
+            headers = [str(col) for col in list(df.columns)]
+            rows = [headers] + [self._row_values(values) for values in df.itertuples(index=False, name=None)]
+            return [
+                {'updateSheetProperties': {
+                    'properties': {'sheetId': sheet_id, 'gridProperties': {
+                        'rowCount': max(1, len(rows)), 'columnCount': max(1, len(headers))}},
+                    'fields': 'gridProperties(rowCount,columnCount)'
+                }},
+                {'updateCells': {
+                    'rows': self._grid_rows(rows),
+                    'fields': 'userEnteredValue',
+                    'start': {'sheetId': sheet_id, 'rowIndex': 0, 'columnIndex': 0}
+                }}
+            ]
+        if kind == 'rows':
+            requests = []
+            for pos in sorted(set(int(p) for p in change['positions'])):
+                requests.append({'updateCells': {
+                    'rows': self._grid_rows([self._row_values(df.iloc[pos].values)]),
+                    'fields': 'userEnteredValue',
+                    'start': {'sheetId': sheet_id, 'rowIndex': pos + 1, 'columnIndex': 0}
+                }})
+            return requests
+        if kind == 'append':
+            rows = [self._row_values(values) for values in df.itertuples(index=False, name=None)]
+            if not rows:
+                return []
+            return [{'appendCells': {
+                'sheetId': sheet_id,
+                'rows': self._grid_rows(rows),
+                'fields': 'userEnteredValue'
+            }}]
+        raise ValueError(f"Unknown change kind: {kind}")
+
+    @staticmethod
+    def _version_bump_requests(sheet_id, version, metadata_ids):
+        new_value = str(version + 1)
+        if metadata_ids:
+            return [{'updateDeveloperMetadata': {
+                'dataFilters': [{'developerMetadataLookup': {'metadataId': metadata_id}}],
+                'developerMetadata': {'metadataValue': new_value},
+                'fields': 'metadataValue'
+            }} for metadata_id in metadata_ids]
+        return [{'createDeveloperMetadata': {'developerMetadata': {
+            'metadataKey': SHEET_VERSION_KEY,
+            'metadataValue': new_value,
+            'location': {'sheetId': sheet_id},
+            'visibility': 'DOCUMENT'
+        }}}]
+
+    def batch_write_to_sheets(self, changes, expected_versions=None):
+        """Apply staged table changes with one batch update per spreadsheet.
+
+        Each spreadsheet batch update is atomic: either every change in it lands or none do.
+        Sheets listed in expected_versions ({url: version}) are checked first and a
+        SheetConflictError is raised if any of them was written since it was read; a 'check'
+        change puts a sheet in that check without writing it. Every written sheet gets its
+        version stamp bumped inside the same batch.
+        """
+        if not self.client:
+            logger.warning("Google Sheets client not initialized. Check GOOGLE_CREDENTIALS_PATH or GOOGLE_CREDENTIALS_JSON environment variable.")
+            return False
+
+        if not changes:
+            return True
+
+        expected_versions = expected_versions or {}
+        try:
+            batches = {}
+            for change in changes:
+                spreadsheet_id, gid = self._extract_sheet_info(change['url'])
+                if not spreadsheet_id:
+                    logger.error(f"Could not extract spreadsheet ID from URL: {change['url']}")
+                    return False
+                batch = batches.setdefault(spreadsheet_id, {'changes': [], 'sheets': {}, 'written': set()})
+                batch['changes'].append((int(gid), change))
+                batch['sheets'][int(gid)] = change['url']
+                if change['kind'] != 'check':
+                    batch['written'].add(int(gid))
+
+            if len(batches) > 1:
+                logger.warning("Batch spans multiple spreadsheets; each spreadsheet is committed separately")
+
+            with _commit_lock():
+                # Check every spreadsheet before writing any of them.
+                for spreadsheet_id, batch in batches.items():
+                    batch['label'] = ','.join(sorted({SHEETS_METRICS.sheet_label(u) for u in batch['sheets'].values()}))
+                    with SHEETS_METRICS.track('open', sheet=batch['label']):
+                        batch['spreadsheet'] = self.client.open_by_key(spreadsheet_id)
+                        batch['versions'], batch['properties'] = self._fetch_sheet_versions(batch['spreadsheet'])
+                    conflicts = []
+                    for sheet_id, url in batch['sheets'].items():
+                        expected = expected_versions.get(url)
+                        current, _ = batch['versions'].get(sheet_id, (0, []))
+                        if expected is not None and current != expected:
+                            conflicts.append(url)
+                    if conflicts:
+                        raise SheetConflictError(conflicts)
+                    # Keyed updates are located at the versions just checked, so they land on the right rows
+                    batch['requests'] = []
+                    for sheet_id, change in batch['changes']:
+                        properties = batch['properties'].get(sheet_id, {})
+                        layout = None
+                        if change['kind'] == 'cells':
+                            version, _ = batch['versions'].get(sheet_id, (0, []))
+                            layout = self._row_layout(
+                                batch['spreadsheet'], change['url'], properties, version, [str(r) for r in change['updates']]
+                            )
+                        batch['requests'].extend(self._batch_requests(sheet_id, change, properties, layout))
+
+                versions_before = {}
+                for batch in batches.values():
+                    requests = list(batch['requests'])
+                    for sheet_id in batch['written']:
+                        version, metadata_ids = batch['versions'].get(sheet_id, (0, []))
+                        requests.extend(self._version_bump_requests(sheet_id, version, metadata_ids))
+                        versions_before[batch['sheets'][sheet_id]] = version
+                    if not requests:
+                        continue
+                    with SHEETS_METRICS.track('batch', sheet=batch['label']):
+                        batch['spreadsheet'].batch_update({'requests': requests})
+                    self._after_commit([change for _, change in batch['changes'] if change['kind'] != 'check'], versions_before)
+
+            logger.info(f"Committed {len(changes)} staged table changes to Google Sheets")
+            return True
+        except (SheetConflictError, RowNotFoundError):
+            raise
+        except Exception as e:
+            logger.error(f"Error committing batch to Google Sheets: {str(e)}", exc_info=True)
+            return False
+
+
+class TableContext:
+    """Identity map of the tables read during one request.
+
+    Every read of a URL returns the same DataFrame object, so nested helpers never download
+    a sheet twice and see each other's in-memory changes. Tables with staged writes are
+    tracked as dirty and dropped once those writes are committed or discarded.
+    """
+
+    def __init__(self, connector):
+        self.connector = connector
+        self._tables = {}  # url -> (DataFrame, version)
+        self._headers = {}  # url -> header row, for tables only appended to
+        self._appended = {}  # url -> rows staged for appending before the table was read
+        self.dirty = set()
+        self.downloads = 0
+
+    def read_versioned_from_sheets(self, url):
+        if url not in self._tables:
+            df, version = self.connector.read_versioned_from_sheets(url)
+            self.downloads += 1
+            for rows_df in self._appended.pop(url, []):
+                df = rows_df if df is None or df.empty else pd.concat([df, rows_df], ignore_index=True)
+            self._tables[url] = (df, version)
+        return self._tables[url]
+
+    def read_from_sheets(self, url):
+        return self.read_versioned_from_sheets(url)[0]
+
+    def read_rows(self, url, row_ids):
+        """(rows addressed by row_id, version): sliced from the table when it was read, else fetched alone."""
+        if url in self._tables:
+            df, version = self._tables[url]
+            if ROW_ID_COLUMN not in df.columns:
+                return df.iloc[0:0].copy(), version
+            wanted = {str(row_id).strip() for row_id in row_ids}
+            return df[df[ROW_ID_COLUMN].astype(str).str.strip().isin(wanted)].reset_index(drop=True), version
+        return self.connector.read_rows(url, row_ids)
+
+    def read_header(self, url):
+        """Column names of url: from the table when it was read, else only its first row is fetched."""
+        if url in self._tables:
+            return [str(col) for col in self._tables[url][0].columns]
+        if url not in self._headers:
+            self._headers[url] = self.connector.read_header(url)
+        return self._headers[url]
+
+    def stage(self, url, df):
+        """Record that df is now the in-memory state of url (it has pending writes)."""
+        _, version = self._tables.get(url, (None, None))
+        self._tables[url] = (df, version)
+        self.dirty.add(url)
+
+    def stage_append(self, url, rows_df):
+        self.dirty.add(url)
+        if url in self._tables:
+            df, version = self._tables[url]
+            combined = rows_df if df is None or df.empty else pd.concat([df, rows_df], ignore_index=True)
+            self._tables[url] = (combined, version)
+        else:
+            self._appended.setdefault(url, []).append(rows_df.copy())
+
+    def stage_cells(self, url, updates):
+        self.dirty.add(url)
+        if url in self._tables:
+            df, _ = self._tables[url]
+            try:
+                apply_row_updates(df, updates, url)
+            except RowNotFoundError:
+                pass  # Reported by the commit, which locates rows on the sheet itself
+
+    def evict(self, urls):
+        """Forget these tables so the next read downloads them again."""
+        for url in urls:
+            self._tables.pop(url, None)
+            self._headers.pop(url, None)
+            self._appended.pop(url, None)
+            self.dirty.discard(url)
+
+
+class UnitOfWork:
+    """Collects the table writes of one request and commits them in a single batch update.
+
+    Mirrors the DataConnector write methods, so helpers can stage writes without knowing
+    whether they are talking to the connector or a unit of work. Nothing reaches Google
+    Sheets until commit() is called. Rows written to the sheets in row_id_urls are given a
+    row_id when they have none.
+    """
+
+    def __init__(self, connector, tables=None, row_id_urls=()):
+        self.connector = connector
+        # Reads go through a request's TableContext when one is given, so they are shared with it
+        self.tables = tables if tables is not None else TableContext(connector)
+        self.row_id_urls = {url for url in row_id_urls if url}
+        self._changes = []
+        self._read_versions = {}
+
+    def read_from_sheets(self, url):
+        """Read through the table context, remembering the version stamp the data was read at."""
+        df, version = self.tables.read_versioned_from_sheets(url)
+        if url not in self._read_versions:
+            self._read_versions[url] = version
+        return df
+
+    def read_rows(self, url, row_ids):
+        """Read only the rows addressed by row_id; the version they were read at is checked on commit."""
+        df, version = self.tables.read_rows(url, row_ids)
+        if url not in self._read_versions:
+            self._read_versions[url] = version
+        return df
+
+    def read_header(self, url):
+        """Column names of url without reading its rows; the table's version is not checked on commit."""
+        return self.tables.read_header(url)
+
+    @property
+    def pending(self):
+        return len([c for c in self._changes if c['kind'] != 'check'])
+
+    @property
+    def pending_urls(self):
+        """Sheets with staged writes."""
+        return sorted({c['url'] for c in self._changes if c['kind'] != 'check'})
+
+    def check_unchanged(self, url):
+        """Have commit() raise SheetConflictError if url, read through this unit of work, changed since.
+
+        For tables a write is based on without being written themselves.
+        """
+        if url and not any(c['url'] == url and c['kind'] == 'check' for c in self._changes):
+            self._changes.append({'kind': 'check', 'url': url})
+
+    def write_to_sheets(self, df, url):
+        if not url:
+            return False
+        if df is None or len(df.columns) == 0:
+            logger.error("Refusing to stage DataFrame with no columns to avoid wiping sheet")
+            return False
+        # A full replace supersedes anything staged earlier for the same table.
+        self._changes = [c for c in self._changes if c['url'] != url]
+        if url in self.row_id_urls:
+            df = fill_row_ids(df.copy())
+        self._changes.append({'kind': 'replace', 'url': url, 'df': df.copy()})
+        self.tables.stage(url, df)
+        return True
+
+    def write_rows_to_sheets(self, df, url, positions):
+        positions = list(positions)
+        if not url:
+            return False
+        if positions:
+            self._changes.append({'kind': 'rows', 'url': url, 'df': df.copy(), 'positions': positions})
+            self.tables.stage(url, df)
+        return True
+
+    def append_to_sheets(self, df, url):
+        """Stage rows for appending; columns must already be in the sheet header order."""
+        if not url:
+            return False
+        if df is not None and not df.empty:
+            if url in self.row_id_urls and ROW_ID_COLUMN in df.columns:
+                df = fill_row_ids(df.copy())
+            self._changes.append({'kind': 'append', 'url': url, 'df': df.copy()})
+            self.tables.stage_append(url, df)
+        return True
+
+    def update_rows(self, url, updates):
+        """Stage cell updates addressed by row_id ({row_id: {column: value}}); see DataConnector.update_rows."""
+        if not url:
+            return False
+        updates = _keyed_updates(updates)
+        if not updates:
+            return True
+        replaced = next((c for c in self._changes if c['url'] == url and c['kind'] == 'replace'), None)
+        if replaced is not None:
+            # The table is rewritten anyway, so change the staged copy
+            apply_row_updates(replaced['df'], updates, url)
+        else:
+            self._changes.append({'kind': 'cells', 'url': url, 'updates': updates})
+        self.tables.stage_cells(url, updates)
+        return True
+
+    def discard(self):
+        self.tables.evict(self.pending_urls)
+        self._changes = []
+
+    def commit(self):
+        """Write all staged changes; returns False (and keeps them staged) if the batch failed.
+
+        Raises SheetConflictError if a table read through this unit of work was changed
+        by someone else before the commit.
+        """
+        if not self.pending:
+            return True
+        written_urls = {c['url'] for c in self._changes}
+        expected_versions = {
+            url: version for url, version in self._read_versions.items()
+            if url in written_urls and version is not None
+        }
+        try:
+            committed = self.connector.batch_write_to_sheets(self._changes, expected_versions=expected_versions)
+        finally:
+            # Committed tables have new versions and failed ones hold unsaved edits: re-read either way.
+            self.tables.evict(written_urls)
+        if not committed:
+            return False
+        self._changes = []
+        return True
@@ -0,0 +1,74 @@
+"""
+Gunicorn settings for production (used by the Procfile)
+Every value can be overridden with an environment variable so Railway can tune it without a deploy
+"""
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ['true', '1', 'yes']
+
+
+# Railway sets PORT automatically
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Threaded workers: Sheets calls are network-bound, so threads keep one slow call
+# from blocking other users. 'gevent' also works if gevent is installed.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = _env_int('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count() * 2 + 1))
+threads = _env_int('GUNICORN_THREADS', 8)
+worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 100)
+
+# Load the app once in the master so workers fork with templates and imports ready.
+# Turn off to make `kill -HUP <master>` pick up new code on a graceful reload.
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+reload = _env_bool('GUNICORN_RELOAD', False)
+
+# Google Sheets reads/writes of large tabs can take tens of seconds
+timeout = _env_int('GUNICORN_TIMEOUT', 120)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+# Recycle workers periodically to cap memory growth from large DataFrames
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """Drop any Google Sheets session inherited from the master; the worker authenticates on first use.
+
+    The log writer thread does not survive the fork either, so the worker starts its own.
+    """
+    if not preload_app:
+        return
+    try:
+        from components.log_pipeline import restart_logging
+        restart_logging()
+        import app as app_module
+        app_module.connector.reset_client()
+    except Exception as e:
+        server.log.warning(f"Could not reset Google Sheets client in worker {worker.pid}: {str(e)}")
+
+
+def post_worker_init(worker):
+    """The socket is already bound here; warm up in the background (WARM_UP_ON_START=false to skip)."""
+    try:
+        import app as app_module
+        app_module.start_warm_up()
+    except Exception as e:
+        worker.log.warning(f"Warm-up could not be started in worker {worker.pid}: {str(e)}")
@@ -15,4 +15,41 @@ document.addEventListener('DOMContentLoaded', function() {
     console.log('Deej - Inventory Manager loaded');
 });
 
+// Fetch ranked product name suggestions from the server-side index
+function fetchProductSuggestions(query, limit = 7) {
+    const params = new URLSearchParams({ q: query || '', limit: String(limit) });
+    return fetch(`/api/products/suggest?${params.toString()}`)
+        .then(response => response.json())
+        .then(result => (result && result.success && Array.isArray(result.suggestions)) ? result.suggestions : [])
+        .catch(error => {
+            console.error('Error loading product suggestions:', error);
+            return [];
+        });
+}
 
+// POST with an Idempotency-Key: a dropped connection is retried with the same key, so the server
+// replays the first result instead of saving the change twice
+function newIdempotencyKey() {
+    if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+}
+
+function idempotentFetch(url, options = {}, retries = 2) {
+    const headers = Object.assign({}, options.headers, { 'Idempotency-Key': newIdempotencyKey() });
+    const request = Object.assign({}, options, { headers: headers });
+    const attempt = (left) => fetch(url, request).then(response => {
+        // 409: the first attempt is still running (or hit a write conflict and saved nothing)
+        if (response.status === 409 && left > 0) {
+            return new Promise(resolve => setTimeout(resolve, 1000)).then(() => attempt(left - 1));
+        }
+        return response;
+    }, error => {
+        if (left <= 0) {
+            throw error;
+        }
+        return new Promise(resolve => setTimeout(resolve, 1000)).then(() => attempt(left - 1));
+    });
+    return attempt(retries);
+}
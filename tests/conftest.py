@@ -0,0 +1,85 @@
+"""
+Shared fixtures: the real Flask app on top of FakeDataConnector, with per-test in-memory state
+"""
+import os
+import sys
+import tempfile
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set before the app is imported: no shared snapshot cache, no warm-up, logs out of the tree
+os.environ['SNAPSHOT_TTL_SECONDS'] = '0'
+os.environ['WARM_UP_ON_START'] = 'false'
+os.environ['LOG_DIR'] = tempfile.mkdtemp(prefix='inventory-app-test-logs-')
+os.environ.setdefault('BENCH_ROWS', '20')
+os.environ['BENCH_LATENCY'] = '0'
+
+from benchmarks import fake_app  # noqa: E402
+from components.idempotency import IdempotencyStore  # noqa: E402
+from components.payment_ledger import PaymentIndex  # noqa: E402
+from components.recent_submissions import RecentSubmissions  # noqa: E402
+from components.shared_sqlite import SharedDatabase  # noqa: E402
+from components.stock_movements import StockMovementIndex  # noqa: E402
+
+app_module = fake_app.app_module
+
+
+@pytest.fixture
+def connector(monkeypatch):
+    """A FakeDataConnector with generated data for every sheet, installed as the app's connector."""
+    conn, _ = fake_app.build_connector(60, seed=7)
+    monkeypatch.setattr(app_module, 'connector', conn)
+    monkeypatch.setattr(app_module, 'recent_submissions', RecentSubmissions(120))
+    monkeypatch.setattr(app_module, 'idempotency_keys', IdempotencyStore())
+    monkeypatch.setattr(app_module, '_payment_index', PaymentIndex())
+    monkeypatch.setattr(app_module, '_stock_movement_index', StockMovementIndex())
+    return conn
+
+
+@pytest.fixture(params=['in_process', 'shared'])
+def shared_store(request, tmp_path):
+    """None (in-process state) or a SharedDatabase, the cross-worker backend of the duplicate and idempotency stores."""
+    if request.param == 'in_process':
+        return None
+    return SharedDatabase(str(tmp_path / 'snapshots.sqlite'))
+
+
+@pytest.fixture
+def client(connector):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def urls():
+    """Sheet URL by env var name (INVENTORY_SHEET_URL, ...)"""
+    return {name: os.environ[name] for name in fake_app.BENCH_SHEETS}
+
+
+@pytest.fixture
+def assert_unchanged(connector):
+    """Call to check that no sheet's data changed since the test started."""
+    before = {url: df.copy() for url, df in connector.sheets.items()}
+
+    def check():
+        for url, df in before.items():
+            pd.testing.assert_frame_equal(connector.sheets[url], df)
+    return check
+
+
+@pytest.fixture
+def other_writer(connector, monkeypatch):
+    """other_writer(url, times): another worker saves url just before each of the next `times` batch writes."""
+    def install(url, times):
+        batch_write = connector.batch_write_to_sheets
+        left = [times]
+
+        def racing_batch_write(changes, expected_versions=None):
+            if left[0] > 0:
+                left[0] -= 1
+                connector.versions[url] += 1
+            return batch_write(changes, expected_versions=expected_versions)
+        monkeypatch.setattr(connector, 'batch_write_to_sheets', racing_batch_write)
+    return install
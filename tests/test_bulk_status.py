@@ -0,0 +1,77 @@
+import pytest
+
+
+@pytest.fixture
+def lots(connector, urls):
+    """Row ids and remaining quantities of the first two inventory lots."""
+    inventory = connector.sheets[urls['INVENTORY_SHEET_URL']]
+    return [(inventory.at[pos, 'row_id'], int(inventory.at[pos, 'remaining_qty'])) for pos in (0, 1)]
+
+
+def _remaining(connector, urls, row_id):
+    inventory = connector.sheets[urls['INVENTORY_SHEET_URL']]
+    return int(inventory.loc[inventory['row_id'] == row_id, 'remaining_qty'].iloc[0])
+
+
+def test_bulk_update_applies_every_action_in_one_batch(client, connector, urls, lots):
+    (first, first_qty), (second, second_qty) = lots
+    sold_rows = len(connector.sheets[urls['SOLD_ITEMS_SHEET_URL']])
+    used_rows = len(connector.sheets[urls['USED_FREEBIE_SHEET_URL']])
+    connector.calls.clear()
+
+    response = client.post('/api/update_status_bulk', json={'actions': [
+        {'row_id': first, 'status': 'sold', 'quantity_used': 2, 'selling_price': 900},
+        {'row_id': first, 'status': 'freebie', 'quantity_used': 1},
+        {'row_id': second, 'status': 'used', 'quantity_used': 1, 'remarks': 'sample'},
+    ]})
+    assert response.json['success'], response.json
+    assert [operation for operation, _ in connector.calls].count('batch') == 1
+    assert _remaining(connector, urls, first) == first_qty - 3
+    assert _remaining(connector, urls, second) == second_qty - 1
+    assert len(connector.sheets[urls['SOLD_ITEMS_SHEET_URL']]) == sold_rows + 1
+    assert len(connector.sheets[urls['USED_FREEBIE_SHEET_URL']]) == used_rows + 2
+    assert len(connector.sheets[urls['STOCK_MOVEMENTS_SHEET_URL']]) == 3
+
+
+def test_one_invalid_action_rejects_them_all(client, lots, assert_unchanged):
+    (first, first_qty), (second, _) = lots
+    response = client.post('/api/update_status_bulk', json={'actions': [
+        {'row_id': second, 'status': 'used', 'quantity_used': 1},
+        {'row_id': first, 'status': 'sold', 'quantity_used': first_qty},
+        {'row_id': first, 'status': 'used', 'quantity_used': 1},
+        {'row_id': 'missing', 'status': 'used'},
+        {'row_id': second, 'status': 'stolen'},
+    ]})
+    assert response.status_code == 400
+    assert [error['action'] for error in response.json['errors']] == [3, 4, 5]
+    assert "left in this lot" in response.json['errors'][0]['message']
+    assert_unchanged()
+
+
+def test_failed_write_leaves_every_sheet_untouched(client, connector, lots, assert_unchanged, monkeypatch):
+    monkeypatch.setattr(connector, 'batch_write_to_sheets', lambda changes, expected_versions=None: False)
+    response = client.post('/api/update_status_bulk', json={'actions': [
+        {'row_id': lots[0][0], 'status': 'sold', 'quantity_used': 1, 'selling_price': 500},
+        {'row_id': lots[1][0], 'status': 'used', 'quantity_used': 1},
+    ]})
+    assert response.status_code == 400
+    assert_unchanged()
+
+
+def test_persistent_conflict_writes_nothing(client, urls, lots, other_writer, assert_unchanged):
+    other_writer(urls['INVENTORY_SHEET_URL'], times=10)
+    response = client.post('/api/update_status_bulk', json={'actions': [
+        {'row_id': lots[0][0], 'status': 'used', 'quantity_used': 1},
+    ]})
+    assert response.status_code == 409
+    assert_unchanged()
+
+
+def test_conflict_is_retried_against_fresh_data(client, connector, urls, lots, other_writer):
+    (first, first_qty), _ = lots
+    other_writer(urls['INVENTORY_SHEET_URL'], times=1)
+    response = client.post('/api/update_status_bulk', json={'actions': [
+        {'row_id': first, 'status': 'used', 'quantity_used': 2},
+    ]})
+    assert response.json['success'], response.json
+    assert _remaining(connector, urls, first) == first_qty - 2
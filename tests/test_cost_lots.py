@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+from components.cost_lots import CostLotEngine
+
+
+def _inventory():
+    # Sheet order differs from purchase order: lots are taken by date_added
+    return pd.DataFrame([
+        {'product_name': 'GHK-Cu 2mg', 'total_cost_per_unit': 20, 'total_bought_quantity': 5, 'remaining_qty': 5,
+         'date_added': '2026-02-01'},
+        {'product_name': ' GHK-Cu 2mg', 'total_cost_per_unit': 10, 'total_bought_quantity': 5, 'remaining_qty': 5,
+         'date_added': '2026-01-01'},
+        {'product_name': 'Unknown', 'total_cost_per_unit': 99, 'total_bought_quantity': 9, 'remaining_qty': 9,
+         'date_added': '2026-01-01'},
+    ])
+
+
+def test_fifo_takes_and_prices_oldest_lots_first():
+    engine = CostLotEngine.from_inventory(_inventory(), 'fifo')
+    takes, cost_of_goods = engine.consume('GHK-Cu 2mg', 7)
+    assert takes == [(1, 5, 0), (0, 2, 3)]
+    assert cost_of_goods == 5 * 10 + 2 * 20
+    assert engine.remaining('GHK-Cu 2mg') == 3
+    assert engine.average_cost('GHK-Cu 2mg') == 20
+
+
+def test_lifo_takes_and_prices_newest_lots_first():
+    engine = CostLotEngine.from_inventory(_inventory(), 'lifo')
+    takes, cost_of_goods = engine.consume('GHK-Cu 2mg', 7)
+    assert takes == [(0, 5, 0), (1, 2, 3)]
+    assert cost_of_goods == 5 * 20 + 2 * 10
+    assert engine.average_cost('GHK-Cu 2mg') == 10
+
+
+def test_average_takes_oldest_lots_at_the_weighted_average():
+    engine = CostLotEngine.from_inventory(_inventory(), 'average')
+    takes, cost_of_goods = engine.consume('GHK-Cu 2mg', 7)
+    assert takes == [(1, 5, 0), (0, 2, 3)]
+    assert cost_of_goods == pytest.approx(7 * 15)
+
+
+@pytest.mark.parametrize('policy', ['fifo', 'lifo', 'average'])
+def test_restore_refills_the_consumed_lots(policy):
+    engine = CostLotEngine.from_inventory(_inventory(), policy)
+    takes, _ = engine.consume('GHK-Cu 2mg', 7)
+    changes = engine.restore('GHK-Cu 2mg', 7)
+    assert sorted(idx for idx, _, after in changes) == sorted(idx for idx, _, _ in takes)
+    assert all(after == 5 for _, _, after in changes)
+    assert engine.remaining('GHK-Cu 2mg') == 10
+    # Restored lots are consumed again in policy order
+    fresh = CostLotEngine.from_inventory(_inventory(), policy)
+    assert engine.consume('GHK-Cu 2mg', 10)[0] == fresh.consume('GHK-Cu 2mg', 10)[0]
+
+
+@pytest.mark.parametrize('policy', ['fifo', 'lifo', 'average'])
+def test_short_stock_is_refused_without_taking_anything(policy):
+    engine = CostLotEngine.from_inventory(_inventory(), policy)
+    with pytest.raises(ValueError):
+        engine.consume('GHK-Cu 2mg', 11)
+    assert engine.remaining('GHK-Cu 2mg') == 10
+    assert engine.consume('GHK-Cu 2mg', 10)[1] > 0
+
+
+def test_placeholder_names_are_not_lots():
+    engine = CostLotEngine.from_inventory(_inventory(), 'fifo')
+    assert engine.remaining('Unknown') == 0
+    with pytest.raises(ValueError):
+        engine.consume('Unknown', 1)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        CostLotEngine('random')
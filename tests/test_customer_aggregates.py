@@ -0,0 +1,48 @@
+import json
+
+import pandas as pd
+
+from components.customer_aggregates import CustomerAggregates, recompute_customers
+
+ITEMS = [{'name': 'GHK-Cu 2mg', 'price': 250, 'quantity': 2}]
+
+
+def test_missing_columns_are_added_to_a_copy():
+    customers = pd.DataFrame({'customer_name': ['Ana']})
+    aggregates = CustomerAggregates(customers)
+    assert aggregates.schema_changed
+    assert list(customers.columns) == ['customer_name']
+    assert 'products_purchased' in aggregates.df.columns
+
+
+def test_apply_and_remove_an_invoice():
+    aggregates = CustomerAggregates(pd.DataFrame({
+        'customer_name': ['Ana'], 'total_orders': [1], 'total_spent': [100], 'first_order_date': ['2026-01-05'],
+        'last_order_date': ['2026-01-05'], 'products_purchased': ['{}'],
+    }))
+    assert aggregates.apply_invoice(' Ana ', ITEMS, 500, '2026-01-02') == 0
+    assert aggregates.apply_invoice('Ben', ITEMS, 500, '2026-01-03') == 1
+    row = aggregates.df.iloc[0]
+    assert (row['total_orders'], row['total_spent'], row['first_order_date']) == (2, 600, '2026-01-02')
+    assert json.loads(row['products_purchased']) == {'GHK-Cu 2mg': {'qty': 2, 'total_amount': 500}}
+    assert aggregates.updated_positions() == [0]
+    assert aggregates.new_rows()['customer_name'].tolist() == ['Ben']
+
+    aggregates.apply_invoice('Ana', ITEMS, 500, None, sign=-1)
+    row = aggregates.df.iloc[0]
+    assert (row['total_orders'], row['total_spent'], row['products_purchased']) == (1, 100, '{}')
+
+
+def test_recompute_counts_each_invoice_once():
+    invoices = pd.DataFrame({
+        'invoice_number': ['INV-1', 'INV-1', 'INV-2'], 'created_at': ['t1', 't1', 't2'],
+        'customer_name': ['Ana', 'Ana', 'Ana'], 'invoice_date': ['2026-01-02', '2026-01-02', '2026-01-09'],
+        'product_name': ['A', 'B', 'A'], 'quantity': [1, 2, 3], 'price_sold': [10, 5, 10], 'total_amount': [20, 20, 30],
+    })
+    existing = pd.DataFrame({'customer_name': ['Ana'], 'notes': ['vip']})
+    row = recompute_customers(invoices, existing).iloc[0]
+    assert (row['total_orders'], row['total_spent']) == (2, 50)
+    assert (row['first_order_date'], row['last_order_date'], row['notes']) == ('2026-01-02', '2026-01-09', 'vip')
+    assert json.loads(row['products_purchased']) == {
+        'A': {'qty': 4, 'total_amount': 40}, 'B': {'qty': 2, 'total_amount': 10},
+    }
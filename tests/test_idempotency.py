@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+
+from components.idempotency import IdempotencyStore
+
+
+@pytest.fixture
+def keys(shared_store):
+    return IdempotencyStore(ttl_seconds=3600, max_keys=3, lease_seconds=60, store=shared_store)
+
+
+def test_completed_request_is_replayed(keys):
+    state, token, _ = keys.begin('k', 'fp', now=1000.0)
+    assert state == 'started'
+    keys.finish('k', token, 200, 'application/json', b'{"ok": 1}')
+    assert keys.begin('k', 'fp', now=1001.0) == ('replay', None, (200, 'application/json', b'{"ok": 1}'))
+
+
+def test_running_request_is_reported_in_progress(keys):
+    keys.begin('k', 'fp', now=1000.0)
+    assert keys.begin('k', 'fp', now=1001.0)[0] == 'in_progress'
+
+
+def test_key_reused_for_another_request_is_a_mismatch(keys):
+    keys.begin('k', 'fp', now=1000.0)
+    assert keys.begin('k', 'other', now=1001.0)[0] == 'mismatch'
+
+
+def test_abandoned_request_can_run_again(keys):
+    _, token, _ = keys.begin('k', 'fp', now=1000.0)
+    keys.abandon('k', token)
+    assert keys.begin('k', 'fp', now=1001.0)[0] == 'started'
+
+
+def test_lease_of_a_dead_worker_expires(keys):
+    keys.begin('k', 'fp', now=1000.0)
+    assert keys.begin('k', 'fp', now=1059.0)[0] == 'in_progress'
+    assert keys.begin('k', 'fp', now=1061.0)[0] == 'started'
+
+
+def test_stale_lease_cannot_overwrite_a_new_one(keys):
+    _, stale, _ = keys.begin('k', 'fp', now=1000.0)
+    _, fresh, _ = keys.begin('k', 'fp', now=1061.0)
+    keys.finish('k', stale, 200, 'application/json', b'stale')
+    keys.abandon('k', stale)
+    assert keys.begin('k', 'fp', now=1062.0)[0] == 'in_progress'
+    keys.finish('k', fresh, 200, 'application/json', b'fresh')
+    assert keys.begin('k', 'fp', now=1063.0)[2][2] == b'fresh'
+
+
+def test_keys_expire_after_the_ttl_and_beyond_max_keys(keys):
+    for number, key in enumerate(['a', 'b', 'c']):
+        _, token, _ = keys.begin(key, 'fp', now=1000.0 + number)
+        keys.finish(key, token, 200, 'application/json', key.encode())
+    assert keys.begin('a', 'fp', now=1010.0)[0] == 'replay'
+    keys.begin('d', 'fp', now=1011.0)
+    assert keys.begin('a', 'fp', now=1012.0)[0] == 'started'
+    assert keys.begin('c', 'fp', now=1002.0 + 3601)[0] == 'started'
+
+
+def _invoice_rows(connector, urls):
+    return len(connector.sheets[urls['INVOICES_SHEET_URL']])
+
+
+INVOICE = {
+    'customer_name': 'Retry Test',
+    'items': [{'name': 'GHK-Cu 2mg', 'price': 250, 'quantity': 1, 'subtotal': 250}],
+    'total_amount': 250,
+    'invoice_date': '2026-02-01',
+}
+
+
+def test_retried_post_replays_the_first_response(client, connector, urls):
+    rows = _invoice_rows(connector, urls)
+    first = client.post('/api/create_invoice', json=INVOICE, headers={'Idempotency-Key': 'retry-1'})
+    assert first.json['success'], first.json
+    retry = client.post('/api/create_invoice', json=INVOICE, headers={'Idempotency-Key': 'retry-1'})
+    assert retry.headers.get('Idempotent-Replayed') == 'true'
+    assert retry.get_data() == first.get_data()
+    assert _invoice_rows(connector, urls) == rows + 1
+
+
+def test_same_key_with_another_body_is_refused(client):
+    client.post('/api/create_invoice', json=INVOICE, headers={'Idempotency-Key': 'retry-1'})
+    response = client.post('/api/create_invoice', json={**INVOICE, 'total_amount': 300},
+                           headers={'Idempotency-Key': 'retry-1'})
+    assert response.status_code == 422
+
+
+def test_failed_request_is_not_replayed(client, connector, monkeypatch):
+    batch_write = connector.batch_write_to_sheets
+    monkeypatch.setattr(connector, 'batch_write_to_sheets', lambda changes, expected_versions=None: False)
+    assert client.post('/api/create_invoice', json=INVOICE, headers={'Idempotency-Key': 'retry-1'}).status_code == 400
+    monkeypatch.setattr(connector, 'batch_write_to_sheets', batch_write)
+    response = client.post('/api/create_invoice', json=INVOICE, headers={'Idempotency-Key': 'retry-1'})
+    assert response.json['success'], response.json
+    assert 'Idempotent-Replayed' not in response.headers
+
+
+def test_retry_while_the_first_request_runs_is_in_progress(client, connector, urls, monkeypatch):
+    batch_write = connector.batch_write_to_sheets
+    writing, release = threading.Event(), threading.Event()
+
+    def slow_batch_write(changes, expected_versions=None):
+        writing.set()
+        release.wait(10)
+        return batch_write(changes, expected_versions=expected_versions)
+    monkeypatch.setattr(connector, 'batch_write_to_sheets', slow_batch_write)
+
+    rows = _invoice_rows(connector, urls)
+    responses = []
+    first = threading.Thread(target=lambda: responses.append(
+        client.application.test_client().post('/api/create_invoice', json=INVOICE, headers={'Idempotency-Key': 'slow'})
+    ))
+    first.start()
+    try:
+        assert writing.wait(10)
+        retry = client.post('/api/create_invoice', json=INVOICE, headers={'Idempotency-Key': 'slow'})
+        assert retry.status_code == 409
+    finally:
+        release.set()
+        first.join(10)
+    assert responses[0].json['success'], responses[0].json
+    assert _invoice_rows(connector, urls) == rows + 1
+    replay = client.post('/api/create_invoice', json=INVOICE, headers={'Idempotency-Key': 'slow'})
+    assert replay.headers.get('Idempotent-Replayed') == 'true'
@@ -0,0 +1,93 @@
+import io
+
+import pytest
+
+from components.inventory_import import read_import, stage_import
+from components.recent_submissions import RecentSubmissions
+
+CSV = (
+    "Product Name,total_price,quantity,shipping_admin_fee,supplier,date_added\n"
+    "BPC-157 5mg,\"1,500\",3,60,Acme,2026-01-10\n"
+    "GHK-Cu 2mg,abc,2,,Acme,\n"
+    "Tirzepatide 10mg,4000,0,,Acme,\n"
+    "Semax 10mg,900,2,,,not a date\n"
+    "bpc-157  5MG,1500,3,60.00,acme,2026-01-10 00:01:00\n"
+    "BPC-157 5mg,1500,3,60,Acme,2026-02-10\n"
+)
+
+
+def _stream(text=CSV):
+    return io.BytesIO(text.encode('utf-8'))
+
+
+def test_rows_are_validated_and_priced_per_line():
+    accepted, fingerprints, result = read_import(_stream(), now='2026-03-01 12:00:00')
+    assert result['rows_read'] == 6
+    assert [(error['line'], error['message']) for error in result['errors']] == [
+        (3, 'total_price must be a number'),
+        (4, 'quantity must be at least 1'),
+        (5, 'date_added is not a valid date'),
+        (6, 'Duplicate of line 2 in this file'),
+    ]
+    assert accepted['product_name'].tolist() == ['BPC-157 5mg', 'BPC-157 5mg']
+    assert accepted['total_cost_per_unit'].tolist() == [520.0, 520.0]
+    assert accepted['date_added'].tolist() == ['2026-01-10 00:00:00', '2026-02-10 00:00:00']
+    assert len(fingerprints) == 2
+
+
+def test_unusable_files_are_refused():
+    with pytest.raises(ValueError, match='missing required'):
+        read_import(_stream("product_name,quantity\nA,1\n"))
+    with pytest.raises(ValueError, match='empty'):
+        read_import(_stream(''))
+
+
+def test_purchases_claimed_recently_are_duplicates(connector, urls):
+    from data_sources import UnitOfWork
+
+    recent = RecentSubmissions(120)
+    csv = "product_name,total_price,quantity\nBPC-157 5mg,1500,3\nSemax 10mg,900,2\n"
+    result, claims = stage_import(UnitOfWork(connector), urls['INVENTORY_SHEET_URL'], _stream(csv), recent=recent)
+    assert result['accepted'] == 2 and len(claims) == 2
+    result, claims = stage_import(UnitOfWork(connector), urls['INVENTORY_SHEET_URL'], _stream(csv), recent=recent)
+    assert result['accepted'] == 0 and not claims
+    assert {error['message'] for error in result['errors']} == {'Duplicate of a purchase added recently'}
+
+
+def test_import_route_appends_once_without_reading_the_sheet(client, connector, urls):
+    inventory_url = urls['INVENTORY_SHEET_URL']
+    rows = len(connector.sheets[inventory_url])
+    connector.calls.clear()
+    response = client.post('/api/import_inventory', data=CSV, content_type='text/csv')
+    assert response.json['success'], response.json
+    assert response.json['accepted'] == 2 and response.json['rejected'] == 4
+    assert ('read', inventory_url) not in connector.calls
+    assert [operation for operation, _ in connector.calls].count('batch') == 1
+    imported = connector.sheets[inventory_url].iloc[rows:]
+    assert len(imported) == 2 and imported['row_id'].notna().all()
+
+
+def test_add_product_and_import_share_the_duplicate_check(client, connector, urls):
+    product = {'product_name': 'Retatrutide 5mg', 'total_price': 4200, 'shipping_admin_fee': 150, 'quantity': 6,
+               'supplier': 'Acme'}
+    assert client.post('/api/add_product', json=product).json['success']
+    csv = "product_name,total_price,shipping_admin_fee,quantity,supplier\nretatrutide 5mg,4200,150,6,ACME\n"
+    response = client.post('/api/import_inventory', data=csv, content_type='text/csv')
+    assert response.json['accepted'] == 0
+    assert response.json['errors'][0]['message'] == 'Duplicate of a purchase added recently'
+
+
+def test_dry_run_writes_and_claims_nothing(client, assert_unchanged):
+    response = client.post('/api/import_inventory?dry_run=1', data=CSV, content_type='text/csv')
+    assert response.json['success'] and response.json['dry_run'] and response.json['accepted'] == 2
+    assert_unchanged()
+    assert client.post('/api/import_inventory?dry_run=1', data=CSV, content_type='text/csv').json['accepted'] == 2
+
+
+def test_failed_import_writes_nothing_and_can_be_retried(client, connector, assert_unchanged, monkeypatch):
+    batch_write = connector.batch_write_to_sheets
+    monkeypatch.setattr(connector, 'batch_write_to_sheets', lambda changes, expected_versions=None: False)
+    assert client.post('/api/import_inventory', data=CSV, content_type='text/csv').status_code == 400
+    assert_unchanged()
+    monkeypatch.setattr(connector, 'batch_write_to_sheets', batch_write)
+    assert client.post('/api/import_inventory', data=CSV, content_type='text/csv').json['accepted'] == 2
@@ -0,0 +1,82 @@
+import pytest
+
+
+def _remaining(connector, urls, product_name):
+    inventory = connector.sheets[urls['INVENTORY_SHEET_URL']]
+    return int(inventory.loc[inventory['product_name'] == product_name, 'remaining_qty'].astype(int).sum())
+
+
+def _invoice(customer_name, product_name, quantity, price=100, **fields):
+    return {'customer_name': customer_name, 'items': [{'name': product_name, 'quantity': quantity, 'price': price}],
+            'invoice_date': '2026-03-01', **fields}
+
+
+@pytest.fixture
+def batch():
+    return [
+        _invoice('Import A', 'GHK-Cu 2mg', 2, amount_paid=50, ref='a'),
+        _invoice('Import B', 'CJC-1295 2mg', 3, shipment_fee=20, ref='b'),
+    ]
+
+
+def test_import_creates_all_invoices_in_one_batch(client, connector, urls, batch):
+    ghk, cjc = _remaining(connector, urls, 'GHK-Cu 2mg'), _remaining(connector, urls, 'CJC-1295 2mg')
+    invoice_rows = len(connector.sheets[urls['INVOICES_SHEET_URL']])
+    connector.calls.clear()
+
+    response = client.post('/api/import_invoices', json={'invoices': batch})
+    assert response.json['success'], response.json
+    assert [entry['ref'] for entry in response.json['created']] == ['a', 'b']
+    assert [entry['total_amount'] for entry in response.json['created']] == [200, 320]
+    assert len({entry['invoice_number'] for entry in response.json['created']}) == 2
+    assert [operation for operation, _ in connector.calls].count('batch') == 1
+    assert len(connector.sheets[urls['INVOICES_SHEET_URL']]) == invoice_rows + 2
+    assert _remaining(connector, urls, 'GHK-Cu 2mg') == ghk - 2
+    assert _remaining(connector, urls, 'CJC-1295 2mg') == cjc - 3
+    assert connector.sheets[urls['PAYMENTS_SHEET_URL']]['amount'].tolist() == [50.0]
+
+
+def test_invalid_invoices_are_reported_and_the_rest_created(client, connector, urls, batch):
+    response = client.post('/api/import_invoices', json={'invoices': batch + [_invoice('', 'GHK-Cu 2mg', 1, ref='c')]})
+    assert response.json['success'], response.json
+    assert [entry['ref'] for entry in response.json['created']] == ['a', 'b']
+    assert response.json['errors'] == [{'invoice': 3, 'ref': 'c', 'message': 'customer_name is required'}]
+
+
+def test_short_stock_rejects_the_whole_batch(client, connector, urls, batch, assert_unchanged):
+    too_many = _remaining(connector, urls, 'GHK-Cu 2mg')
+    response = client.post('/api/import_invoices', json={'invoices': batch + [_invoice('Import C', 'GHK-Cu 2mg', too_many)]})
+    assert response.status_code == 400
+    assert 'Insufficient stock' in response.json['message']
+    assert_unchanged()
+
+
+def test_dry_run_writes_nothing(client, connector, batch, assert_unchanged):
+    connector.calls.clear()
+    response = client.post('/api/import_invoices?dry_run=1', json={'invoices': batch})
+    assert response.json['success'], response.json
+    assert len(response.json['created']) == 2
+    assert 'batch' not in [operation for operation, _ in connector.calls]
+    assert_unchanged()
+
+
+def test_failed_write_leaves_every_sheet_untouched(client, connector, batch, assert_unchanged, monkeypatch):
+    monkeypatch.setattr(connector, 'batch_write_to_sheets', lambda changes, expected_versions=None: False)
+    response = client.post('/api/import_invoices', json={'invoices': batch})
+    assert response.status_code == 400
+    assert_unchanged()
+
+
+def test_conflict_is_retried_against_fresh_data(client, connector, urls, batch, other_writer):
+    ghk = _remaining(connector, urls, 'GHK-Cu 2mg')
+    other_writer(urls['INVENTORY_SHEET_URL'], times=1)
+    response = client.post('/api/import_invoices', json={'invoices': batch})
+    assert response.json['success'], response.json
+    assert _remaining(connector, urls, 'GHK-Cu 2mg') == ghk - 2
+
+
+def test_persistent_conflict_writes_nothing(client, connector, urls, batch, other_writer, assert_unchanged):
+    other_writer(urls['INVENTORY_SHEET_URL'], times=10)
+    response = client.post('/api/import_invoices', json={'invoices': batch})
+    assert response.status_code == 409
+    assert_unchanged()
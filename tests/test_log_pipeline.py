@@ -0,0 +1,25 @@
+import logging
+import os
+
+from components import log_pipeline
+
+
+def test_restart_starts_a_new_writer_on_a_fresh_queue():
+    log_pipeline.configure_logging()
+    before = log_pipeline._listener
+    log_pipeline.restart_logging()
+    listener = log_pipeline._listener
+    assert listener is not before
+    assert listener.queue is not before.queue
+    assert listener._thread.is_alive()
+    queue_handlers = [handler for handler in logging.getLogger().handlers
+                      if isinstance(handler, logging.handlers.QueueHandler)]
+    assert queue_handlers and all(handler.queue is listener.queue for handler in queue_handlers)
+
+    logging.getLogger('tests.log_pipeline').warning('written after restart')
+    log_pipeline.shutdown_logging()  # Flushes the queue
+    try:
+        with open(os.path.join(os.environ['LOG_DIR'], 'audit_log.txt'), encoding='utf-8') as handle:
+            assert 'written after restart' in handle.read()
+    finally:
+        log_pipeline.configure_logging()
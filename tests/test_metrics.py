@@ -0,0 +1,16 @@
+from benchmarks.fake_app import app_module
+
+
+def test_metrics_are_served_to_loopback_clients_only(client):
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.9'}).status_code == 403
+
+
+def test_metrics_token_is_required_when_configured(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 'scrape-secret')
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'},
+                          environ_base={'REMOTE_ADDR': '203.0.113.9'})
+    assert response.status_code == 200
+    assert b'log_records_dropped_total' in response.data
@@ -0,0 +1,107 @@
+import pytest
+
+from components.payment_ledger import invoice_key
+
+
+@pytest.fixture
+def invoice(client, connector, urls):
+    """An invoice of 2 x 250 with 100 paid, as (invoice_number, created_at)."""
+    response = client.post('/api/create_invoice', json={
+        'customer_name': 'Ledger Test',
+        'items': [{'name': 'GHK-Cu 2mg', 'price': 250, 'quantity': 2, 'subtotal': 500}],
+        'shipment_fee': 0,
+        'total_amount': 500,
+        'amount_paid': 100,
+        'payment_reference': 'GCASH-1',
+        'invoice_date': '2026-01-10',
+    })
+    assert response.json['success'], response.json
+    invoices = connector.sheets[urls['INVOICES_SHEET_URL']]
+    row = invoices[invoices['invoice_number'] == response.json['invoice_number']].iloc[0]
+    return row['invoice_number'], row['created_at']
+
+
+def _ledger(connector, urls, invoice):
+    payments = connector.sheets[urls['PAYMENTS_SHEET_URL']]
+    return payments[payments['invoice_key'] == invoice_key(*invoice)]
+
+
+def _edit(client, invoice, items, **fields):
+    return client.post('/api/update_invoice', json={
+        'invoice_number': invoice[0],
+        'created_at': invoice[1],
+        'customer_name': 'Ledger Test',
+        'invoice_date': '2026-01-10',
+        'shipment_fee': 0,
+        'items': items,
+        **fields,
+    })
+
+
+def test_create_invoice_books_initial_payment(connector, urls, invoice):
+    ledger = _ledger(connector, urls, invoice)
+    assert ledger[['amount', 'kind', 'reference']].values.tolist() == [[100.0, 'payment', 'GCASH-1']]
+
+
+def test_item_edit_does_not_book_a_correction(client, connector, urls, invoice):
+    response = _edit(client, invoice, [{'name': 'GHK-Cu 2mg', 'price': 250, 'quantity': 3}])
+    assert response.json['success'], response.json
+    assert response.json['amount_paid'] == 100
+    assert len(_ledger(connector, urls, invoice)) == 1
+
+
+def test_lowering_total_below_paid_does_not_book_a_correction(client, connector, urls, invoice):
+    response = _edit(client, invoice, [{'name': 'GHK-Cu 2mg', 'price': 50, 'quantity': 1}])
+    assert response.json['success'], response.json
+    # Shown capped at the new total, but the ledger still holds what was actually paid
+    assert response.json['amount_paid'] == 50
+    assert response.json['balance_due'] == 0
+    assert _ledger(connector, urls, invoice)['amount'].sum() == 100
+
+
+def test_edited_amount_paid_books_the_difference(client, connector, urls, invoice):
+    response = _edit(client, invoice, [{'name': 'GHK-Cu 2mg', 'price': 250, 'quantity': 2}], amount_paid=300)
+    assert response.json['success'], response.json
+    ledger = _ledger(connector, urls, invoice)
+    assert ledger[['amount', 'kind']].values.tolist() == [[100.0, 'payment'], [200.0, 'adjustment']]
+    assert response.json['balance_due'] == 200
+
+    response = _edit(client, invoice, [{'name': 'GHK-Cu 2mg', 'price': 250, 'quantity': 2}], amount_paid=150)
+    assert response.json['success'], response.json
+    assert _ledger(connector, urls, invoice)['amount'].tolist() == [100.0, 200.0, -150.0]
+
+
+def test_add_payment_appends_to_the_ledger(client, connector, urls, invoice):
+    invoices_before = connector.sheets[urls['INVOICES_SHEET_URL']].copy()
+    response = client.post('/api/add_invoice_payment', json={
+        'invoice_number': invoice[0], 'created_at': invoice[1], 'payment_amount': 400, 'payment_reference': 'BANK-2'
+    })
+    assert response.json['success'], response.json
+    ledger = _ledger(connector, urls, invoice)
+    assert ledger['amount'].tolist() == [100.0, 400.0]
+    assert response.json['paid'] is True
+    assert response.json['balance_due'] == 0
+    # Paid state comes from the ledger; the invoice rows themselves are not rewritten
+    assert connector.sheets[urls['INVOICES_SHEET_URL']].equals(invoices_before)
+
+
+def test_saving_an_overpaid_invoice_keeps_the_overpayment(client, connector, urls, invoice):
+    items = [{'name': 'GHK-Cu 2mg', 'price': 250, 'quantity': 2}]
+    assert _edit(client, invoice, items, amount_paid=600).json['success']
+    # The form shows the paid amount capped at the 500 total and sends it back with the other edits
+    response = _edit(client, invoice, items, amount_paid=500, payment_reference='GCASH-2')
+    assert response.json['success'], response.json
+    assert _ledger(connector, urls, invoice)['amount'].tolist() == [100.0, 500.0]
+    assert response.json['amount_paid'] == 500
+
+
+def test_add_payment_is_reapplied_after_a_concurrent_invoice_edit(client, connector, urls, invoice, other_writer):
+    other_writer(urls['INVOICES_SHEET_URL'], times=1)
+    connector.calls.clear()
+    response = client.post('/api/add_invoice_payment', json={
+        'invoice_number': invoice[0], 'created_at': invoice[1], 'payment_amount': 50
+    })
+    assert response.json['success'], response.json
+    # The invoice was read, found changed at commit, read again and the payment booked once
+    assert connector.calls.count(('read', urls['INVOICES_SHEET_URL'])) == 2
+    assert _ledger(connector, urls, invoice)['amount'].tolist() == [100.0, 50.0]
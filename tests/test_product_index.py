@@ -0,0 +1,27 @@
+from components.product_index import ProductNameIndex, names_signature
+
+NAMES = ['BPC-157 5mg', 'bpc-157  5mg', 'GHK-Cu 2mg', 'GHK-Cu 50mg', 'Retatrutide 5mg', 'TB-500 5mg', '', None]
+
+
+def test_names_are_deduplicated_case_and_whitespace_insensitively():
+    index = ProductNameIndex(NAMES)
+    assert len(index) == 5
+    assert index.suggest('bpc') == ['BPC-157 5mg']
+
+
+def test_suggestions_rank_exact_prefix_word_start_then_substring():
+    index = ProductNameIndex(['Retatirz', 'Semaglutide Tirz', 'Tirzepatide', 'TIRZ'])
+    assert index.suggest('tirz') == ['TIRZ', 'Tirzepatide', 'Semaglutide Tirz', 'Retatirz']
+    assert index.suggest('tirz', limit=2) == ['TIRZ', 'Tirzepatide']
+
+
+def test_matches_earlier_in_the_name_rank_first():
+    index = ProductNameIndex(NAMES)
+    assert index.suggest('5mg') == ['TB-500 5mg', 'BPC-157 5mg', 'Retatrutide 5mg']
+    assert index.suggest('missing') == []
+    assert index.suggest('') == ['BPC-157 5mg', 'GHK-Cu 2mg', 'GHK-Cu 50mg', 'Retatrutide 5mg', 'TB-500 5mg']
+
+
+def test_signature_ignores_order_and_duplicates():
+    assert names_signature(['B', 'A', 'A']) == names_signature(['A', ' B '])
+    assert ProductNameIndex(NAMES).signature != ProductNameIndex(NAMES[:3]).signature
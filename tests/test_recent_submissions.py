@@ -0,0 +1,65 @@
+from components.recent_submissions import RecentSubmissions, purchase_fingerprint
+from components.shared_sqlite import SharedDatabase
+
+
+def test_fingerprint_ignores_case_whitespace_and_amount_format():
+    assert purchase_fingerprint('GHK-Cu  2mg ', '1500', 0, 10, 'Acme') == \
+        purchase_fingerprint('ghk-cu 2mg', 1500.0, '0.00', '10', ' ACME')
+    assert purchase_fingerprint('GHK-Cu 2mg', 1500, 0, 10, 'Acme') != \
+        purchase_fingerprint('GHK-Cu 2mg', 1500.01, 0, 10, 'Acme')
+
+
+def test_second_claim_within_the_window_is_a_duplicate(shared_store):
+    recent = RecentSubmissions(60, store=shared_store)
+    assert recent.claim('a', now=1000.0) is not None
+    assert recent.claim('a', now=1059.0) is None
+    assert recent.claim('b', now=1059.0) is not None
+
+
+def test_claim_expires_after_the_window(shared_store):
+    recent = RecentSubmissions(60, store=shared_store)
+    recent.claim('a', now=1000.0)
+    assert recent.claim('a', now=1061.0) is not None
+    assert recent.claim('a', now=1100.0) is None
+
+
+def test_released_claim_can_be_submitted_again(shared_store):
+    recent = RecentSubmissions(60, store=shared_store)
+    token = recent.claim('a', now=1000.0)
+    recent.release('a', token)
+    assert recent.claim('a', now=1001.0) is not None
+
+
+def test_release_of_an_old_claim_keeps_the_newer_one(shared_store):
+    recent = RecentSubmissions(60, store=shared_store)
+    old = recent.claim('a', now=1000.0)
+    assert recent.claim('a', now=1070.0) is not None
+    recent.release('a', old)
+    assert recent.claim('a', now=1071.0) is None
+
+
+def test_claims_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'snapshots.sqlite')
+    first, second = RecentSubmissions(60, SharedDatabase(path)), RecentSubmissions(60, SharedDatabase(path))
+    assert first.claim('a', now=1000.0) is not None
+    assert second.claim('a', now=1001.0) is None
+
+
+def test_add_product_refuses_a_double_submission(client, connector, urls):
+    product = {'product_name': 'Retatrutide 5mg', 'total_price': 4200, 'shipping_admin_fee': 150, 'quantity': 6,
+               'supplier': 'Acme'}
+    rows = len(connector.sheets[urls['INVENTORY_SHEET_URL']])
+    assert client.post('/api/add_product', json=product).json['success']
+    response = client.post('/api/add_product', json={**product, 'product_name': ' retatrutide 5MG'})
+    assert response.status_code == 400
+    assert 'similar entry' in response.json['message']
+    assert len(connector.sheets[urls['INVENTORY_SHEET_URL']]) == rows + 1
+
+
+def test_failed_add_product_can_be_resubmitted(client, connector, monkeypatch):
+    product = {'product_name': 'Retatrutide 5mg', 'total_price': 4200, 'quantity': 6}
+    batch_write = connector.batch_write_to_sheets
+    monkeypatch.setattr(connector, 'batch_write_to_sheets', lambda changes, expected_versions=None: False)
+    assert client.post('/api/add_product', json=product).status_code == 400
+    monkeypatch.setattr(connector, 'batch_write_to_sheets', batch_write)
+    assert client.post('/api/add_product', json=product).json['success']
@@ -0,0 +1,219 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from benchmarks.fake_sheets_server import FakeSheetsBackend, make_server
+from data_sources import DataConnector, RowNotFoundError, SheetConflictError, UnitOfWork, fill_row_ids
+
+SHEET_URL = 'https://docs.google.com/spreadsheets/d/TEST/edit#gid=0'
+
+
+@pytest.fixture
+def backend():
+    backend = FakeSheetsBackend()
+    backend.add_spreadsheet('TEST', 'Row ids')
+    backend.add_sheet('TEST', 0, 'Sold Items', [
+        ['product_name', 'qty', 'row_id'], ['A', '1', 'ra'], ['B', '2', 'rb'], ['C', '3', 'rc'],
+    ])
+    server = make_server(backend, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    backend.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield backend
+    server.shutdown()
+    server.server_close()
+
+
+def _connector(backend):
+    return DataConnector({'sheets_api_base_url': backend.base_url})
+
+
+def _values(backend):
+    return backend.spreadsheets['TEST']['sheets'][0]['values']
+
+
+def test_fill_row_ids_adds_the_column_last():
+    df = fill_row_ids(pd.DataFrame({'product_name': ['A', 'B']}))
+    assert list(df.columns) == ['product_name', 'row_id']
+    assert df['row_id'].str.match(r'^r[0-9a-f]{15}$').all()
+    assert df['row_id'].is_unique
+
+
+def test_fill_row_ids_fills_blanks_and_copies_only():
+    df = fill_row_ids(pd.DataFrame({'product_name': list('ABCDE'), 'row_id': ['ra', None, '', 'ra', 'nan']}))
+    assert df['row_id'].iloc[0] == 'ra'
+    assert df['row_id'].is_unique
+    assert not df['row_id'].iloc[1:].isin(['ra', '', 'nan']).any()
+
+
+def test_ensure_row_ids_backfills_only_the_id_column(backend):
+    values = _values(backend)
+    values[2][2] = ''
+    values.append(['D', '4'])
+    connector = _connector(backend)
+    assert connector.ensure_row_ids(SHEET_URL) == 2
+    assert [row[:2] for row in _values(backend)[1:]] == [['A', '1'], ['B', '2'], ['C', '3'], ['D', '4']]
+    ids = [row[2] for row in _values(backend)[1:]]
+    assert ids[0] == 'ra' and ids[2] == 'rc' and len(set(ids)) == 4
+    assert connector.ensure_row_ids(SHEET_URL) == 0
+
+
+def test_update_rows_writes_only_the_given_cells(backend):
+    connector = _connector(backend)
+    connector.read_from_sheets(SHEET_URL)
+    backend.stats.clear()
+    assert connector.update_rows(SHEET_URL, {'rb': {'qty': 20, 'remarks': 'new column'}})
+    assert _values(backend) == [
+        ['product_name', 'qty', 'row_id', 'remarks'], ['A', '1', 'ra'], ['B', '20', 'rb', 'new column'], ['C', '3', 'rc'],
+    ]
+    # Cached layout checked against the live id cells; the sheet itself is not downloaded
+    assert backend.stats['values_get'] == 0
+    assert backend.stats['batch_update'] == 1
+
+
+def test_update_rows_follows_rows_moved_by_hand(backend):
+    connector = _connector(backend)
+    connector.read_from_sheets(SHEET_URL)
+    # Sorted and a row inserted in the Sheets UI: the version stamp does not move
+    values = _values(backend)
+    values[1:] = [['Z', '9', 'rz']] + values[1:][::-1]
+    assert connector.update_rows(SHEET_URL, {'ra': {'qty': 11}, 'rc': {'qty': 33}})
+    assert _values(backend)[1:] == [['Z', '9', 'rz'], ['C', '33', 'rc'], ['B', '2', 'rb'], ['A', '11', 'ra']]
+    backend.stats.clear()
+    assert connector.update_rows(SHEET_URL, {'rb': {'qty': 22}})
+    assert _values(backend)[3] == ['B', '22', 'rb']
+    assert backend.stats['values_get'] == 0
+
+
+def test_update_rows_without_a_cached_layout(backend):
+    assert _connector(backend).update_rows(SHEET_URL, {'rc': {'qty': 30}})
+    assert _values(backend)[3] == ['C', '30', 'rc']
+
+
+def test_unknown_row_id_writes_nothing(backend):
+    connector = _connector(backend)
+    before = [list(row) for row in _values(backend)]
+    with pytest.raises(RowNotFoundError) as error:
+        connector.update_rows(SHEET_URL, {'ra': {'qty': 5}, 'missing': {'qty': 6}})
+    assert error.value.row_ids == ['missing']
+    assert _values(backend) == before
+
+
+def test_row_id_cannot_be_updated(backend):
+    with pytest.raises(ValueError):
+        _connector(backend).update_rows(SHEET_URL, {'ra': {'row_id': 'rx'}})
+
+
+def test_keyed_update_after_a_read_is_version_checked(backend):
+    connector, other = _connector(backend), _connector(backend)
+    uow = UnitOfWork(connector)
+    uow.read_from_sheets(SHEET_URL)
+    uow.update_rows(SHEET_URL, {'ra': {'qty': 10}})
+    assert other.update_rows(SHEET_URL, {'ra': {'qty': 7}})
+    with pytest.raises(SheetConflictError):
+        uow.commit()
+    assert _values(backend)[1] == ['A', '7', 'ra']
+
+
+def test_pages_do_not_write_and_assign_row_ids_backfills(client, connector, urls):
+    sold_url = urls['SOLD_ITEMS_SHEET_URL']
+    connector.sheets[sold_url].loc[0, 'row_id'] = None
+    connector.calls.clear()
+    assert client.get('/sold').status_code == 200
+    assert not [operation for operation, _ in connector.calls if operation != 'read']
+
+    response = client.post('/api/assign_row_ids')
+    assert response.json['success'], response.json
+    assert connector.sheets[sold_url]['row_id'].notna().all()
+
+
+def test_keyed_route_updates_the_addressed_row(client, connector, urls):
+    sold = connector.sheets[urls['SOLD_ITEMS_SHEET_URL']]
+    row_id = sold.at[5, 'row_id']
+    response = client.post('/api/update_tithe_status', json={'row_id': row_id, 'tithe_kept': True})
+    assert response.json['success'], response.json
+    sold = connector.sheets[urls['SOLD_ITEMS_SHEET_URL']]
+    assert str(sold.at[5, 'tithe_kept']) == 'True'
+    assert client.post('/api/update_tithe_status', json={'row_id': 'missing', 'tithe_kept': True}).status_code == 404
+
+
+def test_read_rows_fetches_only_the_addressed_rows(backend):
+    connector = _connector(backend)
+    connector.read_from_sheets(SHEET_URL)
+    backend.stats.clear()
+    df, version = connector.read_rows(SHEET_URL, ['rc'])
+    assert df.to_dict('records') == [{'product_name': 'C', 'qty': 3, 'row_id': 'rc'}]
+    assert version == 0
+    assert backend.stats['values_get'] == 0
+    assert connector.read_rows(SHEET_URL, ['missing'])[0].empty
+
+
+def test_update_status_reads_only_the_addressed_row(client, connector, urls):
+    inventory_url = urls['INVENTORY_SHEET_URL']
+    inventory = connector.sheets[inventory_url]
+    row_id, remaining = inventory.at[3, 'row_id'], int(inventory.at[3, 'remaining_qty'])
+    connector.calls.clear()
+    response = client.post('/api/update_status', json={'row_id': row_id, 'status': 'used', 'quantity_used': 1})
+    assert response.json['success'], response.json
+    assert ('read', inventory_url) not in connector.calls
+    assert int(connector.sheets[inventory_url].at[3, 'remaining_qty']) == remaining - 1
+
+
+def test_rows_without_an_id_are_addressed_by_position(client, connector, urls):
+    inventory_url, sold_url = urls['INVENTORY_SHEET_URL'], urls['SOLD_ITEMS_SHEET_URL']
+    connector.sheets[inventory_url].loc[2, 'row_id'] = None
+    connector.sheets[sold_url].loc[4, 'row_id'] = None
+    remaining = int(connector.sheets[inventory_url].at[2, 'remaining_qty'])
+
+    response = client.post('/api/update_status', json={'row_id': '', 'product_id': '2', 'status': 'used'})
+    assert response.json['success'], response.json
+    assert int(connector.sheets[inventory_url].at[2, 'remaining_qty']) == remaining - 1
+
+    response = client.post('/api/update_tithe_status', json={'item_id': 4, 'tithe_kept': True})
+    assert response.json['success'], response.json
+    assert str(connector.sheets[sold_url].at[4, 'tithe_kept']) == 'True'
+    assert client.post('/api/update_tithe_status', json={'item_id': 10 ** 6, 'tithe_kept': True}).status_code == 404
+
+
+def test_unit_of_work_gives_ids_only_to_row_id_tabs():
+    uow = UnitOfWork(object(), row_id_urls=[SHEET_URL])
+    keyed, other = pd.DataFrame({'product_name': ['A']}), pd.DataFrame({'invoice_number': ['INV-1']})
+    uow.write_to_sheets(keyed, SHEET_URL)
+    uow.write_to_sheets(other, 'https://docs.google.com/spreadsheets/d/TEST/edit#gid=1')
+    staged = {change['url']: change['df'] for change in uow._changes}
+    assert list(staged[SHEET_URL].columns) == ['product_name', 'row_id']
+    assert list(staged['https://docs.google.com/spreadsheets/d/TEST/edit#gid=1'].columns) == ['invoice_number']
+    assert list(keyed.columns) == ['product_name']
+
+
+def test_invoices_get_no_row_ids(client, connector, urls):
+    response = client.post('/api/create_invoice', json={
+        'customer_name': 'No Ids', 'items': [{'name': 'GHK-Cu 2mg', 'price': 250, 'quantity': 1, 'subtotal': 250}],
+        'total_amount': 250, 'invoice_date': '2026-02-01'})
+    assert response.json['success'], response.json
+    for name in ('INVOICES_SHEET_URL', 'CUSTOMERS_SHEET_URL', 'STOCK_MOVEMENTS_SHEET_URL'):
+        assert 'row_id' not in connector.sheets[urls[name]].columns, name
+    assert connector.sheets[urls['SOLD_ITEMS_SHEET_URL']]['row_id'].notna().all()
+
+
+def test_checked_table_conflicts_without_being_written(backend):
+    connector, other = _connector(backend), _connector(backend)
+    backend.add_sheet('TEST', 1, 'Payments', [['amount'], ['5']])
+    payments_url = 'https://docs.google.com/spreadsheets/d/TEST/edit#gid=1'
+    uow = UnitOfWork(connector)
+    uow.read_from_sheets(SHEET_URL)
+    uow.append_to_sheets(pd.DataFrame({'amount': ['7']}), payments_url)
+    uow.check_unchanged(SHEET_URL)
+    assert other.update_rows(SHEET_URL, {'ra': {'qty': 7}})
+    with pytest.raises(SheetConflictError):
+        uow.commit()
+    assert backend.spreadsheets['TEST']['sheets'][1]['values'] == [['amount'], ['5']]
+
+    retry = UnitOfWork(connector)
+    retry.read_from_sheets(SHEET_URL)
+    retry.append_to_sheets(pd.DataFrame({'amount': ['7']}), payments_url)
+    retry.check_unchanged(SHEET_URL)
+    assert retry.commit()
+    assert backend.spreadsheets['TEST']['sheets'][1]['values'] == [['amount'], ['5'], ['7']]
+    # Checked, not written: the version stamp of the checked sheet does not move
+    assert connector.read_versioned_from_sheets(SHEET_URL)[1] == 1
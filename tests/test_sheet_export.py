@@ -0,0 +1,56 @@
+import csv
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+
+from components.sheet_export import csv_chunks, filter_rows, xlsx_chunks
+
+ROWS = pd.DataFrame({
+    'product_name': ['=HYPERLINK("x")', 'BPC-157 5mg', '-5 discount'],
+    'quantity': [1, 2, None],
+    'date_added': ['2026-01-01', '2026-01-15 10:00:00', '2026-02-01'],
+})
+
+
+def test_filter_rows_by_whole_days_and_columns():
+    df = filter_rows(ROWS, 'date_added', '2026-01-01', '2026-01-15', ['product_name'])
+    assert df['product_name'].tolist() == ['=HYPERLINK("x")', 'BPC-157 5mg']
+    assert list(df.columns) == ['product_name']
+
+
+def test_filter_rows_rejects_unknown_columns_and_dates():
+    with pytest.raises(ValueError):
+        filter_rows(ROWS, 'date_added', columns=['missing'])
+    with pytest.raises(ValueError):
+        filter_rows(ROWS, 'date_added', start='last week')
+
+
+def test_csv_escapes_formulas_and_streams_in_chunks():
+    chunks = list(csv_chunks(ROWS, chunk_rows=2))
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO(''.join(chunks))))
+    assert rows[0] == ['product_name', 'quantity', 'date_added']
+    assert [row[0] for row in rows[1:]] == ['\'=HYPERLINK("x")', 'BPC-157 5mg', "'-5 discount"]
+    assert rows[3][1] == ''
+
+
+def test_xlsx_keeps_text_as_is():
+    data = b''.join(xlsx_chunks(ROWS, 'Inventory', chunk_rows=2))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert '<sheet name="Inventory"' in archive.read('xl/workbook.xml').decode()
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+    assert '<t xml:space="preserve">=HYPERLINK("x")</t>' in sheet
+    assert '<t xml:space="preserve">-5 discount</t>' in sheet
+    assert '<c t="n"><v>2.0</v></c>' in sheet
+    assert sheet.count('<row>') == 4
+
+
+def test_export_route_streams_the_snapshot(client):
+    response = client.get('/export/inventory.csv?columns=product_name,remaining_qty')
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['product_name', 'remaining_qty']
+    assert int(response.headers['X-Export-Rows']) == len(rows) - 1
+    assert client.get('/export/nope.csv').status_code == 404
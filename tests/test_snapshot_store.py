@@ -0,0 +1,40 @@
+import pandas as pd
+
+from components.snapshot_store import SnapshotStore
+
+URL = 'https://docs.google.com/spreadsheets/d/TEST/edit#gid=0'
+
+
+def _loader(calls, rows):
+    def load():
+        calls.append(1)
+        return pd.DataFrame({'product_name': rows, 'qty': [1] * len(rows)}), len(calls)
+    return load
+
+
+def test_snapshot_is_shared_until_invalidated(tmp_path):
+    path = str(tmp_path / 'snapshots.sqlite')
+    first, second = SnapshotStore(path, ttl_seconds=60), SnapshotStore(path, ttl_seconds=60)
+    calls = []
+    assert first.get(URL, _loader(calls, ['A']))['product_name'].tolist() == ['A']
+    # Another worker reuses the download
+    assert second.get(URL, _loader(calls, ['B']))['product_name'].tolist() == ['A']
+    assert len(calls) == 1 and second.age(URL) is not None
+
+    second.invalidate([URL])
+    assert first.latest(URL) == (None, None)
+    assert first.get(URL, _loader(calls, ['B']))['product_name'].tolist() == ['B']
+    assert len(calls) == 2
+
+
+def test_failed_reads_are_not_cached(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'snapshots.sqlite'), ttl_seconds=60)
+    assert store.get(URL, lambda: (pd.DataFrame(), None)).empty
+    assert store.age(URL) is None
+
+
+def test_returned_frames_are_copies(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'snapshots.sqlite'), ttl_seconds=60)
+    df = store.get(URL, _loader([], ['A']))
+    df.loc[0, 'product_name'] = 'changed'
+    assert store.latest(URL)[0]['product_name'].tolist() == ['A']